@@ -1,6 +1,7 @@
 from brachiograph import BrachioGraph
 
-# this is an example BrachioGraph definition
+# this is an example BrachioGraph definition - once a machine is calibrated, bg.save_profile() can save it as a
+# calibration profile, to be loaded with BrachioGraph.from_profile() (see calibration.py)
 
 # angles in degrees and corresponding pulse-widths for the two arm servos
 servo_1_angle_pws = [
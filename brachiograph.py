@@ -1,13 +1,24 @@
 # coding=utf-8
 
 from time import sleep
-import readchar
 import math
-import numpy
 import json
+import hashlib
+import os
 
-import pigpio
-import tqdm
+import calibration
+import profiling
+import progress
+
+# numpy, pigpio, readchar and tqdm - and the modules of our own that need numpy - are imported in the methods that use
+# them, so that importing brachiograph is quick, and code that only needs the geometry doesn't pay for them.
+
+
+# the largest safe bounds found for each plotter configuration, so that they needn't be worked out again
+bounds_cache = {}
+
+# where precomputed pulse-width grids are saved - beside this file, wherever the plotter is run from
+grid_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grids")
 
 class BrachioGraph:
 
@@ -15,13 +26,22 @@ class BrachioGraph:
         self,
         inner_arm,                  # the lengths of the arms
         outer_arm,
-        bounds=None,                # the maximum rectangular drawing area
+        bounds=None,                # the maximum rectangular drawing area, or "auto" to compute it
         servo_1_angle_pws=[],       # pulse-widths for various angles
         servo_2_angle_pws=[],
+        servo_1_angle_pws_bidi=[],  # angles with the pulse-widths reaching them while increasing and while decreasing
+        servo_2_angle_pws_bidi=[],
         servo_1_zero=1500,
         servo_2_zero=1500,
+        servo_1_fit=None,           # precomputed calibration curves, as saved in a calibration profile
+        servo_2_fit=None,
         pw_up=1500,                 # pulse-widths for pen up/down
         pw_down=1100,
+        max_angular_velocity=None,      # degrees per second, for both servos or as a pair
+        max_angular_acceleration=None,  # degrees per second², for both servos or as a pair
+        pulse_width_grid=None,      # resolution of a precomputed grid of pulse-widths over the bounds
+        profile=False,              # record timings and counts of what the plotter does, in self.profiler
+        test_pen=True,              # raise and lower the pen when the plotter is homed, to show it's working
     ):
 
         # set the pantograph geometry
@@ -31,47 +51,158 @@ class BrachioGraph:
         # the box bounds describe a rectangle that we can safely draw in
         self.bounds = bounds
 
+        # instrumentation, to show where the time in a job goes - see profiling.py
+        self.profiler = profiling.Profiler(enabled=profile)
+
         # if pulse-widths to angles are supplied for each servo, we will feed them to
-        # numpy.polyfit(), to produce a function for each one. Otherwise, we will use a simple
-        # approximation based on a centre of travel of 1500µS and 10µS per degree
-
-        if servo_1_angle_pws:
-            servo_1_array = numpy.array(servo_1_angle_pws)
-            self.angles_to_pw_1 = numpy.poly1d(
-                numpy.polyfit(
-                    servo_1_array[:,0],
-                    servo_1_array[:,1],
-                    3
-                )
-            )
+        # numpy.polyfit(), to produce a function for each one (unless the fitted curves are supplied too, from a
+        # calibration profile). Otherwise, we will use a simple approximation based on a centre of travel of 1500µS
+        # and 10µS per degree
+
+        self.servo_1_angle_pws, self.servo_2_angle_pws = servo_1_angle_pws, servo_2_angle_pws
+        self.servo_1_angle_pws_bidi, self.servo_2_angle_pws_bidi = servo_1_angle_pws_bidi, servo_2_angle_pws_bidi
+        self.servo_1_zero, self.servo_2_zero = servo_1_zero, servo_2_zero
+
+        # the range of angles through which each servo has been calibrated - or, if it hasn't been, the 180˚ range
+        # centred on its nominal zero position
+        self.servo_1_angle_range = (-180, 0)
+        self.servo_2_angle_range = (0, 180)
+
+        # Cheap servos don't reach quite the same angle for a pulse-width when turning one way as when turning the
+        # other. If the pulse-widths have been measured in both directions, a curve is fitted for each direction too,
+        # and each movement is corrected according to the direction each servo turns in - see compensate_hysteresis().
+
+        self.servo_1_fit = servo_1_fit or (
+            servo_1_angle_pws_bidi and calibration.fit_servo_bidi(servo_1_angle_pws_bidi)
+        ) or (servo_1_angle_pws and calibration.fit_servo(servo_1_angle_pws)) or None
+        self.servo_2_fit = servo_2_fit or (
+            servo_2_angle_pws_bidi and calibration.fit_servo_bidi(servo_2_angle_pws_bidi)
+        ) or (servo_2_angle_pws and calibration.fit_servo(servo_2_angle_pws)) or None
+
+        # half the difference between the two directions' curves, for each servo - or None if it isn't known
+        self.hysteresis_1 = self.hysteresis_2 = None
+
+        if self.servo_1_fit:
+            import numpy
+
+            self.servo_1_angle_range = tuple(self.servo_1_fit["angle_range"])
+            self.angles_to_pw_1 = numpy.poly1d(self.servo_1_fit["angles_to_pw"])
+
+            # and the inverse, to tell us what angle the servo will really reach for a given pulse-width
+            self.pw_to_angles_1 = numpy.poly1d(self.servo_1_fit["pw_to_angles"])
+
+            if "angles_to_pw_increasing" in self.servo_1_fit:
+                self.hysteresis_1 = (
+                    numpy.poly1d(self.servo_1_fit["angles_to_pw_increasing"]) -
+                    numpy.poly1d(self.servo_1_fit["angles_to_pw_decreasing"])
+                ) / 2
 
         else:
             self.angles_to_pw_1 = self.naive_angles_to_pulse_widths_1
-            self.servo_1_zero = servo_1_zero
-
-        if servo_2_angle_pws:
-            servo_2_array = numpy.array(servo_2_angle_pws)
-            self.angles_to_pw_2 = numpy.poly1d(
-                numpy.polyfit(
-                    servo_2_array[:,0],
-                    servo_2_array[:,1],
-                    3
-                )
-            )
+            self.pw_to_angles_1 = self.naive_pulse_widths_to_angles_1
+
+        if self.servo_2_fit:
+            import numpy
+
+            self.servo_2_angle_range = tuple(self.servo_2_fit["angle_range"])
+            self.angles_to_pw_2 = numpy.poly1d(self.servo_2_fit["angles_to_pw"])
+
+            # and the inverse, to tell us what angle the servo will really reach for a given pulse-width
+            self.pw_to_angles_2 = numpy.poly1d(self.servo_2_fit["pw_to_angles"])
+
+            if "angles_to_pw_increasing" in self.servo_2_fit:
+                self.hysteresis_2 = (
+                    numpy.poly1d(self.servo_2_fit["angles_to_pw_increasing"]) -
+                    numpy.poly1d(self.servo_2_fit["angles_to_pw_decreasing"])
+                ) / 2
 
         else:
             self.angles_to_pw_2 = self.naive_angles_to_pulse_widths_2
-            self.servo_2_zero = servo_2_zero
+            self.pw_to_angles_2 = self.naive_pulse_widths_to_angles_2
+
+        if bounds == "auto":
+            self.bounds = self.safe_bounds()
+
+        # Since the pulse-widths required for any x/y position never change, they can be worked out in advance for a
+        # grid of positions over the bounds, so that at each step of a movement they only need to be looked up.
+        self.pulse_width_grid = None
+
+        if pulse_width_grid and self.bounds:
+            self.pulse_width_grid = PulseWidthGrid(ag=self, resolution=pulse_width_grid)
+
+        # if the servos' speed and acceleration limits are supplied, movements will follow a velocity profile that
+        # ramps up and down within those limits. Otherwise, the pen moves at a constant speed set by the wait value.
+        self.max_angular_velocity = max_angular_velocity
+        self.max_angular_acceleration = max_angular_acceleration
+
+        # The hardware isn't touched until it's needed: the connection to the pigpio daemon - shared by the arms and
+        # the pen - is made, and the plotter homed, by connect(), which is called the first time self.rpi is used. So
+        # the BrachioGraph can be created instantly for planning, simulation and previews.
+        self._rpi = None
+        self.test_pen = test_pen
+
+        # create the pen object
+        self.pen = Pen(ag=self, pw_up=pw_up, pw_down=pw_down)
+
+        # Set the x and y position state - where the pen will be once the plotter is homed.
+        self.current_x = -self.INNER_ARM
+        self.current_y = self.OUTER_ARM
+
+        # and the speed of the pen at the end of the last movement
+        self.current_speed = 0
+
+        # the angles of the servos, and the direction (1 for increasing, -1 for decreasing, 0 if unknown) in which
+        # each last turned to reach them
+        self.angle_1, self.angle_2 = -90, 90
+        self.direction_1 = self.direction_2 = 0
+
+
+    @property
+    def rpi(self):
+
+        # the pigpio.pi() instance for this Raspberry Pi, connecting to it if that hasn't been done yet
+
+        if self._rpi is None:
+            self.connect()
+
+        return self._rpi
+
+
+    def connect(self, home=True):
+
+        # Connects to the pigpio daemon and homes the plotter. This happens automatically the first time the hardware
+        # is needed, but calling it explicitly gets the (slow) homing done in advance. With home=False, it only connects
+        # - as home() does, before it homes the plotter itself.
+
+        if self._rpi is not None:
+            return
+
+        import pigpio
 
         # instantiate this Raspberry Pi as a pigpio.pi() instance
-        self.rpi = pigpio.pi()
+        self._rpi = pigpio.pi()
 
         # the pulse frequency should be no higher than 100Hz - higher values could (supposedly) damage the servos
-        self.rpi.set_PWM_frequency(14, 50)
-        self.rpi.set_PWM_frequency(15, 50)
+        self._rpi.set_PWM_frequency(14, 50)
+        self._rpi.set_PWM_frequency(15, 50)
+        self._rpi.set_PWM_frequency(self.pen.pin, 50)
+
+        if home:
+            self.home()
 
-        # create the pen object, and make sure the pen is up
-        self.pen = Pen(ag=self, pw_up=pw_up, pw_down=pw_down)
+
+    def home(self):
+
+        # Makes sure the pen is up (raising and lowering it first, if test_pen is set) and moves the arms to the
+        # parked position without interpolation, so that the plotter is in a known, safe physical state.
+
+        # connect first, without homing - otherwise the first use of self.rpi below would home the plotter itself
+        self.connect(home=False)
+
+        if self.test_pen:
+            self.pen.test()
+
+        self.pen.up()
 
         # Initialise the pantograph with the motors in the centre of their travel
         self.rpi.set_servo_pulsewidth(14, self.angles_to_pw_1(-90))
@@ -81,15 +212,19 @@ class BrachioGraph:
 
         # Now the plotter is in a safe physical state.
 
-        # Set the x and y position state, so it knows its current x/y position.
         self.current_x = -self.INNER_ARM
         self.current_y = self.OUTER_ARM
+        self.current_speed = 0
+        self.angle_1, self.angle_2 = -90, 90
+        self.direction_1 = self.direction_2 = 0
 
 
     # ----------------- drawing methods -----------------
 
 
-    def plot_file(self, filename="", wait=.1, interpolate=10, bounds=None):
+    def plot_file(
+        self, filename="", wait=.1, interpolate=10, bounds=None, simplify=0, progress_callback=None, validate=True
+    ):
 
         bounds = bounds or self.bounds
 
@@ -99,128 +234,263 @@ class BrachioGraph:
         with open(filename, "r") as line_file:
             lines = json.load(line_file)
 
-        self.plot_lines(lines=lines, wait=wait, interpolate=interpolate, bounds=bounds, flip=True)
+        return self.plot_lines(
+            lines=lines, wait=wait, interpolate=interpolate, bounds=bounds, flip=True, simplify=simplify,
+            progress_callback=progress_callback, validate=validate
+        )
+
 
+    def plot_lines(
+        self, lines=[], wait=.1, interpolate=10, rotate="auto", flip=False, bounds=None, blend=False,
+        junction_deviation=.05, simplify=0, progress_callback=None, margin=0, matrix=None, validate=True
+    ):
 
-    def plot_lines(self, lines=[], wait=.1, interpolate=10, rotate=False, flip=False, bounds=None):
+        # The progress of the job is passed to progress_callback (see progress.py) every half-second or so; by
+        # default, it's shown on a progress bar. Use progress_callback=False for no progress reports at all.
+        #
+        # See prepare_lines() for rotate, margin and matrix.
+        #
+        # If validate is True, every position the pen would pass through is checked before it moves (see
+        # check_reach()). If any can't be reached, nothing is drawn, and a workspace.UnreachableError is raised,
+        # carrying the report of the strokes concerned.
 
         bounds = bounds or self.bounds
 
         if not bounds:
             return "Line plotting is only possible when BrachioGraph.bounds is set."
 
-        # lines is a tuple itself containing a number of tuples, each of which contains a number of 2-tuples
+        with self.profiler.job("plot_lines"):
+
+            lines = self.prepare_lines(lines, bounds, flip, simplify, rotate=rotate, margin=margin, matrix=matrix)
+
+            if validate:
+                import workspace
+
+                report = self.check_reach(lines, interpolate)
+
+                if report:
+                    raise workspace.UnreachableError(report)
+
+            self.plot_strokes(
+                lines, wait=wait, interpolate=interpolate, blend=blend, junction_deviation=junction_deviation,
+                progress_callback=progress_callback
+            )
+
+
+    def prepare_lines(
+        self, lines, bounds=None, flip=False, simplify=0, extent=None, rotate="auto", margin=0, matrix=None
+    ):
+
+        # Does all the work on a job's lines that can be done before the plotter starts: fits them to the bounds, and
+        # simplifies them if a simplify tolerance (in plotter units) is given. Returns Strokes, ready for
+        # plot_strokes(). See fit_lines() for extent, rotate and margin.
         #
-        # [                                                                                     # |
-        #     [                                                                                 # |
-        #         [3, 4],                               # |                                     # |
-        #         [2, 4],                               # |                                     # |
-        #         [1, 5],  #  a single point in a line  # |  a list of points defining a line   # |
-        #         [3, 5],                               # |                                     # |
-        #         [3, 7],                               # |                                     # |
-        #     ],                                                                                # |
-        #     [                                                                                 # |  all the lines
-        #         [...],                                                                        # |
-        #         [...],                                                                        # |
-        #     ],                                                                                # |
-        #     [                                                                                 # |
-        #         [...],                                                                        # |
-        #         [...],                                                                        # |
-        #     ],                                                                                # |
-        # ]                                                                                     # |
+        # Instead of being fitted, the lines can be placed with an affine matrix from transform.py; they are then
+        # clipped to the bounds, so that any part of the drawing that falls outside them is left out.
 
-        # First, we create a pair of empty sets for all the x and y values in all of the lines of the plot data.
+        import strokes
+        import transform
 
-        x_values_in_lines = set()
-        y_values_in_lines = set()
+        bounds = bounds or self.bounds
 
-        # Loop over each line and all the points in each line, to get sets of all the x and y values:
+        if matrix is None:
+            lines = self.fit_lines(lines, bounds, flip, extent, rotate, margin)
+        else:
+            lines = transform.clip(transform.apply(lines, matrix), bounds)
 
-        for line in lines:
+        # remove points that make no difference greater than the simplify tolerance (in plotter units) to the lines
+        if simplify:
+            lines = strokes.simplify_lines(lines, simplify)
 
-            x_values_in_line, y_values_in_line = zip(*line)
+        return lines
 
-            x_values_in_lines.update(x_values_in_line)
-            y_values_in_lines.update(y_values_in_line)
 
-        # Identify the minimum and maximum values.
+    def plot_strokes(
+        self, lines, wait=.1, interpolate=10, blend=False, junction_deviation=.05, progress_callback=None
+    ):
 
-        min_x, max_x = min(x_values_in_lines), max(x_values_in_lines)
-        min_y, max_y = min(y_values_in_lines), max(y_values_in_lines)
+        # Plots Strokes that have already been prepared by prepare_lines(), then parks the arms. If the Progress
+        # passed to progress_callback is cancelled, the plotter stops at the end of the current movement.
 
-        # Identify the range they span.
+        import numpy
 
-        x_range = max_x - min_x
-        y_range = max_y - min_y
+        if progress_callback is None:
+            progress_callback = progress.TqdmReporter(desc="Plotting", leave=False)
 
-        x_mid_point = (max_x + min_x) / 2
-        y_mid_point = (max_y + min_y) / 2
+        job = progress.Progress(
+            len(lines.points), float(numpy.hypot(*numpy.diff(lines.points, axis=0).T).sum()), progress_callback or None
+        )
 
-        box_x_range = bounds[2] - bounds[0]
-        box_y_range = bounds[3] - bounds[1]
+        self.draw_strokes(lines, job, wait, interpolate, blend, junction_deviation)
 
-        box_x_mid_point = (bounds[0] + bounds[2]) / 2
-        box_y_mid_point = (bounds[1] + bounds[3]) / 2
+        job.finish()
 
-        # Get a 'divider' value for each range - the value by which we must divide all x and y so that they will
-        # fit safely inside the drawing range of the plotter.
+        self.park()
+        self.quiet()
 
+
+    def plot_stream(
+        self, pieces, extent, wait=.1, interpolate=10, flip=True, bounds=None, blend=False, junction_deviation=.05,
+        progress_callback=None, validate=True
+    ):
+
+        # Plots a drawing that arrives in pieces - an iterable of lines or Strokes, such as linedraw's
+        # stream_vectorise() produces - drawing each piece as soon as it arrives. Since the size of the whole drawing
+        # can't be known from the pieces that have arrived so far, each is fitted to the bounds according to the extent
+        # of the whole drawing (see fit_lines()). The progress reported grows as the pieces arrive.
         #
-        # If both image and box are in portrait orientation, or both in landscape, we don't need to rotate the plot.
+        # If validate is True, each piece is checked before it's drawn (see check_reach()). If any of it can't be
+        # reached, the plotter stops before drawing it, and a workspace.UnreachableError is raised.
 
-        if (x_range >= y_range and box_x_range >= box_y_range) or (x_range <= y_range and box_x_range <= box_y_range):
+        import numpy
 
-            divider = max((x_range / box_x_range), (y_range / box_y_range))
-            rotate = False
+        bounds = bounds or self.bounds
 
-        else:
+        if not bounds:
+            return "Line plotting is only possible when BrachioGraph.bounds is set."
+
+        if progress_callback is None:
+            progress_callback = progress.TqdmReporter(desc="Plotting", leave=False)
+
+        with self.profiler.job("plot_stream"):
+
+            job = progress.Progress(0, 0, progress_callback or None)
+            report = []
+
+            for lines in pieces:
+
+                lines = self.prepare_lines(lines, bounds, flip, extent=extent)
+
+                if validate:
+                    report = self.check_reach(lines, interpolate)
+
+                    if report:
+                        break
 
-            divider = max((x_range / box_y_range), (y_range / box_x_range))
-            rotate = True
-            x_mid_point, y_mid_point = y_mid_point, x_mid_point
+                job.total_points += len(lines.points)
+                job.total_distance += float(numpy.hypot(*numpy.diff(lines.points, axis=0).T).sum())
 
-        # Now, divide each value, and take into account the offset from zero of each range
+                self.draw_strokes(lines, job, wait, interpolate, blend, junction_deviation)
 
-        for line in lines:
+                if job.cancelled:
+                    break
 
-            for point in line:
-                if rotate:
-                    point[0], point[1] = point[1], point[0]
+            job.finish()
 
-                x = point[0]
-                x = x - x_mid_point         # shift x values so that they have zero as their mid-point
-                x = x / divider             # scale x values to fit in our box width
-                x = x + box_x_mid_point     # shift x values so that they have the box x midpoint as their endpoint
+            self.park()
+            self.quiet()
 
-                if flip ^ rotate:
-                    x = -x
+        if report:
+            import workspace
 
-                point[0] = x
+            raise workspace.UnreachableError(report)
 
-                y = point[1]
-                y = y - y_mid_point
-                y = y / divider
-                y = y + box_y_mid_point
 
-                point[1] = y
+    def draw_strokes(self, lines, job, wait=.1, interpolate=10, blend=False, junction_deviation=.05):
 
-        for line in tqdm.tqdm(lines, desc="Lines", leave=False):
+        # Draws the Strokes, advancing the Progress job as it goes, and stopping if it's cancelled.
+
+        import numpy
+
+        import motion
+
+        # the distance the pen moves to reach each point from the previous one, for measuring progress
+        distances = [0] + numpy.hypot(*numpy.diff(lines.points, axis=0).T).tolist()
+
+        blend = blend and self.max_angular_velocity and self.max_angular_acceleration
+
+        # if blending, the angles for all the points of all the lines are worked out at once
+        if blend:
+            with self.profiler.timer("geometry"):
+                angles = numpy.column_stack(self.batch_xy_to_angles(*lines.points.T))
+
+        for line, offset in zip(lines, lines.offsets):
+
+            if job.cancelled:
+                break
+
+            # if blending, plan the speed of the pen through every point of the line, so that it only needs to slow
+            # down where the line turns sharply
+            if blend:
+                with self.profiler.timer("planning"):
+                    speeds = motion.plan_line(
+                        line,
+                        angles[offset:offset + len(line)],
+                        self.max_angular_velocity,
+                        self.max_angular_acceleration,
+                        max_speed=wait and 1 / wait,
+                        junction_deviation=junction_deviation,
+                        turn_per_unit=motion.segment_turn_rates(line, self.batch_jacobian),
+                    )
+            else:
+                speeds = [0] * len(line)
+
+            # the pen-up move is divided into steps just as check_reach() expects
             x, y = line[0]
-            self.xy(x, y)
-            for point in tqdm.tqdm(line[1:], desc="Segments", leave=False):
+            self.xy(x, y, interpolate=interpolate)
+            job.advance(1, distances[offset])
+
+            for index, (point, exit_speed) in enumerate(zip(line[1:], speeds[1:]), start=offset + 1):
+
+                if job.cancelled:
+                    break
+
                 x, y = point
-                self.draw(x, y, wait=wait, interpolate=interpolate)
+                self.draw(x, y, wait=wait, interpolate=interpolate, exit_speed=exit_speed)
+                job.advance(1, distances[index])
 
-        self.park()
-        self.quiet()
 
+    def fit_lines(self, lines, bounds, flip=False, extent=None, rotate="auto", margin=0):
 
-    def draw(self, x=0, y=0, wait=.5, interpolate=10):
-        self.xy(x=x, y=y, wait=wait, interpolate=interpolate, draw=True)
+        # Scales, shifts and rotates the lines so that they fit the bounds, at least margin inside each edge, and
+        # returns them as Strokes. The lines may be Strokes or a list of lines; they are not modified. rotate is an
+        # angle in degrees, or "auto" to turn the lines through 90 degrees if that fits them better (see
+        # transform.fit()).
+        #
+        # Normally, the rectangle that's fitted to the bounds is the one enclosing the lines. If the lines are only
+        # part of a drawing, the extent of the whole drawing - (min x, min y, max x, max y) - can be given instead, so
+        # that they are placed where they belong in it.
+
+        import strokes
+        import transform
+
+        # lines, if not Strokes, is a list itself containing a number of lists, each of which contains a number of
+        # 2-item lists
+        #
+        # [                                                                                     # |
+        #     [                                                                                 # |
+        #         [3, 4],                               # |                                     # |
+        #         [2, 4],                               # |                                     # |
+        #         [1, 5],  #  a single point in a line  # |  a list of points defining a line   # |
+        #         [3, 5],                               # |                                     # |
+        #         [3, 7],                               # |                                     # |
+        #     ],                                                                                # |
+        #     [                                                                                 # |  all the lines
+        #         [...],                                                                        # |
+        #         [...],                                                                        # |
+        #     ],                                                                                # |
+        #     [                                                                                 # |
+        #         [...],                                                                        # |
+        #         [...],                                                                        # |
+        #     ],                                                                                # |
+        # ]                                                                                     # |
+
+        lines = strokes.Strokes.from_lines(lines)
+
+        if not len(lines.points):
+            return lines
+
+        return transform.apply(lines, transform.fit(extent or lines.bounds, bounds, rotate, flip, margin))
+
+
+    def draw(self, x=0, y=0, wait=.5, interpolate=10, exit_speed=0):
+        self.xy(x=x, y=y, wait=wait, interpolate=interpolate, draw=True, exit_speed=exit_speed)
 
 
     def test_pattern(self, bounds=None, wait=1, interpolate=10, repeat=1):
 
+        import tqdm
+
         bounds = bounds or self.bounds
 
         if not bounds:
@@ -242,6 +512,8 @@ class BrachioGraph:
 
     def box(self, bounds=None, wait=.15, interpolate=10, repeat=1, reverse=False):
 
+        import tqdm
+
         bounds = bounds or self.bounds
 
         if not bounds:
@@ -275,33 +547,53 @@ class BrachioGraph:
 
     def centre(self):
 
-        if not bounds:
+        if not self.bounds:
             return "Moving to the centre is only possible when BrachioGraph.bounds is set."
 
 
         self.pen.up()
-        self.xy(self.bounds[2]/2, self.bounds[3]/2)
+        self.xy((self.bounds[0] + self.bounds[2]) / 2, (self.bounds[1] + self.bounds[3]) / 2)
 
         self.quiet()
 
 
-    def xy(self, x=0, y=0, wait=.1, interpolate=10, draw=False):
+    def xy(self, x=0, y=0, wait=.1, interpolate=10, draw=False, exit_speed=0):
         # Moves the pen to the xy position; optionally draws
 
+        import numpy
+
+        # raising or lowering the pen brings the arms to a stop
+        if draw != (self.pen.position == "down"):
+            self.current_speed = 0
+
         if draw:
             self.pen.down()
         else:
             self.pen.up()
 
-        (angle_1, angle_2) = self.xy_to_angles(x, y)
-        (pulse_width_1, pulse_width_2) = self.angles_to_pulse_widths(angle_1, angle_2)
+        with self.profiler.timer("geometry"):
+            (angle_1, angle_2) = self.xy_to_angles(x, y)
+
+        with self.profiler.timer("pulse_widths"):
+            (pulse_width_1, pulse_width_2) = self.angles_to_pulse_widths(angle_1, angle_2)
 
-        # if they are the same, we don't need to move anything
-        if (pulse_width_1, pulse_width_2) == self.get_pulse_widths():
+            # The pulse-widths that were last sent were compensated for hysteresis, according to the direction each
+            # servo arrived from. If the pen is already here, it stays as it arrived, so these are compensated the
+            # same way to compare like with like.
+            if self.hysteresis_1 is not None:
+                pulse_width_1 = pulse_width_1 + self.direction_1 * self.hysteresis_1(angle_1)
+
+            if self.hysteresis_2 is not None:
+                pulse_width_2 = pulse_width_2 + self.direction_2 * self.hysteresis_2(angle_2)
+
+        # if they are the same, we don't need to move anything - pigpio works in whole microseconds, dropping any
+        # fraction, so they need only agree to within one
+        if all(abs(target - sent) < 1 for target, sent in zip((pulse_width_1, pulse_width_2), self.get_pulse_widths())):
 
             # ensure the pantograph knows its x/y positions
             self.current_x = x
             self.current_y = y
+            self.current_speed = 0
 
             return
 
@@ -315,39 +607,168 @@ class BrachioGraph:
 
         no_of_steps = int(length * interpolate) or 1
 
-        if no_of_steps < 100:
-            disable_tqdm = True
+        if self.max_angular_velocity and self.max_angular_acceleration:
+            self.profiled_xy(x, y, length, no_of_steps, wait, exit_speed)
+            return
+
+        # the pulse-widths for all the steps are worked out at once, before the arms start moving
+        fractions = numpy.arange(1, no_of_steps + 1) / no_of_steps
+        x_steps = self.current_x + fractions * x_length
+        y_steps = self.current_y + fractions * y_length
+
+        pulse_widths = self.plan_pulse_widths(x_steps, y_steps)
+
+        # If the servos' speed limit is known, each step takes as long as it needs for neither servo to exceed it -
+        # less where the arms have the mechanical advantage, more near a singularity - but the pen never moves faster
+        # than wait allows. Otherwise, every step takes the same time, set by wait.
+        if self.max_angular_velocity:
+            import motion
+
+            with self.profiler.timer("planning"):
+                points = numpy.column_stack((
+                    numpy.concatenate(([self.current_x], x_steps)), numpy.concatenate(([self.current_y], y_steps))
+                ))
+                speeds = motion.feed_rates(
+                    motion.segment_turn_rates(points, self.batch_jacobian),
+                    self.max_angular_velocity,
+                    max_speed=wait and 1 / wait,
+                )
+                durations = length / no_of_steps / speeds
+
         else:
-            disable_tqdm = False
+            durations = numpy.full(no_of_steps, length * wait/no_of_steps)
 
+        for step, (pw_1, pw_2) in enumerate(zip(*pulse_widths)):
 
-        (length_of_step_x, length_of_step_y) = (x_length/no_of_steps, y_length/no_of_steps)
+            self.current_x, self.current_y = x_steps[step], y_steps[step]
 
-        for step in tqdm.tqdm(range(no_of_steps), desc='Interpolation', leave=False, disable=disable_tqdm):
+            self.set_pulse_widths(pw_1, pw_2)
 
-            self.current_x = self.current_x + length_of_step_x
-            self.current_y = self.current_y + length_of_step_y
+            if step + 1 < no_of_steps:
+                self.profiler.sleep(durations[step])
 
-            angle_1, angle_2 = self.xy_to_angles(self.current_x, self.current_y)
+        # Give the arms time to settle. If the hysteresis of both servos is compensated for, they arrive where they
+        # should without it.
+        if self.hysteresis_1 is None or self.hysteresis_2 is None:
+            self.profiler.sleep(length * wait/10)
 
-            self.set_angles(angle_1, angle_2)
 
-            if step + 1 < no_of_steps:
-                sleep(length * wait/no_of_steps)
+    def profiled_xy(self, x, y, length, no_of_steps, wait, exit_speed):
+        # Moves the pen to the xy position following a velocity profile, so that it starts and stops smoothly without
+        # exceeding the servos' limits. Since the pen comes to rest at the end of the profile, no settling time is
+        # needed afterwards.
 
-        sleep(length * wait/10)
+        import numpy
 
+        import motion
 
-    def set_angles(self, angle_1=0, angle_2=0):
-        # moves the servo motor
+        fractions = numpy.linspace(0, 1, no_of_steps + 1)
+        x_steps = self.current_x + fractions * (x - self.current_x)
+        y_steps = self.current_y + fractions * (y - self.current_y)
 
-        pw_1, pw_2 = self.angles_to_pulse_widths(angle_1, angle_2)
+        with self.profiler.timer("geometry"):
+            angles = numpy.column_stack(self.batch_xy_to_angles(x_steps, y_steps))
 
-        self.set_pulse_widths(pw_1, pw_2)
+        with self.profiler.timer("planning"):
+            durations, speeds = motion.trapezoidal_profile(
+                angles,
+                length,
+                self.max_angular_velocity,
+                self.max_angular_acceleration,
+                entry_speed=self.current_speed,
+                exit_speed=exit_speed,
+                max_speed=wait and 1 / wait,
+                turn_per_unit=motion.segment_turn_rates(numpy.column_stack((x_steps, y_steps)), self.batch_jacobian),
+            )
+
+        pulse_widths = self.plan_pulse_widths(x_steps[1:], y_steps[1:], angles[1:])
+
+        for step, (pw_1, pw_2) in enumerate(zip(*pulse_widths)):
+
+            self.current_x, self.current_y = x_steps[step + 1], y_steps[step + 1]
+
+            self.set_pulse_widths(pw_1, pw_2)
+
+            self.profiler.sleep(durations[step])
+
+        self.current_speed = speeds[-1]
+
+
+    def plan_pulse_widths(self, x, y, angles=None):
+
+        # Returns arrays of the pulse-widths for each step of a movement through arrays of x/y positions, all worked
+        # out at once: from the grid if there is one, and compensated for the servos' hysteresis. The angles for the
+        # positions are supplied as an array of shape (steps, 2), or calculated only where they are needed - for
+        # positions off the grid, and for compensating hysteresis.
+
+        import numpy
+
+        x, y = numpy.asarray(x, dtype=float), numpy.asarray(y, dtype=float)
+
+        compensate = self.hysteresis_1 is not None or self.hysteresis_2 is not None
+
+        if angles is not None:
+            angles = tuple(numpy.asarray(angles, dtype=float).T)
+        elif compensate:
+            with self.profiler.timer("geometry"):
+                angles = self.batch_xy_to_angles(x, y)
+
+        pw_1, pw_2 = self.batch_pulse_widths(x, y, angles)
+
+        # positions the arms can't reach have no angles, and so no pulse-widths
+        unreachable = numpy.isnan(pw_1) | numpy.isnan(pw_2)
+
+        if unreachable.any():
+            index = numpy.argmax(unreachable)
+            raise ValueError("The position ({}, {}) can't be reached by the arms.".format(x[index], y[index]))
+
+        if not compensate:
+            return pw_1, pw_2
+
+        with self.profiler.timer("pulse_widths"):
+            return self.compensate_hysteresis(*angles, pw_1, pw_2)
+
+
+    def compensate_hysteresis(self, angle_1, angle_2, pw_1, pw_2):
 
+        # Given arrays of the angles the servos are about to be moved through, and of their pulse-widths from the
+        # calibration curves, returns the pulse-widths corrected for each servo's hysteresis: the calibration curve
+        # lies midway between the curves for increasing and decreasing angles, so half the difference between them
+        # is added or subtracted according to the direction the servo is turning in at each step. The angles the
+        # servos will finish at, and the directions they will arrive from, are recorded for the next movement.
+
+        import numpy
+
+        angle_1, angle_2 = numpy.asarray(angle_1, dtype=float), numpy.asarray(angle_2, dtype=float)
+        pw_1, pw_2 = numpy.asarray(pw_1, dtype=float), numpy.asarray(pw_2, dtype=float)
+
+        if self.hysteresis_1 is not None or self.hysteresis_2 is not None:
+            import motion
+
+        if self.hysteresis_1 is not None:
+            directions = motion.turning_directions(angle_1, self.angle_1, self.direction_1)
+            pw_1 = pw_1 + directions * self.hysteresis_1(angle_1)
+            self.direction_1 = directions[-1]
+
+        if self.hysteresis_2 is not None:
+            directions = motion.turning_directions(angle_2, self.angle_2, self.direction_2)
+            pw_2 = pw_2 + directions * self.hysteresis_2(angle_2)
+            self.direction_2 = directions[-1]
 
         # We record the angles, so we that we know where the arms are for future reference.
-        self.angle_1, self.angle_2 = angle_1, angle_2
+        self.angle_1, self.angle_2 = angle_1[-1], angle_2[-1]
+
+        return pw_1, pw_2
+
+
+    def set_angles(self, angle_1=0, angle_2=0):
+        # moves the servo motor
+
+        with self.profiler.timer("pulse_widths"):
+            pw_1, pw_2 = self.angles_to_pulse_widths(angle_1, angle_2)
+            (pw_1,), (pw_2,) = self.compensate_hysteresis([angle_1], [angle_2], [pw_1], [pw_2])
+
+        self.set_pulse_widths(pw_1, pw_2)
 
 
     #  ----------------- hardware-related methods -----------------
@@ -359,6 +780,13 @@ class BrachioGraph:
         return (angle - 90) * 10 + self.servo_2_zero
 
 
+    def naive_pulse_widths_to_angles_1(self, pulse_width):
+        return (pulse_width - self.servo_1_zero) / 10 - 90
+
+    def naive_pulse_widths_to_angles_2(self, pulse_width):
+        return (pulse_width - self.servo_2_zero) / 10 + 90
+
+
     def angles_to_pulse_widths(self, angle_1, angle_2):
         # Given a pair of angles, returns the appropriate pulse widths.
 
@@ -372,14 +800,27 @@ class BrachioGraph:
 
     def set_pulse_widths(self, pw_1, pw_2):
 
-        self.rpi.set_servo_pulsewidth(14, pw_1)
-        self.rpi.set_servo_pulsewidth(15, pw_2)
+        # connecting to pigpio and homing the plotter, the first time, aren't counted as time spent in pigpio calls
+        rpi = self.rpi
+
+        with self.profiler.timer("pigpio"):
+            rpi.set_servo_pulsewidth(14, pw_1)
+            rpi.set_servo_pulsewidth(15, pw_2)
+
+        self.profiler.count("steps")
+        self.profiler.count("daemon_calls", 2)
 
 
     def get_pulse_widths(self):
 
-        actual_pulse_width_1 = self.rpi.get_servo_pulsewidth(14)
-        actual_pulse_width_2 = self.rpi.get_servo_pulsewidth(15)
+        # as in set_pulse_widths(), connecting isn't timed as a pigpio call
+        rpi = self.rpi
+
+        with self.profiler.timer("pigpio"):
+            actual_pulse_width_1 = rpi.get_servo_pulsewidth(14)
+            actual_pulse_width_2 = rpi.get_servo_pulsewidth(15)
+
+        self.profiler.count("daemon_calls", 2)
 
         return (actual_pulse_width_1, actual_pulse_width_2)
 
@@ -394,10 +835,20 @@ class BrachioGraph:
 
     def quiet(self, servos=[14, 15, 18]):
 
-        # stop sending pulses to the servos
+        # stop sending pulses to the servos - if we're not connected, there's nothing to stop
+
+        if self._rpi is not None:
+
+            for servo in servos:
+                self._rpi.set_servo_pulsewidth(servo, 0)
+
+            self.profiler.count("daemon_calls", len(servos))
+
+        # with no pulses, the pen servo is no longer held in position
+        if self.pen.pin in servos:
+            self.pen.position = None
 
-        for servo in servos:
-            self.rpi.set_servo_pulsewidth(servo, 0)
+        self.current_speed = 0
 
 
     # ----------------- trigonometric methods -----------------
@@ -451,11 +902,274 @@ class BrachioGraph:
         return(x, y)
 
 
+    # The batch methods below do the same as xy_to_angles() and angles_to_xy(), but for whole arrays of values at once.
+    # Rather than raising an error for positions the arms can't reach, they return NaN for them.
+
+    def batch_xy_to_angles(self, x, y):
+
+        import numpy
+
+        x = numpy.asarray(x, dtype=float)
+        y = numpy.asarray(y, dtype=float)
+
+        hypotenuse = numpy.hypot(x, y)
+
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+
+            # positions level with or behind the shoulder motor can't be reached
+            hypotenuse_angle = numpy.where(y > 0, numpy.arcsin(x/hypotenuse), numpy.nan)
+
+            inner_angle = numpy.arccos(
+                (hypotenuse**2+self.INNER_ARM**2-self.OUTER_ARM**2)/(2*hypotenuse*self.INNER_ARM)
+            )
+            outer_angle = numpy.arccos(
+                (self.INNER_ARM**2+self.OUTER_ARM**2-hypotenuse**2)/(2*self.INNER_ARM*self.OUTER_ARM)
+            )
+
+        shoulder_motor_angle = hypotenuse_angle - inner_angle
+        elbow_motor_angle = numpy.pi - outer_angle
+
+        return (numpy.degrees(shoulder_motor_angle), numpy.degrees(elbow_motor_angle))
+
+
+    def batch_angles_to_xy(self, shoulder_motor_angle, elbow_motor_angle):
+
+        import numpy
+
+        elbow_motor_angle = numpy.radians(elbow_motor_angle)
+        shoulder_motor_angle = numpy.radians(shoulder_motor_angle)
+
+        hypotenuse = numpy.sqrt(
+            (self.INNER_ARM ** 2 + self.OUTER_ARM ** 2 - 2 * self.INNER_ARM * self.OUTER_ARM * numpy.cos(
+                numpy.pi - elbow_motor_angle)
+            )
+        )
+
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            base_angle = numpy.arccos(
+                (hypotenuse ** 2 + self.INNER_ARM ** 2 - self.OUTER_ARM ** 2) / (2 * hypotenuse * self.INNER_ARM)
+            )
+
+        inner_angle = base_angle + shoulder_motor_angle
+
+        x = numpy.sin(inner_angle) * hypotenuse
+        y = numpy.cos(inner_angle) * hypotenuse
+
+        return (x, y)
+
+
+    def batch_jacobian(self, x, y):
+
+        # The Jacobian of xy_to_angles() for arrays of x/y positions: how many degrees each servo turns per unit of
+        # pen travel along x and along y, as an array of shape (..., 2, 2) - [[d angle_1/dx, d angle_1/dy],
+        # [d angle_2/dx, d angle_2/dy]]. Worked out analytically from the same triangles as xy_to_angles(). Near the
+        # singularities, where the arm is fully stretched out or folded back on itself, the values become very large.
+
+        import numpy
+
+        x = numpy.asarray(x, dtype=float)
+        y = numpy.asarray(y, dtype=float)
+
+        hypotenuse = numpy.hypot(x, y)
+
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+
+            # the cosines of the inner and outer angles, as in batch_xy_to_angles()
+            inner_cosine = (hypotenuse**2+self.INNER_ARM**2-self.OUTER_ARM**2)/(2*hypotenuse*self.INNER_ARM)
+            outer_cosine = (self.INNER_ARM**2+self.OUTER_ARM**2-hypotenuse**2)/(2*self.INNER_ARM*self.OUTER_ARM)
+
+            # how quickly the inner angle, and the elbow motor angle, change with the length of the hypotenuse
+            inner_angle_per_unit = - (hypotenuse**2-self.INNER_ARM**2+self.OUTER_ARM**2) / (
+                2 * hypotenuse**2 * self.INNER_ARM * numpy.sqrt(1 - inner_cosine**2)
+            )
+            elbow_angle_per_unit = - hypotenuse / (
+                self.INNER_ARM * self.OUTER_ARM * numpy.sqrt(1 - outer_cosine**2)
+            )
+
+            # and the hypotenuse angle, and the hypotenuse itself, with x and y
+            hypotenuse_angle_dx, hypotenuse_angle_dy = y / hypotenuse**2, -x / hypotenuse**2
+            hypotenuse_dx, hypotenuse_dy = x / hypotenuse, y / hypotenuse
+
+        jacobian = numpy.stack((
+            numpy.stack((
+                hypotenuse_angle_dx - inner_angle_per_unit * hypotenuse_dx,
+                hypotenuse_angle_dy - inner_angle_per_unit * hypotenuse_dy,
+            ), axis=-1),
+            numpy.stack((elbow_angle_per_unit * hypotenuse_dx, elbow_angle_per_unit * hypotenuse_dy), axis=-1),
+        ), axis=-2)
+
+        return numpy.degrees(jacobian)
+
+
+    def safe_bounds(self, resolution=.1):
+
+        # Finds the largest rectangle that the pen can reach while both servos stay within the range of angles for
+        # which they have been calibrated, by sampling the whole area within reach of the arms. The result is cached
+        # for each configuration of arms and servo ranges.
+
+        import numpy
+
+        import workspace
+
+        key = (
+            self.INNER_ARM, self.OUTER_ARM, self.servo_1_angle_range, self.servo_2_angle_range, resolution
+        )
+
+        if key not in bounds_cache:
+
+            reach = int((self.INNER_ARM + self.OUTER_ARM) / resolution) + 1
+
+            xs = numpy.round(numpy.arange(-reach, reach + 1) * resolution, 6)
+            ys = numpy.round(numpy.arange(1, reach + 1) * resolution, 6)
+
+            grid_x, grid_y = numpy.meshgrid(xs, ys)
+            angle_1, angle_2 = self.batch_xy_to_angles(grid_x, grid_y)
+
+            with numpy.errstate(invalid="ignore"):
+                safe = (
+                    (angle_1 >= self.servo_1_angle_range[0]) & (angle_1 <= self.servo_1_angle_range[1]) &
+                    (angle_2 >= self.servo_2_angle_range[0]) & (angle_2 <= self.servo_2_angle_range[1])
+                )
+
+            bounds = workspace.largest_rectangle(safe, xs, ys)
+
+            bounds_cache[key] = bounds and tuple(float(value) for value in bounds)
+
+        return bounds_cache[key]
+
+
+    def check_reach(self, lines, interpolate=10):
+
+        # Checks all the positions the pen would pass through in drawing the lines, interpolated just as xy() will
+        # interpolate them, and returns a list of workspace.Unreachable strokes: those with positions the arms can't
+        # reach, or at which a calibrated servo would have to go beyond the angles it was calibrated for. An empty
+        # list means the lines can be drawn.
+
+        import workspace
+
+        with self.profiler.timer("validating"):
+            return workspace.check_reach(
+                lines,
+                self.batch_xy_to_angles,
+                (self.servo_1_fit and self.servo_1_angle_range, self.servo_2_fit and self.servo_2_angle_range),
+                interpolate,
+            )
+
+
+    # ----------------- simulation methods -----------------
+
+    def batch_pulse_widths(self, x, y, angles=None):
+
+        # the pulse-widths that would be sent for arrays of x/y positions - before any compensation for hysteresis.
+        # If there's a grid, they are looked up in it, and only worked out from the angles for positions it doesn't
+        # cover; the angles are calculated for those positions unless supplied, as a pair of arrays.
+
+        import numpy
+
+        x, y = numpy.asarray(x, dtype=float), numpy.asarray(y, dtype=float)
+
+        if self.pulse_width_grid:
+            with self.profiler.timer("grid"):
+                pw_1, pw_2 = self.pulse_width_grid.batch_pulse_widths(x, y)
+            off_grid = numpy.isnan(pw_1) | numpy.isnan(pw_2)
+        else:
+            pw_1, pw_2 = numpy.full(x.shape, numpy.nan), numpy.full(x.shape, numpy.nan)
+            off_grid = numpy.ones(x.shape, dtype=bool)
+
+        if off_grid.any():
+
+            if angles is None:
+                with self.profiler.timer("geometry"):
+                    angle_1, angle_2 = self.batch_xy_to_angles(x[off_grid], y[off_grid])
+            else:
+                angle_1, angle_2 = angles[0][off_grid], angles[1][off_grid]
+
+            with self.profiler.timer("pulse_widths"):
+                pw_1[off_grid], pw_2[off_grid] = self.angles_to_pw_1(angle_1), self.angles_to_pw_2(angle_2)
+
+        return pw_1, pw_2
+
+
+    def batch_pulse_widths_to_xy(self, pw_1, pw_2):
+
+        # where the pen will really be for arrays of pulse-widths, according to the measured servo behaviour
+
+        return self.batch_angles_to_xy(self.pw_to_angles_1(pw_1), self.pw_to_angles_2(pw_2))
+
+
+    def simulate(self, lines=[], interpolate=10, flip=False, bounds=None, filename=None):
+
+        # Predicts what the plotter will actually draw for the lines, given the calibration of its servos, and
+        # returns a report of the distortion. If a filename is supplied, the predicted drawing is rendered there (in
+        # black) over the ideal one (in grey).
+
+        import simulation
+
+        bounds = bounds or self.bounds
+
+        if not bounds:
+            return "Simulation is only possible when BrachioGraph.bounds is set."
+
+        lines = self.fit_lines(lines, bounds, flip)
+
+        ideal, predicted, report = simulation.simulate(
+            lines, self.batch_pulse_widths, self.batch_pulse_widths_to_xy, interpolate
+        )
+
+        if filename:
+            simulation.render(ideal, predicted, filename)
+
+        return report
+
+
+    # ----------------- calibration profiles -----------------
+
+    @classmethod
+    def from_profile(cls, filename, **kwargs):
+
+        # Creates a BrachioGraph from a calibration profile (see calibration.py), reusing the calibration curves saved
+        # in it rather than fitting them again. Any other arguments override the values in the profile.
+
+        return cls(**{**calibration.load_profile(filename, "BrachioGraph"), **kwargs})
+
+
+    def save_profile(self, filename, samples=None):
+
+        # Saves everything needed to recreate this BrachioGraph - including the fitted calibration curves - as a
+        # calibration profile, along with the raw samples if supplied.
+
+        calibration.save_profile(
+            filename,
+            "BrachioGraph",
+            {
+                "inner_arm": self.INNER_ARM,
+                "outer_arm": self.OUTER_ARM,
+                "bounds": self.bounds and [float(value) for value in self.bounds],
+                "servo_1_angle_pws": [list(sample) for sample in self.servo_1_angle_pws],
+                "servo_2_angle_pws": [list(sample) for sample in self.servo_2_angle_pws],
+                "servo_1_angle_pws_bidi": [list(sample) for sample in self.servo_1_angle_pws_bidi],
+                "servo_2_angle_pws_bidi": [list(sample) for sample in self.servo_2_angle_pws_bidi],
+                "servo_1_zero": self.servo_1_zero,
+                "servo_2_zero": self.servo_2_zero,
+                "servo_1_fit": self.servo_1_fit,
+                "servo_2_fit": self.servo_2_fit,
+                "pw_up": self.pen.pw_up,
+                "pw_down": self.pen.pw_down,
+                "max_angular_velocity": self.max_angular_velocity,
+                "max_angular_acceleration": self.max_angular_acceleration,
+            },
+            samples,
+        )
+
+
     # ----------------- manual driving methods -----------------
 
-    def drive(self):
+    def drive(self, samples=None):
+
+        # Adjust the pulse-widths using the keyboard. If a list of samples is supplied, pressing "r" asks for the
+        # angles the arms are at, and adds ((angle_1, pulse_width_1), (angle_2, pulse_width_2)) to it.
 
-        # adjust the pulse-widths using the keyboard
+        import readchar
 
         pw_1, pw_2 = self.get_pulse_widths()
 
@@ -482,6 +1196,11 @@ class BrachioGraph:
                 pw_2 = pw_2 - 1
             elif key=="L":
                 pw_2 = pw_2 + 1
+            elif key=="r" and samples is not None:
+                angle_1 = float(input("Angle of the shoulder motor: "))
+                angle_2 = float(input("Angle of the elbow motor: "))
+                samples.append(((angle_1, pw_1), (angle_2, pw_2)))
+                print("Recorded", len(samples), "samples.")
 
             print(pw_1, pw_2)
 
@@ -492,6 +1211,8 @@ class BrachioGraph:
 
         # move the pen up/down and left/right using the keyboard
 
+        import readchar
+
         while True:
             key = readchar.readchar()
 
@@ -519,6 +1240,120 @@ class BrachioGraph:
             self.xy(self.current_x, self.current_y)
 
 
+class PulseWidthGrid:
+
+    # A grid of precomputed pulse-widths for both servos, covering the bounds of a BrachioGraph. Pulse-widths for
+    # positions between the points of the grid are found by bilinear interpolation. The grid is saved in the
+    # grid_folder, under a name derived from the arm lengths, calibration, bounds and resolution, so it only needs to
+    # be computed once for each machine.
+
+    def __init__(self, ag, resolution=.05):
+
+        self.ag = ag
+        self.resolution = resolution
+
+        # the fitted curves are part of the calibration too - a profile loaded with from_profile() supplies them
+        # without any measured pulse-widths
+        key = json.dumps([
+            ag.INNER_ARM, ag.OUTER_ARM,
+            ag.servo_1_angle_pws, ag.servo_2_angle_pws,
+            ag.servo_1_angle_pws_bidi, ag.servo_2_angle_pws_bidi,
+            ag.servo_1_fit, ag.servo_2_fit,
+            ag.servo_1_zero, ag.servo_2_zero,
+            list(ag.bounds), resolution,
+        ], sort_keys=True)
+        self.filename = os.path.join(grid_folder, hashlib.sha1(key.encode()).hexdigest() + ".npz")
+
+        try:
+            self.load()
+
+        except FileNotFoundError:
+            self.compute()
+            self.save()
+
+
+    def compute(self):
+
+        import numpy
+
+        bounds = self.ag.bounds
+
+        # the grid extends one step beyond the bounds on each side, so that every point inside them can be interpolated
+        self.x_0 = bounds[0] - self.resolution
+        self.y_0 = bounds[1] - self.resolution
+
+        xs = self.x_0 + numpy.arange(int((bounds[2] - bounds[0]) / self.resolution) + 3) * self.resolution
+        ys = self.y_0 + numpy.arange(int((bounds[3] - bounds[1]) / self.resolution) + 3) * self.resolution
+
+        self.pw_1, self.pw_2 = self.exact_pulse_widths(*numpy.meshgrid(xs, ys))
+
+        # measure the worst interpolation error, which will be found midway between the points of the grid
+        mid_x, mid_y = numpy.meshgrid(xs[:-1] + self.resolution / 2, ys[:-1] + self.resolution / 2)
+
+        exact_1, exact_2 = self.exact_pulse_widths(mid_x, mid_y)
+        interpolated_1, interpolated_2 = self.batch_pulse_widths(mid_x, mid_y)
+
+        self.max_error = float(numpy.nanmax(
+            numpy.maximum(numpy.abs(exact_1 - interpolated_1), numpy.abs(exact_2 - interpolated_2))
+        ))
+
+
+    def exact_pulse_widths(self, x, y):
+
+        angle_1, angle_2 = self.ag.batch_xy_to_angles(x, y)
+
+        return self.ag.angles_to_pw_1(angle_1), self.ag.angles_to_pw_2(angle_2)
+
+
+    def save(self):
+
+        import numpy
+
+        os.makedirs(grid_folder, exist_ok=True)
+
+        numpy.savez(
+            self.filename,
+            origin=(self.x_0, self.y_0),
+            pw_1=self.pw_1,
+            pw_2=self.pw_2,
+            max_error=self.max_error,
+        )
+
+
+    def load(self):
+
+        import numpy
+
+        with numpy.load(self.filename) as grid:
+            self.x_0, self.y_0 = grid["origin"]
+            self.pw_1, self.pw_2 = grid["pw_1"], grid["pw_2"]
+            self.max_error = float(grid["max_error"])
+
+
+    def batch_pulse_widths(self, x, y):
+
+        # Returns the pulse-widths for arrays of x/y positions; positions not covered by the grid are NaN.
+
+        import numpy
+
+        column, x_fraction = numpy.divmod((numpy.asarray(x) - self.x_0) / self.resolution, 1)
+        row, y_fraction = numpy.divmod((numpy.asarray(y) - self.y_0) / self.resolution, 1)
+
+        outside = (column < 0) | (column >= self.pw_1.shape[1] - 1) | (row < 0) | (row >= self.pw_1.shape[0] - 1)
+
+        column = numpy.clip(column, 0, self.pw_1.shape[1] - 2).astype(int)
+        row = numpy.clip(row, 0, self.pw_1.shape[0] - 2).astype(int)
+
+        pulse_widths = []
+
+        for grid in (self.pw_1, self.pw_2):
+            bottom = grid[row, column] * (1 - x_fraction) + grid[row, column + 1] * x_fraction
+            top = grid[row + 1, column] * (1 - x_fraction) + grid[row + 1, column + 1] * x_fraction
+            pulse_widths.append(numpy.where(outside, numpy.nan, bottom * (1 - y_fraction) + top * y_fraction))
+
+        return tuple(pulse_widths)
+
+
 class Pen:
 
     def __init__(self, ag, pw_up=1500, pw_down=1100, pin=18, transition_time=0.25):
@@ -529,8 +1364,21 @@ class Pen:
         self.pw_down = pw_down
         self.transition_time = transition_time
 
-        self.rpi = pigpio.pi()
-        self.rpi.set_PWM_frequency(self.pin, 50)
+        # "up", "down", or None if we don't know
+        self.position = None
+
+
+    @property
+    def rpi(self):
+
+        # the pen shares the BrachioGraph's connection to pigpio
+
+        return self.ag.rpi
+
+
+    def test(self):
+
+        # raises and lowers the pen, to show that it's working
 
         self.up()
         sleep(0.3)
@@ -541,11 +1389,25 @@ class Pen:
 
 
     def down(self):
+
+        # if the pen is already down, there's no need to wait for it to get there
+        if self.position == "down":
+            return
+
         self.rpi.set_servo_pulsewidth(self.pin, self.pw_down)
-        sleep(self.transition_time)
+        self.ag.profiler.count("pen_transitions")
+        self.ag.profiler.count("daemon_calls")
+        self.ag.profiler.sleep(self.transition_time, "pen")
+        self.position = "down"
 
 
     def up(self):
-        self.rpi.set_servo_pulsewidth(self.pin, self.pw_up)
 
-        sleep(self.transition_time)
+        if self.position == "up":
+            return
+
+        self.rpi.set_servo_pulsewidth(self.pin, self.pw_up)
+        self.ag.profiler.count("pen_transitions")
+        self.ag.profiler.count("daemon_calls")
+        self.ag.profiler.sleep(self.transition_time, "pen")
+        self.position = "up"
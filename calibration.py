@@ -0,0 +1,203 @@
+# Calibration profiles: everything that's known about a particular machine, saved in a single file.
+#
+# A profile is a JSON file holding the values needed to create a plotter - arm lengths, bounds, pen pulse-widths and
+# the servo calibration - along with the raw angle/pulse-width samples it was derived from, and the fitted
+# calibration curves, so that they don't need to be fitted again every time the plotter is created:
+#
+#     bg = BrachioGraph.from_profile("profiles/brachiograph.json")
+#
+# Profiles can be recorded interactively from the command line:
+#
+#     python calibration.py brachiograph --inner 8 --outer 8 -o profiles/brachiograph.json
+#     python calibration.py pantograph -o profiles/pantograph.json
+
+import argparse
+import json
+import os
+
+
+def fit_servo(angle_pws, degree=3):
+
+    # Fits polynomial curves to a servo's angle/pulse-width samples: one giving the pulse-width for an angle, and one
+    # (the inverse) giving the angle the servo will really reach for a pulse-width. Returns the fit as a dictionary that
+    # can be saved as JSON.
+
+    import numpy
+
+    samples = numpy.array(angle_pws, dtype=float)
+
+    return {
+        "angle_range": [float(samples[:, 0].min()), float(samples[:, 0].max())],
+        "angles_to_pw": numpy.polyfit(samples[:, 0], samples[:, 1], degree).tolist(),
+        "pw_to_angles": numpy.polyfit(samples[:, 1], samples[:, 0], degree).tolist(),
+    }
+
+
+def fit_servo_bidi(angle_pws_bidi, degree=3):
+
+    # Fits curves to a servo's samples measured in both directions: (angle, pulse-width reaching it with the angle
+    # increasing, pulse-width reaching it with the angle decreasing). As well as the curves fit_servo() fits, through
+    # the midpoints of each pair of pulse-widths, the fit includes a curve for each direction, so that the planner
+    # can compensate for the servo's hysteresis.
+
+    import numpy
+
+    angles, increasing, decreasing = numpy.array(angle_pws_bidi, dtype=float).T
+
+    fit = fit_servo(numpy.column_stack((angles, (increasing + decreasing) / 2)), degree)
+    fit["angles_to_pw_increasing"] = numpy.polyfit(angles, increasing, degree).tolist()
+    fit["angles_to_pw_decreasing"] = numpy.polyfit(angles, decreasing, degree).tolist()
+
+    return fit
+
+
+def pair_directions(angle_pws):
+
+    # Turns angle/pulse-width samples in which each angle has been recorded twice - once arriving at it from each
+    # side - into (angle, pulse-width with the angle increasing, pulse-width with the angle decreasing) samples, as
+    # used by fit_servo_bidi(). Because of the servo's dead band, arriving with the angle increasing takes the
+    # pulse-width that is further in the direction of increasing angles. Angles not recorded twice are left out.
+
+    import numpy
+
+    samples = numpy.array(angle_pws, dtype=float)
+
+    # 1 if the pulse-width increases with the angle, -1 if it decreases
+    slope = numpy.sign(numpy.polyfit(samples[:, 0], samples[:, 1], 1)[0])
+
+    pulse_widths = {}
+
+    for angle, pulse_width in angle_pws:
+        pulse_widths.setdefault(angle, []).append(pulse_width)
+
+    return [
+        (angle, *sorted(pair, key=lambda pulse_width: -slope * pulse_width))
+        for angle, pair in sorted(pulse_widths.items()) if len(pair) == 2
+    ]
+
+
+def save_profile(filename, plotter, parameters, samples=None):
+
+    # Saves a profile: the name of the kind of plotter, the parameters needed to create it, and the raw samples.
+
+    folder = os.path.dirname(filename)
+
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    with open(filename, "w") as profile_file:
+        json.dump({"plotter": plotter, "parameters": parameters, "samples": samples}, profile_file, indent=4)
+
+
+def load_profile(filename, plotter):
+
+    # Returns the parameters saved in a profile, checking that it's for the right kind of plotter.
+
+    with open(filename) as profile_file:
+        profile = json.load(profile_file)
+
+    if profile["plotter"] != plotter:
+        raise ValueError("{} is a profile for a {}, not a {}.".format(filename, profile["plotter"], plotter))
+
+    return profile["parameters"]
+
+
+def record_brachiograph(args):
+
+    # Drives the arms of a BrachioGraph to known angles using the keyboard, recording the pulse-widths for each, and
+    # saves a profile with the resulting calibration.
+
+    from brachiograph import BrachioGraph
+
+    bg = BrachioGraph(inner_arm=args.inner or 8, outer_arm=args.outer or 8, pw_up=args.pw_up, pw_down=args.pw_down)
+
+    print("""---------------------------------------------------------
+Controls:
+
+    a and s: decrease/increase the pulse width of the shoulder motor by 10µS (A and S: by 1µS)
+    k and l: decrease/increase the pulse width of the elbow motor by 10µS (K and L: by 1µS)
+    r      : record the pulse widths against the angles of the arms
+    0      : finish
+--------------------------------------------------------- \n""")
+
+    if args.bidirectional:
+        print("Record each angle twice: once arriving at it with the angle increasing, and once with it decreasing.\n")
+
+    samples = []
+    bg.drive(samples=samples)
+    bg.quiet()
+
+    servo_1_angle_pws = sorted(sample[0] for sample in samples)
+    servo_2_angle_pws = sorted(sample[1] for sample in samples)
+
+    # if each angle was recorded from both sides, the servos' hysteresis can be compensated for too
+    if args.bidirectional:
+        servo_1_angle_pws_bidi = pair_directions(servo_1_angle_pws)
+        servo_2_angle_pws_bidi = pair_directions(servo_2_angle_pws)
+    else:
+        servo_1_angle_pws_bidi = servo_2_angle_pws_bidi = []
+
+    # the BrachioGraph with the new calibration is only used to work out the bounds and save the profile, so it
+    # won't touch the hardware
+    calibrated = BrachioGraph(
+        inner_arm=bg.INNER_ARM,
+        outer_arm=bg.OUTER_ARM,
+        bounds=args.bounds or "auto",
+        servo_1_angle_pws=servo_1_angle_pws,
+        servo_2_angle_pws=servo_2_angle_pws,
+        servo_1_angle_pws_bidi=servo_1_angle_pws_bidi,
+        servo_2_angle_pws_bidi=servo_2_angle_pws_bidi,
+        pw_up=args.pw_up,
+        pw_down=args.pw_down,
+    )
+
+    calibrated.save_profile(args.output, samples=samples)
+
+    print("Saved the profile, with bounds {}, to {}.".format(calibrated.bounds, args.output))
+
+
+def record_pantograph(args):
+
+    # Runs the PantoGraph's interactive set-up, and saves a profile with the resulting calibration.
+
+    from pantograph import PantoGraph
+
+    # only the values given on the command line override the PantoGraph's defaults
+    parameters = {"driver": args.inner, "follower": args.outer, "box_bounds": args.bounds}
+
+    if args.motors:
+        parameters["motor_1_pos"], parameters["motor_2_pos"] = args.motors
+
+    pg = PantoGraph(**{name: value for name, value in parameters.items() if value is not None})
+
+    pg.set_up()
+    pg.quiet()
+
+    pg.save_profile(args.output)
+
+    print("Saved the profile to {}.".format(args.output))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record a calibration profile for a plotter.")
+    parser.add_argument("plotter", choices=["brachiograph", "pantograph"], help="The kind of plotter")
+    parser.add_argument("-o", "--output", required=True, help="The profile file to save")
+    parser.add_argument("--inner", type=float, help="BrachioGraph inner arm / PantoGraph driver length")
+    parser.add_argument("--outer", type=float, help="BrachioGraph outer arm / PantoGraph follower length")
+    parser.add_argument("--motors", type=float, nargs=2, help="PantoGraph motor x positions")
+    parser.add_argument(
+        "--bounds", type=float, nargs=4, help="The drawing area (computed for a BrachioGraph if omitted)"
+    )
+    parser.add_argument("--pw-up", type=int, default=1500, help="BrachioGraph pen-up pulse-width")
+    parser.add_argument("--pw-down", type=int, default=1100, help="BrachioGraph pen-down pulse-width")
+    parser.add_argument(
+        "--bidirectional", action="store_true",
+        help="BrachioGraph angles are recorded from both directions, to compensate for the servos' hysteresis"
+    )
+
+    args = parser.parse_args()
+
+    if args.plotter == "brachiograph":
+        record_brachiograph(args)
+    else:
+        record_pantograph(args)
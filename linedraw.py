@@ -2,8 +2,11 @@ from random import *
 import math
 import argparse
 import json
+import colorsys
 
-from PIL import Image, ImageDraw, ImageOps
+# PIL, numpy and openCV (and strokes, which needs numpy) are imported in the functions that use them, so that
+# importing linedraw is quick - importing openCV alone can take seconds on a Pi Zero.
+import profiling
 
 # from filters import *
 # from strokesort import *
@@ -14,6 +17,10 @@ export_path = "images/out.svg"
 svg_folder = "images/"
 json_folder = "images/"
 
+# instrumentation, to show where the time in vectorising an image goes: set profiler.enabled = True, and after
+# vectorise() use profiler.report(), profiler.to_json() or profiler.to_prometheus()
+profiler = profiling.Profiler()
+
 # vectorisation defaults
 draw_contours = True
 draw_hatch = True
@@ -21,12 +28,28 @@ resolution = 1024
 hatch_size = 16
 contour_simplify = 1
 
-try:
-    import numpy as np
-    import cv2
-except:
-    print("Cannot import numpy/openCV. Switching to NO_CV mode.")
-    no_cv = True
+# the layers of scanline hatching: each is a brightness below which the image is hatched, and the angle of the lines
+scanline_layers = [(144, 0), (64, 45), (16, -45)]
+
+
+def opencv():
+
+    # Returns the cv2 module, importing it the first time it's needed - or None, in NO_CV mode. Setting no_cv = True
+    # beforehand avoids trying to import it at all.
+
+    global no_cv
+
+    if no_cv:
+        return None
+
+    try:
+        import cv2
+    except ImportError:
+        print("Cannot import openCV. Switching to NO_CV mode.")
+        no_cv = True
+        return None
+
+    return cv2
 
 
 def image_to_json(
@@ -36,6 +59,11 @@ def image_to_json(
     hatch_size = 16,
     draw_contours=True,
     contour_simplify=1,
+    simplify=0,
+    hatch_spacing=None,
+    max_hatch_length=None,
+    hatch_method="cells",
+    tile_size=None,
     ):
 
     lines=vectorise(
@@ -45,37 +73,96 @@ def image_to_json(
         hatch_size=hatch_size,
         draw_contours=draw_contours,
         contour_simplify=contour_simplify,
+        simplify=simplify,
+        hatch_spacing=hatch_spacing,
+        max_hatch_length=max_hatch_length,
+        hatch_method=hatch_method,
+        tile_size=tile_size,
         )
     filename = json_folder + image_filename + ".json"
     lines_to_file(lines, filename)
 
 
-def draw(lines):
-    from tkinter import Tk, LEFT
-    from turtle import Canvas, RawTurtle, TurtleScreen
+def draw(lines, filename=None, **kwargs):
+
+    # Shows a preview of the lines, or saves it if a filename is supplied. See render() for the other options.
+
+    image = render(lines, filename=filename, **kwargs)
+
+    if not filename:
+        image.show()
+
+
+def render(
+    lines, filename=None, size=1024, margin=16, width=1, show_travel=False, show_order=False, reference=None
+):
+
+    # Renders the lines offscreen, drawing each line as a single polyline, and returns the image (saving it too, if a
+    # filename is supplied).
+    #
+    # * show_travel: draw the pen-up moves between lines in a light red
+    # * show_order: colour the lines according to the order in which they'll be drawn, from blue to red
+    # * reference: another set of lines to draw underneath in grey, for comparison
 
-    # set up the environment
-    root = Tk()
-    canvas = Canvas(root, width=800, height=800)
-    canvas.pack()
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    import strokes
+
+    lines = strokes.Strokes.from_lines(lines)
+    reference = strokes.Strokes.from_lines(reference or [])
+
+    points = np.concatenate((lines.points, reference.points))
+
+    if not len(points):
+        return Image.new("RGB", (size, size), "white")
+
+    (min_x, min_y), (max_x, max_y) = points.min(axis=0), points.max(axis=0)
+
+    scale = (size - 2 * margin) / (max(max_x - min_x, max_y - min_y) or 1)
+
+    image = Image.new(
+        "RGB",
+        (int((max_x - min_x) * scale) + 2 * margin + 1, int((max_y - min_y) * scale) + 2 * margin + 1),
+        "white"
+    )
+    canvas = ImageDraw.Draw(image)
 
-    s = TurtleScreen(canvas)
+    # the lines in image co-ordinates - transformed all at once - each as a flat list of x, y values
+    def to_image(lines):
+        transformed = strokes.Strokes((lines.points - (min_x, min_y)) * scale + margin, lines.offsets)
+        return [line.ravel().tolist() for line in transformed]
 
-    t = RawTurtle(canvas)
-    t.speed(0)
-    t.width(1)
+    for xy in to_image(reference):
+        canvas.line(xy, fill="silver")
 
-    for line in lines:
-        x, y = line[0]
-        t.up()
-        t.goto(x*800/1024-400,-(y*800/1024-400))
-        for point in line:
-            t.down()
-            t.goto(point[0]*800/1024-400,-(point[1]*800/1024-400))
+    previous_point = None
 
-    s.mainloop()
+    for index, xy in enumerate(to_image(lines)):
 
+        if show_travel and previous_point:
+            canvas.line(previous_point + xy[:2], fill=(255, 160, 160), width=1)
 
+        if show_order:
+            red, green, blue = colorsys.hsv_to_rgb(0.66 * (1 - index / len(lines)), 1, 0.8)
+            colour = (int(red * 255), int(green * 255), int(blue * 255))
+        else:
+            colour = "black"
+
+        if len(xy) > 2:
+            canvas.line(xy, fill=colour, width=width)
+        else:
+            canvas.point(xy, fill=colour)
+
+        previous_point = xy[-2:]
+
+    if filename:
+        image.save(filename)
+
+    return image
+
+
+@profiler.job("vectorise")
 def vectorise(
     image_filename,
     resolution=1024,
@@ -83,8 +170,171 @@ def vectorise(
     hatch_size = 16,
     draw_contours=True,
     contour_simplify=1,
+    simplify=0,
+    hatch_spacing=None,
+    max_hatch_length=None,
+    hatch_method="cells",
+    tile_size=None,
+    schedule="greedy",
+    schedule_tiles=4,
     ):
 
+    # * schedule: "greedy" sorts the contours and the hatching separately, so that the pen sweeps the page twice;
+    #   "tiles" divides the drawing into schedule_tiles x schedule_tiles tiles, and draws all the lines of each one -
+    #   contours and hatching - before moving on to the next, taking the tiles in Hilbert-curve order (see
+    #   tile_sortlines()). The pen-up travel is reported, so that the two can be compared.
+
+    import strokes
+
+    lines = strokes.Strokes()
+
+    for batch in stream_vectorise(
+        image_filename,
+        resolution=resolution,
+        draw_hatch=draw_hatch,
+        hatch_size=hatch_size,
+        draw_contours=draw_contours,
+        contour_simplify=contour_simplify,
+        hatch_spacing=hatch_spacing,
+        max_hatch_length=max_hatch_length,
+        hatch_method=hatch_method,
+        tile_size=tile_size,
+        sort=schedule != "tiles",
+    ):
+        lines += batch
+
+    if schedule == "tiles":
+        lines = tile_sortlines(lines, drawing_extent(image_filename, resolution), schedule_tiles)
+
+    if simplify:
+        with profiler.timer("simplifying"):
+            lines = strokes.simplify_lines(lines, simplify, report=True)
+
+    profiler.count("strokes", len(lines))
+    profiler.count("points", len(lines.points))
+    profiler.count("pen_up_travel", round(lines.travel()))
+
+    f = open(svg_folder + image_filename + ".svg",'w')
+    f.write(makesvg(lines))
+    f.close()
+    print(len(lines), "strokes,", len(lines.points), "points,", round(lines.travel()), "pen-up travel.")
+    print("done.")
+    return lines
+
+
+def stream_vectorise(
+    image_filename,
+    resolution=1024,
+    draw_hatch=True,
+    hatch_size = 16,
+    draw_contours=True,
+    contour_simplify=1,
+    simplify=0,
+    hatch_spacing=None,
+    max_hatch_length=None,
+    hatch_method="cells",
+    tile_size=None,
+    band_height=None,
+    sort=True,
+    ):
+
+    # Vectorises the image a piece at a time, yielding each piece as sorted Strokes as soon as it's ready - first the
+    # contours, then the hatching - so that a plotter can start drawing long before the whole image is done. Each
+    # piece is sorted to start close to where the last one ended. All the pieces lie within drawing_extent().
+    #
+    # * band_height: if given, the hatching is done in horizontal bands of this height (in pixels at the
+    #   resolution), each yielded as it's finished; scanline hatching is yielded a layer at a time. With
+    #   max_hatch_length, each band is thinned to its share of the length.
+    # * sort: if False, the pieces are yielded unsorted, to be scheduled as a whole later.
+
+    import strokes
+
+    image = load_image(image_filename)
+    w,h = image.size
+
+    position = None
+
+    def sorted_piece(lines):
+
+        # sorts the piece, starting from where the last one ended, and simplifies it if required
+
+        nonlocal position
+
+        if sort:
+            lines = sortlines(lines, start=position)
+        else:
+            lines = strokes.Strokes.from_lines(lines)
+
+        if simplify:
+            with profiler.timer("simplifying"):
+                lines = strokes.simplify_lines(lines, simplify)
+
+        if len(lines):
+            position = lines.ends[-1]
+
+        return lines
+
+    if draw_contours:
+        yield sorted_piece(getcontours(
+            image.resize((int(resolution/contour_simplify), int(resolution/contour_simplify*h/w))),
+            contour_simplify,
+            tile_size,
+        ))
+
+    if draw_hatch and hatch_method == "scanline":
+        hatch_image = image.resize((int(resolution), int(resolution*h/w)))
+
+        # scanline hatching can't be divided into bands, but each layer can be done separately - unless the layers
+        # must all be thinned together to fit max_hatch_length
+        if band_height and not max_hatch_length:
+            pieces = [[layer] for layer in scanline_layers]
+        else:
+            pieces = [scanline_layers]
+
+        for layers in pieces:
+            yield sorted_piece(
+                scanline_hatch(hatch_image, hatch_spacing or hatch_size/2, layers=layers, max_length=max_hatch_length)
+            )
+
+    elif draw_hatch:
+        hatch_image = image.resize((int(resolution/hatch_size), int(resolution/hatch_size*h/w)))
+        rows = hatch_image.size[1]
+
+        # the number of rows of cells in each band
+        band_rows = max(1, int(band_height / hatch_size)) if band_height else rows
+
+        # Thinning each band to a share of max_hatch_length would make the spacing jump from band to band, wherever
+        # they differ in how dark they are. Instead, the spacing that fits the whole image is worked out first - from
+        # the cells alone, which is quick - and every band is thinned to it.
+        band_max_length = max_hatch_length
+
+        if max_hatch_length and band_rows < rows:
+            hatch_spacing = thinned_spacing(
+                *hatch_cells(hatch_image, hatch_size), hatch_size, hatch_spacing, max_hatch_length
+            )
+            band_max_length = None
+
+        for top in range(0, rows, band_rows):
+            bottom = min(top + band_rows, rows)
+
+            yield sorted_piece(
+                hatch(
+                    hatch_image.crop((0, top, hatch_image.size[0], bottom)),
+                    hatch_size,
+                    hatch_spacing,
+                    band_max_length,
+                    top=top,
+                )
+            )
+
+
+def load_image(image_filename):
+
+    # Opens the image - looking for it in the images folder too, with or without an extension - and returns it in
+    # greyscale, with its contrast maximised.
+
+    from PIL import Image, ImageOps
+
     image = None
     possible = [
         image_filename,
@@ -100,48 +350,34 @@ def vectorise(
             break
         except:
             pass
-    w,h = image.size
 
     # convert the image to greyscale
     image = image.convert("L")
 
     # maximise contrast
-    image=ImageOps.autocontrast(image, 10)
+    return ImageOps.autocontrast(image, 10)
 
-    lines = []
 
-    if draw_contours:
-        lines += sortlines(getcontours(
-            image.resize((int(resolution/contour_simplify), int(resolution/contour_simplify*h/w))),
-            contour_simplify,
-        ))
+def drawing_extent(image_filename, resolution=1024):
 
-    if draw_hatch:
-        lines += sortlines(
-            hatch(
-                # image,
-                image.resize((int(resolution/hatch_size), int(resolution/hatch_size*h/w))),
-                hatch_size,
-            )
-        )
+    # The rectangle - (min x, min y, max x, max y) - within which the lines vectorised from the image at the
+    # resolution lie. Pieces of the drawing from stream_vectorise() can be fitted to a plotter by this, rather than
+    # by their own bounds, so that each is placed where it belongs in the whole.
 
-    f = open(svg_folder + image_filename + ".svg",'w')
-    f.write(makesvg(lines))
-    f.close()
-    segments = 0
-    for line in lines:
-        segments = segments + len(line)
-    print(len(lines), "strokes,", segments, "points.")
-    print("done.")
-    return lines
+    w,h = load_image(image_filename).size
+
+    return (0, 0, resolution, resolution*h/w)
 
 
 def find_edges(image):
     print("finding edges...")
+    cv2 = opencv()
     if no_cv:
         #appmask(IM,[F_Blur])
         appmask(image,[F_SobelX,F_SobelY])
     else:
+        import numpy as np
+        from PIL import Image
         im = np.array(image)
         im = cv2.GaussianBlur(im,(3,3),0)
         im = cv2.Canny(im,100,200)
@@ -201,19 +437,15 @@ def connectdots(dots):
     return contours
 
 
-def getcontours(IM,sc=2):
+@profiler.timed("contours")
+def getcontours(IM,sc=2,tile_size=None,overlap=16,processes=None):
     print("generating contours...")
-    IM = find_edges(IM)
-    IM1 = IM.copy()
-    IM2 = IM.rotate(-90,expand=True).transpose(Image.FLIP_LEFT_RIGHT)
-    dots1 = getdots(IM1)
-    contours1 = connectdots(dots1)
-    dots2 = getdots(IM2)
-    contours2 = connectdots(dots2)
 
-    for i in range(len(contours2)):
-        contours2[i] = [(c[1],c[0]) for c in contours2[i]]
-    contours = contours1+contours2
+    # large images can be split into tiles, processed in parallel
+    if tile_size and max(IM.size) > tile_size:
+        contours = tiled_contours(IM, tile_size, overlap, processes)
+    else:
+        contours = image_contours(IM)
 
     for i in range(len(contours)):
         for j in range(len(contours)):
@@ -234,8 +466,105 @@ def getcontours(IM,sc=2):
     return contours
 
 
-def hatch(IM,sc=16):
+def image_contours(IM):
+    from PIL import Image
+    IM = find_edges(IM)
+    IM1 = IM.copy()
+    IM2 = IM.rotate(-90,expand=True).transpose(Image.FLIP_LEFT_RIGHT)
+    dots1 = getdots(IM1)
+    contours1 = connectdots(dots1)
+    dots2 = getdots(IM2)
+    contours2 = connectdots(dots2)
+
+    for i in range(len(contours2)):
+        contours2[i] = [(c[1],c[0]) for c in contours2[i]]
+    return contours1+contours2
+
+
+def tiled_contours(IM, tile_size=1024, overlap=16, processes=None):
+
+    # Splits the image into tiles, and finds the contours in each in a pool of processes (by default, one for each
+    # CPU core).
+    #
+    # Each tile is processed together with an overlapping margin from its neighbours, so that edges and contours
+    # running across the seam are found just as they would be in the whole image - but only the parts of contours
+    # that fall within the tile itself are kept, so that nothing is drawn twice. The pieces of a contour that crosses
+    # a seam end and start at neighbouring pixels either side of it, and are joined up again by getcontours().
+
+    from multiprocessing import Pool
+
+    w,h = IM.size
+    tiles = []
+
+    for top in range(0, h, tile_size):
+        for left in range(0, w, tile_size):
+            core = (left, top, min(left + tile_size, w), min(top + tile_size, h))
+            box = (max(left - overlap, 0), max(top - overlap, 0), min(core[2] + overlap, w), min(core[3] + overlap, h))
+            tiles.append((IM.crop(box), box, core))
+
+    print("processing", len(tiles), "tiles...")
+
+    with Pool(processes) as pool:
+        results = pool.map(tile_contours, tiles)
+
+    return [contour for contours in results for contour in contours]
+
+
+def tile_contours(tile):
+    IM, box, core = tile
+    pieces = []
+
+    for contour in image_contours(IM):
+        piece = []
+        for x, y in contour:
+            x, y = x + box[0], y + box[1]
+            if core[0] <= x < core[2] and core[1] <= y < core[3]:
+                piece.append((x, y))
+            elif piece:
+                pieces.append(piece)
+                piece = []
+        if piece:
+            pieces.append(piece)
+
+    return pieces
+
+
+@profiler.timed("hatching")
+def hatch(IM,sc=16,spacing=None,max_length=None,top=0):
+
+    # top is the row of cells at which IM starts, if it's a band of a larger image that is being hatched in bands
+
     print("hatching...")
+
+    lg1, lg2 = hatch_cells(IM, sc, top)
+
+    if spacing or max_length:
+        lg1, lg2 = thin_hatch(lg1, lg2, sc, spacing, max_length)
+
+    print("wrangling points...")
+    lines = [lg1,lg2]
+
+
+    # The purpose if this is still unclear...
+
+    for k in range(0,len(lines)):
+        for i in range(0,len(lines[k])):
+            for j in range(0,len(lines[k])):
+                if lines[k][i] != [] and lines[k][j] != []:
+                    if lines[k][i][-1] == lines[k][j][0]:
+                        lines[k][i] = lines[k][i]+lines[k][j][1:]
+                        lines[k][j] = []
+        lines[k] = [l for l in lines[k] if len(l) > 0]
+    lines = lines[0]+lines[1]
+
+    return lines
+
+
+def hatch_cells(IM, sc=16, top=0):
+
+    # The hatch lines for each cell of the image, according to its brightness: the horizontal lines and the
+    # diagonal lines, before they are thinned or joined up.
+
     PX = IM.load()
     w,h = IM.size
     lg1 = []
@@ -245,7 +574,7 @@ def hatch(IM,sc=16):
         for y0 in range(h):
             # print("    reading y", x0)
             x = x0 * sc
-            y = y0 * sc
+            y = (y0 + top) * sc
 
 
 
@@ -268,68 +597,143 @@ def hatch(IM,sc=16):
                 lg1.append([(x,y+sc/2+sc/4),(x+sc,y+sc/2+sc/4)])  # horizontal lines with additional offset
                 lg2.append([(x+sc,y),(x,y+sc)])                   # diagonal lines, left
 
-    print("wrangling points...")
-    lines = [lg1,lg2]
+    return lg1, lg2
 
 
-    # The purpose if this is still unclear...
+@profiler.timed("hatching")
+def scanline_hatch(IM, spacing=8, layers=scanline_layers, max_length=None, min_length=2):
 
-    for k in range(0,len(lines)):
-        for i in range(0,len(lines[k])):
-            for j in range(0,len(lines[k])):
-                if lines[k][i] != [] and lines[k][j] != []:
-                    if lines[k][i][-1] == lines[k][j][0]:
-                        lines[k][i] = lines[k][i]+lines[k][j][1:]
-                        lines[k][j] = []
-        lines[k] = [l for l in lines[k] if len(l) > 0]
-    lines = lines[0]+lines[1]
+    # Hatches the image along parallel scanlines, for each of the layers: wherever a scanline crosses a run of
+    # pixels darker than the layer's threshold, a single straight stroke is drawn. All the scanlines for a layer are
+    # sampled at once. This produces far fewer - and longer - strokes than hatching cell by cell.
+    #
+    # * spacing: the distance between scanlines
+    # * layers: a list of (threshold, angle in degrees) pairs
+    # * max_length: the maximum total length of the hatch lines; the spacing is increased until they fit
+    # * min_length: runs shorter than this are ignored
+
+    import numpy as np
+
+    print("hatching along scanlines...")
+    pixels = np.asarray(IM, dtype=float)
+    h, w = pixels.shape
+    reach = math.hypot(w, h) / 2
+
+    while True:
+
+        lines = []
+
+        for threshold, angle in layers:
+
+            dark = pixels < threshold
+
+            # the scanlines are centred on the middle of the image, and long enough to cover it at any angle
+            along_x, along_y = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+            offsets = np.arange(-reach, reach, spacing)[:, None]
+            positions = np.arange(-reach, reach + 1)[None, :]
+
+            xs = w/2 + positions * along_x - offsets * along_y
+            ys = h/2 + positions * along_y + offsets * along_x
+
+            columns, rows = np.floor(xs).astype(int), np.floor(ys).astype(int)
+            inside = (columns >= 0) & (columns < w) & (rows >= 0) & (rows < h)
+
+            samples = np.zeros(xs.shape, dtype=bool)
+            samples[inside] = dark[rows[inside], columns[inside]]
+
+            # find where each run of dark samples starts and ends along each scanline
+            changes = np.diff(np.pad(samples, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+            start_rows, starts = np.nonzero(changes == 1)
+            end_rows, ends = np.nonzero(changes == -1)
+
+            long_enough = ends - starts >= min_length
+            start_rows, starts, ends = start_rows[long_enough], starts[long_enough], ends[long_enough] - 1
+
+            lines += [
+                [(x0, y0), (x1, y1)] for x0, y0, x1, y1 in zip(
+                    xs[start_rows, starts].tolist(), ys[start_rows, starts].tolist(),
+                    xs[start_rows, ends].tolist(), ys[start_rows, ends].tolist(),
+                )
+            ]
+
+        length = sum(distsum(*line) for line in lines)
+
+        if not max_length or length <= max_length or spacing > reach:
+            break
+
+        spacing = spacing * 1.25
+
+    print(len(lines), "hatch strokes at a spacing of {:.1f}, length {:.0f}.".format(spacing, length))
 
     return lines
 
-    # The next section is an experimental routine to simplify and discard
-    # lines, to make the hatching more efficient and less dense. It's disabled, because
-    # it doesn't discard lines evenly.
 
-    print("simplifying and discarding lines...")
-    new_lines = []
+def thin_hatch(horizontal, diagonal, sc=16, spacing=None, max_length=None):
+
+    # Thins the hatch lines (before they are joined up) to reduce their density. Rather than discarding lines here
+    # and there, this keeps only every nth row of horizontal lines and every nth diagonal across the whole image, so
+    # the thinning is even, and darker tones stay darker than lighter ones.
+    #
+    # * spacing: the minimum distance between parallel hatch lines (normally sc/2 for horizontal lines, and sc/√2
+    #   for diagonals)
+    # * max_length: the maximum total length of the hatch lines; the spacing is increased until they fit
 
-    for line in lines[::2]: # increase the step value to discard hatch lines
+    spacing = thinned_spacing(horizontal, diagonal, sc, spacing, max_length)
+    kept_horizontal, kept_diagonal = thinned_hatch(horizontal, diagonal, sc, spacing)
 
-        # a line is a list of (x, y) co-ordinates, e.g.:
+    print(
+        "thinned hatching to a spacing of {:.1f}: length {:.0f} reduced to {:.0f}".format(
+            spacing, hatch_length(horizontal, diagonal, sc), hatch_length(kept_horizontal, kept_diagonal, sc)
+        )
+    )
 
-        # [[0, 1], [2, 1], [3, 1], [3, 2], [3, 4], [4, 4]]
+    return kept_horizontal, kept_diagonal
 
-        # this could be simplified to:
 
-        # [[0, 1],         [3, 1],         [3, 4], [4, 4]]
+def thinned_hatch(horizontal, diagonal, sc=16, spacing=None):
 
-        # first we will check all the points to see which ones have x-values that need to be saved
+    # keeps every nth row of horizontal lines and every nth diagonal, for the spacing
 
-        saved_points = []
-        length = len(line)
+    # the row of each horizontal line (two rows per cell) and the diagonal each diagonal line belongs to - counted
+    # across the whole image, so that bands of it are thinned alike
+    rows = [round((line[0][1] - sc/4) / (sc/2)) for line in horizontal]
+    diagonals = [round((line[0][0] + line[0][1]) / sc) for line in diagonal]
 
-        for index in range(length):
-            # only test points that have neighbours
-            if index > 0 and index < length -1:
+    row_step = max(1, round((spacing or sc/2) / (sc/2)))
+    diagonal_step = max(1, round((spacing or sc/2) / (sc/math.sqrt(2))))
 
-                # if this point's x/y-values are not half-way between its neighbours, keep it
-                x_point_is_disposable = (line[index-1][0] + line[index+1][0]) / 2 == line[index][0]
-                y_point_is_disposable = (line[index-1][1] + line[index+1][1]) / 2 == line[index][1]
+    return (
+        [line for line, row in zip(horizontal, rows) if row % row_step == 0],
+        [line for line, d in zip(diagonal, diagonals) if d % diagonal_step == 0],
+    )
 
-                if not x_point_is_disposable and not y_point_is_disposable:
 
-                    saved_points.append(line[index])
+def thinned_spacing(horizontal, diagonal, sc=16, spacing=None, max_length=None):
 
-            # this point must be the first or last in the list, so keep it
-            else:
-                saved_points.append(line[index])
+    # the spacing at which the hatch lines are to be thinned: at least spacing, and increased until they fit
+    # max_length
+
+    spacing = spacing or sc/2
+
+    if max_length:
+        rows = [round((line[0][1] - sc/4) / (sc/2)) for line in horizontal]
+        diagonals = [round((line[0][0] + line[0][1]) / sc) for line in diagonal]
+        most_lines = max(rows + diagonals + [1])
 
-        new_lines.append(saved_points)
+        while (
+            hatch_length(*thinned_hatch(horizontal, diagonal, sc, spacing), sc) > max_length
+            and spacing / (sc/2) <= most_lines
+        ):
+            spacing = spacing + sc/2
 
-    return new_lines
+    return spacing
 
 
+def hatch_length(horizontal, diagonal, sc=16):
+    return (len(horizontal) + len(diagonal) * math.sqrt(2)) * sc
 
+
+@profiler.timed("svg")
 def makesvg(lines):
     print("generating svg file...")
     out = '<svg xmlns="http://www.w3.org/2000/svg" version="1.1">'
@@ -341,31 +745,147 @@ def makesvg(lines):
 
 
 def lines_to_file(lines, filename):
+    import strokes
+    if isinstance(lines, strokes.Strokes):
+        lines = lines.tolist()
     with open(filename, "w") as file_to_save:
         json.dump(lines, file_to_save, indent=4)
 
 
 
 
-def sortlines(lines):
+@profiler.timed("sorting")
+def sortlines(lines, start=None):
+
+    # Orders the lines (reversing them where that helps) so that each one starts as close as possible to where the
+    # previous one ended, to reduce the distance the pen travels between them. Returns Strokes. If a start position
+    # is given, the first line is the one nearest to it; otherwise, it's the first of the lines.
+
     print("optimizing stroke sequence...")
-    clines = lines[:]
-    slines = [clines.pop(0)]
-    while clines != []:
-        x,s,r = None,1000000,False
-        for l in clines:
-            d = distsum(l[0],slines[-1][-1])
-            dr = distsum(l[-1],slines[-1][-1])
-            if d < s:
-                x,s,r = l[:],d,False
-            if dr < s:
-                x,s,r = l[:],s,True
-
-        clines.remove(x)
-        if r == True:
-            x = x[::-1]
-        slines.append(x)
-    return slines
+
+    return nearest_neighbour_sort(lines, start)
+
+
+def nearest_neighbour_sort(lines, start=None):
+
+    # The greedy ordering used by sortlines() and tile_sortlines(): from the current position, always go to the
+    # nearest end of a line not yet drawn.
+
+    import numpy as np
+
+    import strokes
+
+    lines = strokes.Strokes.from_lines(lines)
+
+    if not len(lines):
+        return lines
+
+    starts, ends = lines.starts, lines.ends
+
+    order, reverse = [], []
+    remaining = np.ones(len(lines), dtype=bool)
+
+    if start is None:
+        order, reverse = [0], [False]
+        remaining[0] = False
+        position = ends[0]
+    else:
+        position = np.asarray(start, dtype=float)
+
+    for _ in range(len(lines) - len(order)):
+
+        # the distance from the current position to the start and to the end of every line not yet drawn
+        to_start = np.where(remaining, np.hypot(*(starts - position).T), np.inf)
+        to_end = np.where(remaining, np.hypot(*(ends - position).T), np.inf)
+
+        nearest_start, nearest_end = np.argmin(to_start), np.argmin(to_end)
+
+        if to_end[nearest_end] < to_start[nearest_start]:
+            order.append(nearest_end)
+            reverse.append(True)
+            position = starts[nearest_end]
+        else:
+            order.append(nearest_start)
+            reverse.append(False)
+            position = ends[nearest_start]
+
+        remaining[order[-1]] = False
+
+    return lines.reorder(order, reverse)
+
+
+def hilbert_index(x, y, order):
+
+    # The position along a Hilbert curve filling a 2**order x 2**order grid of each of the cells (x, y) - integer
+    # arrays. Consecutive positions are always neighbouring cells, so visiting cells in this order never jumps
+    # across the grid.
+
+    import numpy as np
+
+    x, y = np.array(x, dtype=int), np.array(y, dtype=int)
+    index = np.zeros(np.broadcast(x, y).shape, dtype=int)
+    n = 2 ** order
+
+    s = n // 2
+    while s > 0:
+        rx, ry = (x & s) > 0, (y & s) > 0
+        index += s * s * ((3 * rx) ^ ry)
+
+        # rotate the quadrant, so that the curve within it runs the right way
+        flip = ~ry & rx
+        x, y = np.where(flip, n - 1 - x, x), np.where(flip, n - 1 - y, y)
+        x, y = np.where(ry, x, y), np.where(ry, y, x)
+
+        s //= 2
+
+    return index
+
+
+@profiler.timed("sorting")
+def tile_sortlines(lines, extent=None, tiles=4, start=None):
+
+    # Orders the lines region by region: the extent - (min x, min y, max x, max y), by default the lines' own bounds -
+    # is divided into tiles x tiles tiles, each line is placed in the tile containing the midpoint of its ends, and
+    # the tiles are visited in Hilbert-curve order. Within each tile the lines are sorted greedily, as by sortlines(),
+    # starting from where the last tile ended. So the pen finishes with one part of the drawing before moving to the
+    # next, rather than sweeping the whole page once for each kind of line - and sorting many small tiles is much
+    # quicker than sorting everything at once. Whether it means less pen-up travel depends on the drawing: long
+    # hatch lines crossing many tiles favour a few large tiles. Returns Strokes.
+
+    import numpy as np
+
+    import strokes
+
+    lines = strokes.Strokes.from_lines(lines)
+
+    print("optimizing stroke sequence in {} x {} tiles...".format(tiles, tiles))
+
+    if not len(lines):
+        return lines
+
+    min_x, min_y, max_x, max_y = extent or lines.bounds
+    size = np.array([max(max_x - min_x, 1e-9), max(max_y - min_y, 1e-9)])
+
+    middles = (lines.starts + lines.ends) / 2
+    cells = np.clip(((middles - (min_x, min_y)) / size * tiles).astype(int), 0, tiles - 1)
+
+    # the smallest Hilbert curve covering the tiles
+    order = max(1, math.ceil(math.log2(tiles)))
+    tile_order = hilbert_index(cells[:, 0], cells[:, 1], order)
+
+    # the lines grouped by tile, the tiles in the curve's order
+    by_tile = np.argsort(tile_order, kind="stable")
+    boundaries = np.flatnonzero(np.diff(tile_order[by_tile])) + 1
+
+    result = strokes.Strokes()
+    position = start
+
+    for group in np.split(by_tile, boundaries):
+        tile = nearest_neighbour_sort(lines.reorder(group), start=position)
+        result += tile
+        position = tile.ends[-1]
+
+    return result
 
 
 def midpt(*args):
@@ -380,27 +900,6 @@ def distsum(*args):
     return sum([ ((args[i][0]-args[i-1][0])**2 + (args[i][1]-args[i-1][1])**2)**0.5 for i in range(1,len(args))])
 
 
-def sortlines(lines):
-    print("optimizing stroke sequence...")
-    clines = lines[:]
-    slines = [clines.pop(0)]
-    while clines != []:
-        x,s,r = None,1000000,False
-        for l in clines:
-            d = distsum(l[0],slines[-1][-1])
-            dr = distsum(l[-1],slines[-1][-1])
-            if d < s:
-                x,s,r = l[:],d,False
-            if dr < s:
-                x,s,r = l[:],s,True
-
-        clines.remove(x)
-        if r == True:
-            x = x[::-1]
-        slines.append(x)
-    return slines
-
-
 def appmask(IM,masks):
     PX = IM.load()
     w,h = IM.size
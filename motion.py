@@ -0,0 +1,239 @@
+# Motion planning for the plotters.
+#
+# Rather than moving the pen at a constant speed and then sleeping to let the arms settle, we can work out how fast
+# the servos are allowed to move at each step of a movement, and ramp the speed of the pen up and down to suit.
+
+import numpy
+
+
+def servo_limits(value):
+
+    # The limits can be given as a single value that applies to both servos, or as a pair of values, one per servo.
+
+    return numpy.broadcast_to(numpy.asarray(value, dtype=float), (2,))
+
+
+def trapezoidal_profile(
+    angles,
+    length,
+    max_velocity,
+    max_acceleration,
+    entry_speed=0,
+    exit_speed=0,
+    max_speed=None,
+    turn_per_unit=None,
+):
+
+    # Given the angles of both servos at each step of a movement - an array of shape (steps + 1, 2), including the
+    # starting position - and the length of the movement, returns:
+    #
+    # * the time that should be allowed for each step
+    # * the speed of the pen at each step boundary
+    #
+    # max_velocity and max_acceleration are in degrees per second and degrees per second², for each servo. Speeds
+    # are in plotter units per second. entry_speed and exit_speed are the speeds the pen should have at the start and
+    # end of the movement (zero if it should be at rest); max_speed is an overall cap on the pen's speed.
+    #
+    # turn_per_unit, if supplied, gives how many degrees each servo turns per unit of pen travel in each step, shape
+    # (steps, 2) - see segment_turn_rates(). Otherwise it's estimated from the differences between the angles.
+
+    angles = numpy.asarray(angles, dtype=float)
+    no_of_steps = len(angles) - 1
+    step_length = length / no_of_steps
+
+    max_velocity = servo_limits(max_velocity)
+    max_acceleration = servo_limits(max_acceleration)
+
+    # how many degrees each servo turns per unit of pen travel, for each step
+    if turn_per_unit is None:
+        turn_per_unit = numpy.abs(numpy.diff(angles, axis=0)) / step_length
+
+    # the fastest the pen can go, and the fastest it can accelerate, without exceeding either servo's limits
+    with numpy.errstate(divide="ignore"):
+        step_speed_limit = numpy.min(max_velocity / turn_per_unit, axis=1)
+        step_acceleration_limit = numpy.min(max_acceleration / turn_per_unit, axis=1)
+
+    if max_speed:
+        step_speed_limit = numpy.minimum(step_speed_limit, max_speed)
+
+    # the speed at each step boundary may not exceed the limits of the steps on either side of it
+    speeds = numpy.empty(no_of_steps + 1)
+    speeds[0] = min(entry_speed, step_speed_limit[0])
+    speeds[-1] = min(exit_speed, step_speed_limit[-1])
+    speeds[1:-1] = numpy.minimum(step_speed_limit[:-1], step_speed_limit[1:])
+
+    # forward pass: limit how quickly the pen can speed up...
+    for step in range(no_of_steps):
+        speeds[step + 1] = min(
+            speeds[step + 1],
+            numpy.sqrt(speeds[step] ** 2 + 2 * step_acceleration_limit[step] * step_length)
+        )
+
+    # ... and backward pass: limit how quickly it must slow down
+    for step in range(no_of_steps - 1, -1, -1):
+        speeds[step] = min(
+            speeds[step],
+            numpy.sqrt(speeds[step + 1] ** 2 + 2 * step_acceleration_limit[step] * step_length)
+        )
+
+    # With constant acceleration across each step, the time taken is the step length over the mean speed. A step
+    # that starts and finishes at rest is taken as accelerating for half its length and decelerating for the other.
+    mean_speeds = (speeds[:-1] + speeds[1:]) / 2
+
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        durations = numpy.where(
+            mean_speeds > 0,
+            step_length / mean_speeds,
+            2 * numpy.sqrt(step_length / step_acceleration_limit)
+        )
+
+    return durations, speeds
+
+
+def plan_line(
+    points, angles, max_velocity, max_acceleration, max_speed=None, junction_deviation=.05, turn_per_unit=None
+):
+
+    # Plans the speed of the pen through all the points of a line, in the manner of a CNC junction-deviation
+    # planner. Given the x/y points of the line and the servo angles at each one, returns the speed the pen should
+    # have as it passes through each point: zero at the start and the end, and only as slow as needed at sharp
+    # corners in between, so that the pen can flow through points where the line runs straight or curves gently.
+    #
+    # junction_deviation is how far (in plotter units) the pen can be allowed to stray from a corner if it were to
+    # take the corner as an arc at speed; the larger it is, the faster corners are taken.
+    #
+    # turn_per_unit, if supplied, gives how many degrees each servo turns per unit of pen travel along each segment
+    # (see segment_turn_rates()); otherwise it's estimated from the differences between the angles.
+
+    points = numpy.asarray(points, dtype=float)
+    angles = numpy.asarray(angles, dtype=float)
+
+    max_velocity = servo_limits(max_velocity)
+    max_acceleration = servo_limits(max_acceleration)
+
+    speeds = numpy.zeros(len(points))
+
+    if len(points) < 3:
+        return speeds
+
+    segments = numpy.diff(points, axis=0)
+    lengths = numpy.hypot(segments[:, 0], segments[:, 1])
+
+    # A repeated point makes a segment of no length, for which the limits below can't be worked out. The line is
+    # planned without the repeats, and each repeated point is passed at the speed of the point it repeats.
+    if not lengths.all():
+        keep = numpy.concatenate(([True], lengths > 0))
+
+        planned = plan_line(
+            points[keep],
+            angles[keep],
+            max_velocity,
+            max_acceleration,
+            max_speed=max_speed,
+            junction_deviation=junction_deviation,
+            turn_per_unit=None if turn_per_unit is None else numpy.asarray(turn_per_unit)[keep[1:]],
+        )
+
+        return planned[numpy.cumsum(keep) - 1]
+
+    # the speed and acceleration limits for each segment, from how much each servo must turn to cover it - without
+    # limit, if neither turns at all
+    if turn_per_unit is None:
+        turn_per_unit = numpy.abs(numpy.diff(angles, axis=0)) / lengths[:, None]
+
+    with numpy.errstate(divide="ignore"):
+        segment_speed_limit = numpy.min(max_velocity / turn_per_unit, axis=1)
+        segment_acceleration_limit = numpy.min(max_acceleration / turn_per_unit, axis=1)
+
+    if max_speed:
+        segment_speed_limit = numpy.minimum(segment_speed_limit, max_speed)
+
+    # the angle between consecutive segments at each junction
+    directions = segments / lengths[:, None]
+    cosines = -numpy.sum(directions[:-1] * directions[1:], axis=1)
+
+    # the junction deviation speed: how fast a corner can be taken such that the centripetal acceleration of an arc
+    # touching both segments, deviating from the corner by junction_deviation, stays within the acceleration limit
+    sin_half_angles = numpy.sqrt(numpy.clip((1 - cosines) / 2, 0, 1))
+    junction_acceleration = numpy.minimum(segment_acceleration_limit[:-1], segment_acceleration_limit[1:])
+
+    # where the line runs straight on, the junction doesn't limit the speed; where it doubles back, the pen must stop,
+    # even if the servos' acceleration is unlimited
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        junction_speeds = numpy.sqrt(
+            junction_acceleration * junction_deviation * sin_half_angles / (1 - sin_half_angles)
+        )
+
+    junction_speeds = numpy.nan_to_num(junction_speeds, nan=0, posinf=numpy.inf)
+
+    speeds[1:-1] = numpy.minimum.reduce(
+        [junction_speeds, segment_speed_limit[:-1], segment_speed_limit[1:]]
+    )
+
+    # backward pass: the pen must be able to slow down in time for every junction after it, and stop at the end...
+    for index in range(len(points) - 2, 0, -1):
+        speeds[index] = min(
+            speeds[index],
+            numpy.sqrt(speeds[index + 1] ** 2 + 2 * segment_acceleration_limit[index] * lengths[index])
+        )
+
+    # ... and forward pass: it can only speed up so much from a standing start
+    for index in range(1, len(points) - 1):
+        speeds[index] = min(
+            speeds[index],
+            numpy.sqrt(speeds[index - 1] ** 2 + 2 * segment_acceleration_limit[index - 1] * lengths[index - 1])
+        )
+
+    return speeds
+
+
+def turning_directions(angles, previous_angle=0, previous_direction=0):
+
+    # Given the angles a servo is to be moved through, starting from previous_angle, returns the direction it will be
+    # turning in as it arrives at each: 1 for increasing angles, -1 for decreasing. Where the angle doesn't change,
+    # the servo is still wherever the last change left it, on one side or the other of its dead band, so that change's
+    # direction carries over; previous_direction is the direction of the last movement before these (0 if unknown).
+
+    angles = numpy.asarray(angles, dtype=float)
+    changes = numpy.sign(numpy.diff(angles, prepend=previous_angle))
+
+    # the index of the latest change at or before each step, or -1 if there hasn't been one
+    latest = numpy.maximum.accumulate(numpy.where(changes != 0, numpy.arange(len(changes)), -1))
+
+    return numpy.where(latest >= 0, changes[latest], previous_direction)
+
+
+def segment_turn_rates(points, jacobian):
+
+    # Given the points of a path, shape (n, 2), and a plotter's batch_jacobian() method, returns how many degrees each
+    # servo turns per unit of pen travel along each of the path's segments, shape (n - 1, 2), from the Jacobian at the
+    # middle of each segment. Near a singularity - where the arms are fully stretched out, for example - the servos
+    # must turn a long way for a little pen travel, so the rates are high; where the mechanism has the advantage,
+    # they're low.
+
+    points = numpy.asarray(points, dtype=float)
+    segments = numpy.diff(points, axis=0)
+    lengths = numpy.hypot(segments[:, 0], segments[:, 1])
+
+    # the direction of travel along each segment, as a unit vector (or zero, for a segment of no length)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        directions = numpy.nan_to_num(segments / lengths[:, None])
+
+    middles = (points[:-1] + points[1:]) / 2
+
+    return numpy.abs(numpy.einsum("nij,nj->ni", jacobian(middles[:, 0], middles[:, 1]), directions))
+
+
+def feed_rates(turn_per_unit, max_velocity, max_speed=None):
+
+    # The fastest the pen can move along each segment of a path without either servo exceeding its max_velocity
+    # (degrees per second, for both servos or as a pair), given the servos' turn rates along each segment from
+    # segment_turn_rates(). max_speed is an overall cap on the pen's speed.
+
+    with numpy.errstate(divide="ignore"):
+        speeds = numpy.min(servo_limits(max_velocity) / turn_per_unit, axis=1)
+
+    if max_speed:
+        speeds = numpy.minimum(speeds, max_speed)
+
+    return speeds
@@ -4,10 +4,13 @@ from math import *
 import sys
 
 import json
-from tqdm import tqdm, trange
-import readchar
 
-import pigpio
+import calibration
+import profiling
+import progress
+
+# numpy, pigpio, readchar and tqdm - and the modules of our own that need numpy - are imported in the methods that use
+# them, as in brachiograph.py, so that importing pantograph is quick.
 
 
 def hypotenuse(side1, side2):
@@ -33,19 +36,24 @@ class PantoGraph:
         correction_2=0,
 
         centre_1=1350, multiplier_1=425/45,
-        centre_2=1350, multiplier_2=415/45
+        centre_2=1350, multiplier_2=415/45,
+
+        pw_up=1650, pw_down=2100,   # pulse-widths for pen up/down
+
+        max_angular_velocity=None,  # degrees per second, for both servos or as a pair
+
+        profile=False,      # record timings and counts of what the plotter does, in self.profiler
     ):
 
-        # instantiate this Raspberry Pi as a pigpio.pi() instance
-        self.rpi = pigpio.pi()
+        # instrumentation, to show where the time in a job goes - see profiling.py
+        self.profiler = profiling.Profiler(enabled=profile)
 
-        # the pulse frequency should be 100Hz - higher values could damage the servos
-        self.rpi.set_PWM_frequency(14, 50)
-        self.rpi.set_PWM_frequency(15, 50)
+        # The hardware isn't touched until it's needed: the connection to the pigpio daemon - shared by the arms and
+        # the pen - is made, and the plotter homed, by connect(), which is called the first time self.rpi is used.
+        self._rpi = None
 
-        # create the pen object, and make sure the pen is up
-        self.pen = Pen(pg=self)
-        self.pen.up()
+        # create the pen object
+        self.pen = Pen(pg=self, pw_up=pw_up, pw_down=pw_down)
 
         # set the pantograph geometry
         self.DRIVER = driver
@@ -63,6 +71,56 @@ class PantoGraph:
         self.centre_1, self.centre_2 = centre_1, centre_2
         self.multiplier_1, self.multiplier_2 = multiplier_1, multiplier_2
 
+        # if the servos' speed limit is supplied, each step of a movement takes only as long as the servos need
+        self.max_angular_velocity = max_angular_velocity
+
+        # where the pen will be once the plotter is homed
+        self.current_x, self.current_y = self.angles_to_xy(0, 0)
+
+
+    @property
+    def rpi(self):
+
+        # the pigpio.pi() instance for this Raspberry Pi, connecting to it if that hasn't been done yet
+
+        if self._rpi is None:
+            self.connect()
+
+        return self._rpi
+
+
+    def connect(self, home=True):
+
+        # Connects to the pigpio daemon and homes the plotter. This happens automatically the first time the hardware
+        # is needed, but calling it explicitly gets the homing done in advance. With home=False, it only connects
+        # - as home() does, before it homes the plotter itself.
+
+        if self._rpi is not None:
+            return
+
+        import pigpio
+
+        # instantiate this Raspberry Pi as a pigpio.pi() instance
+        self._rpi = pigpio.pi()
+
+        # the pulse frequency should be 100Hz - higher values could damage the servos
+        self._rpi.set_PWM_frequency(14, 50)
+        self._rpi.set_PWM_frequency(15, 50)
+        self._rpi.set_PWM_frequency(self.pen.pin, 50)
+
+        if home:
+            self.home()
+
+
+    def home(self):
+
+        # makes sure the pen is up, and moves the arms straight ahead
+
+        # connect first, without homing - otherwise the first use of self.rpi below would home the plotter itself
+        self.connect(home=False)
+
+        self.pen.up()
+
         # Initialise the pantograph with the motors straight ahead
         self.rpi.set_servo_pulsewidth(14, 1350)
         self.rpi.set_servo_pulsewidth(15, 1350)
@@ -155,8 +213,56 @@ Controls:
             ))
 
 
+    @classmethod
+    def from_profile(cls, filename, **kwargs):
+
+        # Creates a PantoGraph from a calibration profile (see calibration.py). Any other arguments override the
+        # values in the profile.
+
+        return cls(**{**calibration.load_profile(filename, "PantoGraph"), **kwargs})
+
+
+    def save_profile(self, filename):
+
+        # Saves everything needed to recreate this PantoGraph as a calibration profile, along with the pulse-widths
+        # found for each motor by set_up(), if it has been run.
+
+        samples = [
+            {
+                "motor": motor["motor"],
+                "angle_pws": [[0, motor["zero"]], [motor["calibrations"][1]["angle"], motor["ninety"]]],
+            }
+            for motor in getattr(self, "motors", ()) if "ninety" in motor
+        ] or None
+
+        calibration.save_profile(
+            filename,
+            "PantoGraph",
+            {
+                "driver": self.DRIVER,
+                "follower": self.FOLLOWER,
+                "motor_1_pos": self.MOTOR_1_POS,
+                "motor_2_pos": self.MOTOR_2_POS,
+                "box_bounds": [float(value) for value in self.box_bounds],
+                "angle_multiplier": self.angle_multiplier,
+                "correction_1": self.correction_1,
+                "correction_2": self.correction_2,
+                "centre_1": self.centre_1,
+                "multiplier_1": self.multiplier_1,
+                "centre_2": self.centre_2,
+                "multiplier_2": self.multiplier_2,
+                "pw_up": self.pen.pw_up,
+                "pw_down": self.pen.pw_down,
+                "max_angular_velocity": self.max_angular_velocity,
+            },
+            samples,
+        )
+
+
     def calibrate(self, pin, angle, description):
 
+        import readchar
+
         adjustments = {"<": -100, ">": +100, "{": -10, "}": +10, "[": -1, "]": +1, "0": "done"}
 
         pw = 1350
@@ -197,159 +303,167 @@ Controls:
         print("Pulse widths: {:03},    {:03}".format(*self.get_pulse_widths()))
 
 
-    def drawing_area(self):
+    def drawing_area(self, angle_1_range=(-90, 90), angle_2_range=(-90, 90), resolution=.1):
 
-        # This is an experimental method in progress. It's intended to help find the largest usable drawing
-        # areas, by sweeping the motors through a wide range.
+        # Finds the largest rectangle that the pen can reach while both motors stay within the given ranges of
+        # angles, and that can be used as the box_bounds.
 
-        motor_distance = self.MOTOR_2_POS - self.MOTOR_1_POS
+        import numpy
 
-        for angle_1 in range(0, -107, -10):
-            for angle_2 in range(0, angle_1 -10, -10):
+        import workspace
 
-                x, y = self.angles_to_xy(angle_1, angle_2)
+        x, y, reachable = self.sweep(angle_1_range, angle_2_range)
 
-                # x = round(x, 1)
-                # y = round(y, 1)
+        xs = numpy.arange(numpy.min(x[reachable]), numpy.max(x[reachable]), resolution)
+        ys = numpy.arange(max(numpy.min(y[reachable]), resolution), numpy.max(y[reachable]), resolution)
 
+        grid_x, grid_y = numpy.meshgrid(xs, ys)
+        angle_1, angle_2 = self.batch_xy_to_angles(grid_x, grid_y)
 
-                print(
-                    "angles: {:3.0f}, {:3.0f};".format(angle_1, angle_2),
-                    # "elbow1: {:4.1f}, {:4.1f};".format(elbow_1_x, elbow_1_y),
-                    # "elbow2: {:4.1f}, {:4.1f};".format(elbow_2_x, elbow_2_y),
-                    # "base length: {:3.0f};".format(base_of_top_triangle),
-                    # "base/corner: {:3.0f}, {:3.0f};".format(degrees(angle_of_base_of_top_triangle), degrees(base_of_top_triangle)),
-                    # "elbow dx/dy: {:4.1f}, {:4.1f};".format(elbow_dx, elbow_dy),
-                    # "elbow to x/y: {:4.1f}, {:4.1f};".format(x_to_elbow, y_to_elbow),
-                    "x/y: {:4.1f}, {:4.1f}".format(x, y)
-                )
-            print()
+        with numpy.errstate(invalid="ignore"):
+            safe = (
+                (angle_1 >= min(angle_1_range)) & (angle_1 <= max(angle_1_range)) &
+                (angle_2 >= min(angle_2_range)) & (angle_2 <= max(angle_2_range))
+            )
+
+        bounds = workspace.largest_rectangle(safe, xs, ys)
+
+        if bounds:
+            print("Largest drawing area: {:.1f}, {:.1f}, {:.1f}, {:.1f}".format(*bounds))
+
+        return bounds
+
+
+    def sweep(self, angle_1_range=(-90, 90), angle_2_range=(-90, 90), step=1):
+
+        # Sweeps the motors through a grid of angles in one go, returning the x and y co-ordinates of the pen for
+        # each pair of angles, and a mask of the pairs for which the arms can actually meet.
+
+        import numpy
+
+        angles_1 = numpy.arange(min(angle_1_range), max(angle_1_range) + step, step)
+        angles_2 = numpy.arange(min(angle_2_range), max(angle_2_range) + step, step)
 
-    def sweep(self):
-        pass
+        angle_1, angle_2 = numpy.meshgrid(angles_1, angles_2)
+
+        x, y = self.batch_angles_to_xy(angle_1, angle_2)
+
+        reachable = numpy.isfinite(x) & numpy.isfinite(y)
+
+        return x, y, reachable
 
 
 
     # ----------------- drawing methods -----------------
 
 
-    def plot_file(self, filename="", wait=.1, interpolate=10, rotate=False, bounds=None):
+    def plot_file(
+        self, filename="", wait=.1, interpolate=10, rotate="auto", bounds=None, progress_callback=None, validate=True
+    ):
 
         bounds = bounds or self.box_bounds
 
         with open(filename, "r") as line_file:
             lines = json.load(line_file)
 
-        self.plot_lines(lines=lines, wait=wait, interpolate=interpolate, rotate=rotate, bounds=bounds)
+        return self.plot_lines(
+            lines=lines, wait=wait, interpolate=interpolate, rotate=rotate, bounds=bounds,
+            progress_callback=progress_callback, validate=validate
+        )
 
 
-    def plot_lines(self, lines=[], wait=.1, interpolate=10, rotate=False, bounds=None):
+    def plot_lines(
+        self, lines=[], wait=.1, interpolate=10, rotate="auto", bounds=None, progress_callback=None, validate=True,
+        margin=0, matrix=None
+    ):
 
-        # lines is a tuple itself containing a number of tuples, each of which contains a number of 2-tuples
+        # The progress of the job is passed to progress_callback (see progress.py) every half-second or so; by
+        # default, it's shown on a progress bar. Use progress_callback=False for no progress reports at all.
         #
-        # [                                                                                     # |
-        #     [                                                                                 # |
-        #         [3, 4],                               # |                                     # |
-        #         [2, 4],                               # |                                     # |
-        #         [1, 5],  #  a single point in a line  # |  a list of points defining a line   # |
-        #         [3, 5],                               # |                                     # |
-        #         [3, 7],                               # |                                     # |
-        #     ],                                                                                # |
-        #     [                                                                                 # |  all the lines
-        #         [...],                                                                        # |
-        #         [...],                                                                        # |
-        #     ],                                                                                # |
-        #     [                                                                                 # |
-        #         [...],                                                                        # |
-        #         [...],                                                                        # |
-        #     ],                                                                                # |
-        # ]                                                                                     # |
-
-        # First, we create a pair of empty sets for all the x and y values in all of the lines of the plot data.
-
-        x_values_in_lines = set()
-        y_values_in_lines = set()
-
-        # Loop over each line and all the points in each line, to get sets of all the x and y values:
-
-        for line in lines:
+        # The lines are fitted to the bounds (see fit_lines() for rotate and margin), unless they are placed with an
+        # affine matrix from transform.py instead; they are then clipped to the bounds, so that any part of the
+        # drawing that falls outside them is left out.
+        #
+        # If validate is True and any position the pen would pass through can't be reached, nothing is drawn, and a
+        # workspace.UnreachableError is raised, carrying the report from check_reach().
 
-            x_values_in_line, y_values_in_line = zip(*line)
+        import numpy
 
-            x_values_in_lines.update(x_values_in_line)
-            y_values_in_lines.update(y_values_in_line)
+        import transform
+        import workspace
 
-        # Identify the minimum and maximum values.
+        bounds = bounds or self.box_bounds
 
-        min_x, max_x = min(x_values_in_lines), max(x_values_in_lines)
-        min_y, max_y = min(y_values_in_lines), max(y_values_in_lines)
+        with self.profiler.job("plot_lines"):
 
-        # Identify the range they span.
+            if matrix is None:
+                lines = self.fit_lines(lines, bounds, rotate=rotate, margin=margin)
+            else:
+                lines = transform.clip(transform.apply(lines, matrix), bounds)
 
-        x_range = max_x - min_x
-        y_range = max_y - min_y
+            if validate:
+                report = self.check_reach(lines, interpolate)
 
-        x_mid_point = (max_x + min_x) / 2
-        y_mid_point = (max_y + min_y) / 2
+                if report:
+                    raise workspace.UnreachableError(report)
 
-        box_x_range = bounds[2] - bounds[0]
-        box_y_range = bounds[3] - bounds[1]
+            # the distance the pen moves to reach each point from the previous one, for measuring progress
+            distances = [0] + numpy.hypot(*numpy.diff(lines.points, axis=0).T).tolist()
 
-        box_x_mid_point = (bounds[0] + bounds[2]) / 2
-        box_y_mid_point = (bounds[1] + bounds[3]) / 2
+            if progress_callback is None:
+                progress_callback = progress.TqdmReporter(desc="Plotting", leave=False)
 
+            job = progress.Progress(len(lines.points), sum(distances), progress_callback or None)
 
-        # Get a 'divider' value for each range - the value by which we must divide all x and y so that they will
-        # fit safely inside the drawing range of the plotter.
+            for line, offset in zip(lines, lines.offsets):
+                # the pen-up move is divided into steps just as check_reach() expects
+                x, y = line[0]
+                self.xy(x, y, interpolate=interpolate)
+                job.advance(1, distances[offset])
 
-        #
-        # If both image and box are in portrait orientation, or both in landscape, we don't need to rotate the plot.
+                for index, point in enumerate(line[1:], start=offset + 1):
+                    x, y = point
+                    self.draw(x, y, wait=wait, interpolate=interpolate)
+                    job.advance(1, distances[index])
 
-        if (x_range >= y_range and box_x_range >= box_y_range) or (x_range <= y_range and box_x_range <= box_y_range):
+            job.finish()
 
-            divider = max((x_range / box_x_range), (y_range / box_y_range))
-            rotate = False
+            self.pen.up()
 
-        else:
+            self.quiet()
 
-            divider = max((x_range / box_y_range), (y_range / box_x_range))
-            rotate = True
-            x_mid_point, y_mid_point = y_mid_point, x_mid_point
 
-        # Now, divide each value, and take into account the offset from zero of each range
 
-        for line in lines:
+    def fit_lines(self, lines, bounds, flip=False, extent=None, rotate="auto", margin=0):
 
-            for point in line:
-                if rotate:
-                    point[0], point[1] = point[1], point[0]
+        # Scales, shifts and if necessary rotates the lines so that they fit the bounds, at least margin inside each
+        # edge, and returns them as Strokes. The lines may be Strokes or a list of lines; they are not modified. The
+        # extent of the whole drawing, if the lines are only part of it, and rotate - an angle in degrees - work as
+        # they do for transform.fit().
+        #
+        # With rotate="auto", lines that fit the bounds better the other way round have their x and y values
+        # swapped, as the PantoGraph has always done: that's a turn through 90 degrees, mirrored.
 
-                x = point[0]
-                x = x - x_mid_point         # shift x values so that they have zero as their mid-point
-                x = x / divider             # scale x values to fit in our box width
-                x = x + box_x_mid_point     # shift x values so that they have the box x midpoint as their endpoint
-                point[0] = x
+        import strokes
+        import transform
 
-                y = point[1]
-                y = y - y_mid_point
-                # if rotate:
-                #     y = -y
-                y = y / divider
-                y = y + box_y_mid_point
+        lines = strokes.Strokes.from_lines(lines)
 
-                point[1] = y
+        if not len(lines.points):
+            return lines
 
-        for line in tqdm(lines, desc="Lines", leave=False):
-            x, y = line[0]
-            self.xy(x, y)
-            for point in tqdm(line[1:], desc="Segments", leave=False):
-                x, y = point
-                self.draw(x, y, wait=wait, interpolate=interpolate)
+        extent = extent or lines.bounds
 
-        self.pen.up()
+        if rotate == "auto":
+            width, height = extent[2] - extent[0], extent[3] - extent[1]
+            box_width, box_height = bounds[2] - bounds[0], bounds[3] - bounds[1]
 
-        self.quiet()
+            if (width - height) * (box_width - box_height) < 0:
+                rotate, flip = 90, not flip
+            else:
+                rotate = 0
 
+        return transform.apply(lines, transform.fit(extent, bounds, rotate, flip, margin))
 
 
     def draw(self, x=0, y=0, wait=.5, interpolate=10):
@@ -358,6 +472,8 @@ Controls:
 
     def test_pattern(self, bounds=None, wait=1, interpolate=10, repeat=1):
 
+        from tqdm import tqdm, trange
+
         bounds = bounds or self.box_bounds
 
         for r in tqdm(trange(repeat, desc='Iteration'), leave=False):
@@ -380,6 +496,8 @@ Controls:
 
     def box(self, bounds=None, wait=.15, interpolate=10, repeat=1, reverse=False):
 
+        from tqdm import tqdm, trange
+
         bounds = bounds or self.box_bounds
 
         self.xy(bounds[0], bounds[1], wait, interpolate)
@@ -418,13 +536,20 @@ Controls:
     def xy(self, x=0, y=0, wait=.1, interpolate=10, draw=False):
         # Moves the pen to the xy position; optionally draws
 
+        import numpy
+
+        import motion
+
         if draw:
             self.pen.down()
         else:
             self.pen.up()
 
-        (angle_1, angle_2) = self.xy_to_angles(x, y)
-        (pulse_width_1, pulse_width_2) = self.angles_to_pulse_widths(angle_1, angle_2)
+        with self.profiler.timer("geometry"):
+            (angle_1, angle_2) = self.xy_to_angles(x, y)
+
+        with self.profiler.timer("pulse_widths"):
+            (pulse_width_1, pulse_width_2) = self.angles_to_pulse_widths(angle_1, angle_2)
 
         # if they are the same, we don't need to move anything
         if (pulse_width_1, pulse_width_2) == self.get_pulse_widths():
@@ -445,27 +570,41 @@ Controls:
 
         no_of_steps = int(length * interpolate) or 1
 
-        if no_of_steps < 100:
-            disable_tqdm = True
-        else:
-            disable_tqdm = False
+        (length_of_step_x, length_of_step_y) = (x_length/no_of_steps, y_length/no_of_steps)
 
+        # If the servos' speed limit is known, each step takes as long as it needs for neither servo to exceed it -
+        # less where the linkage has the mechanical advantage, more near a singularity - but the pen never moves
+        # faster than wait allows. Otherwise, every step takes the same time, set by wait.
+        if self.max_angular_velocity:
+            with self.profiler.timer("planning"):
+                fractions = numpy.arange(no_of_steps + 1) / no_of_steps
+                points = numpy.column_stack(
+                    (self.current_x + fractions * x_length, self.current_y + fractions * y_length)
+                )
+                speeds = motion.feed_rates(
+                    motion.segment_turn_rates(points, self.batch_jacobian),
+                    self.max_angular_velocity,
+                    max_speed=wait and 1 / wait,
+                )
+                durations = length / no_of_steps / speeds
 
-        (length_of_step_x, length_of_step_y) = (x_length/no_of_steps, y_length/no_of_steps)
+        else:
+            durations = numpy.full(no_of_steps, length * wait/no_of_steps)
 
-        for step in tqdm(range(no_of_steps), desc='Interpolation', leave=False, disable=disable_tqdm):
+        for step in range(no_of_steps):
 
             self.current_x = self.current_x + length_of_step_x
             self.current_y = self.current_y + length_of_step_y
 
-            angle_1, angle_2 = self.xy_to_angles(self.current_x, self.current_y)
+            with self.profiler.timer("geometry"):
+                angle_1, angle_2 = self.xy_to_angles(self.current_x, self.current_y)
 
             self.set_angles(angle_1, angle_2)
 
             if step + 1 < no_of_steps:
-                sleep(length * wait/no_of_steps)
+                self.profiler.sleep(durations[step])
 
-        sleep(length * wait/10)
+        self.profiler.sleep(length * wait/10)
 
 
     # ----------------- arm-moving methods -----------------
@@ -482,7 +621,8 @@ Controls:
     def set_angles(self, angle_1=0, angle_2=0):
         # moves the servo motor
 
-        pw_1, pw_2 = self.angles_to_pulse_widths(angle_1, angle_2)
+        with self.profiler.timer("pulse_widths"):
+            pw_1, pw_2 = self.angles_to_pulse_widths(angle_1, angle_2)
 
         self.set_pulse_widths(pw_1, pw_2)
 
@@ -504,16 +644,29 @@ Controls:
 
     def set_pulse_widths(self, pw_1, pw_2):
 
-        self.rpi.set_servo_pulsewidth(14, pw_1)
-        self.rpi.set_servo_pulsewidth(15, pw_2)
+        # connecting to pigpio and homing the plotter, the first time, aren't counted as time spent in pigpio calls
+        rpi = self.rpi
+
+        with self.profiler.timer("pigpio"):
+            rpi.set_servo_pulsewidth(14, pw_1)
+            rpi.set_servo_pulsewidth(15, pw_2)
 
-        sleep(.01)
+        self.profiler.count("steps")
+        self.profiler.count("daemon_calls", 2)
+
+        self.profiler.sleep(.01)
 
 
     def get_pulse_widths(self):
 
-        actual_pulse_width_1 = self.rpi.get_servo_pulsewidth(14)
-        actual_pulse_width_2 = self.rpi.get_servo_pulsewidth(15)
+        # as in set_pulse_widths(), connecting isn't timed as a pigpio call
+        rpi = self.rpi
+
+        with self.profiler.timer("pigpio"):
+            actual_pulse_width_1 = rpi.get_servo_pulsewidth(14)
+            actual_pulse_width_2 = rpi.get_servo_pulsewidth(15)
+
+        self.profiler.count("daemon_calls", 2)
 
         return actual_pulse_width_1, actual_pulse_width_2
 
@@ -576,9 +729,9 @@ Controls:
         elbow_1_x = sin(angle1) * self.DRIVER
         elbow_2_x = sin(angle2) * self.DRIVER
 
-        # calculate the y position of the elbows
-        elbow_1_y = sqrt((self.DRIVER ** 2) - (elbow_1_x ** 2))
-        elbow_2_y = sqrt((self.DRIVER ** 2) - (elbow_2_x ** 2))
+        # calculate the y position of the elbows - below the motors, if the arms are turned past 90˚
+        elbow_1_y = cos(angle1) * self.DRIVER
+        elbow_2_y = cos(angle2) * self.DRIVER
 
         motor_distance = self.MOTOR_2_POS - self.MOTOR_1_POS
 
@@ -589,8 +742,8 @@ Controls:
         # calculate the length of the base of the top triangle
         base_of_top_triangle = hypotenuse(elbow_dx, elbow_dy)
 
-        # calculate the angle at which the top triangle is tilted
-        angle_of_base_of_top_triangle = asin((- elbow_dy) / base_of_top_triangle)
+        # calculate the angle at which the top triangle is tilted - if the elbows have crossed over, it's more than 90˚
+        angle_of_base_of_top_triangle = atan2(elbow_dy, elbow_dx)
 
         # calculate the left inner angle of the top triangle
         corner_of_top_triangle = acos((base_of_top_triangle / 2) / self.FOLLOWER)
@@ -607,75 +760,212 @@ Controls:
         return x, y
 
 
-    def quiet(self, servos=[14, 15, 18]):
+    # The batch methods below do the same as xy_to_angles() and angles_to_xy(), but for whole arrays of values at once.
+    # Rather than raising an error for positions the arms can't reach, they return NaN for them.
 
-        for servo in servos:
-            self.rpi.set_servo_pulsewidth(servo, 0)
+    def batch_xy_to_angles(self, x, y):
 
+        import numpy
 
-class Pen:
+        x = numpy.asarray(x, dtype=float)
+        y = numpy.asarray(y, dtype=float)
 
-    def __init__(self, pg, pin=18, pw_up=1650, pw_down=2100, transition_time=0.25):
+        x_relative_to_motor_1 = self.MOTOR_1_POS - x
+        x_relative_to_motor_2 = self.MOTOR_2_POS - x
 
-        self.pg = pg
-        self.pin = pin
-        self.pw_up = pw_up
-        self.pw_down = pw_down
-        self.transition_time = transition_time
+        d1 = numpy.hypot(x_relative_to_motor_1, y)
+        d2 = numpy.hypot(x_relative_to_motor_2, y)
 
-        self.rpi = pigpio.pi()
-        self.rpi.set_PWM_frequency(self.pin, 50)
+        with numpy.errstate(invalid="ignore", divide="ignore"):
 
-        self.up()
+            inner_angle_1 = numpy.arccos((self.DRIVER **2 + d1 ** 2 - self.FOLLOWER ** 2) / (2 * self.DRIVER * d1))
+            inner_angle_2 = numpy.arccos((self.DRIVER **2 + d2 ** 2 - self.FOLLOWER ** 2) / (2 * self.DRIVER * d2))
 
+            # positions level with or behind the motors can't be reached
+            outer_angle_1 = numpy.where(y > 0, - numpy.arctan(x_relative_to_motor_1 / y), numpy.nan)
+            outer_angle_2 = numpy.where(y > 0, - numpy.arctan(x_relative_to_motor_2 / y), numpy.nan)
 
-    def down(self):
-        self.rpi.set_servo_pulsewidth(self.pin, self.pw_down)
-        sleep(self.transition_time)
+        angle1 = numpy.degrees(outer_angle_1 - inner_angle_1)
+        angle2 = numpy.degrees(inner_angle_2 + outer_angle_2)
 
+        return angle1 * self.angle_multiplier, angle2 * self.angle_multiplier
 
-    def up(self):
-        self.rpi.set_servo_pulsewidth(self.pin, self.pw_up)
-        sleep(self.transition_time)
 
+    def batch_angles_to_xy(self, angle1, angle2):
+
+        import numpy
+
+        angle1 = numpy.radians(numpy.asarray(angle1, dtype=float) * self.angle_multiplier)
+        angle2 = numpy.radians(numpy.asarray(angle2, dtype=float) * self.angle_multiplier)
+
+        elbow_1_x = numpy.sin(angle1) * self.DRIVER
+        elbow_2_x = numpy.sin(angle2) * self.DRIVER
+
+        elbow_1_y = numpy.cos(angle1) * self.DRIVER
+        elbow_2_y = numpy.cos(angle2) * self.DRIVER
+
+        motor_distance = self.MOTOR_2_POS - self.MOTOR_1_POS
+
+        elbow_dx = motor_distance + elbow_2_x - elbow_1_x
+        elbow_dy = elbow_2_y - elbow_1_y
+
+        base_of_top_triangle = numpy.hypot(elbow_dx, elbow_dy)
+
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+
+            angle_of_base_of_top_triangle = numpy.arctan2(elbow_dy, elbow_dx)
+
+            # where the elbows are too far apart for the follower arms to meet, this is NaN
+            corner_of_top_triangle = numpy.arccos((base_of_top_triangle / 2) / self.FOLLOWER)
+
+        x_to_elbow = numpy.cos(corner_of_top_triangle + angle_of_base_of_top_triangle) * self.FOLLOWER
+        y_to_elbow = numpy.sin(corner_of_top_triangle + angle_of_base_of_top_triangle) * self.FOLLOWER
+
+        x = elbow_1_x + x_to_elbow + self.MOTOR_1_POS
+        y = elbow_1_y + y_to_elbow
+
+        return x, y
+
+
+    def batch_jacobian(self, x, y):
+
+        # The Jacobian of xy_to_angles() for arrays of x/y positions: how many degrees each motor turns per unit of
+        # pen travel along x and along y, as an array of shape (..., 2, 2) - [[d angle_1/dx, d angle_1/dy],
+        # [d angle_2/dx, d angle_2/dy]]. Worked out analytically from the same triangles as xy_to_angles(). Near the
+        # singularities, where a driver and its follower arm are in line, the values become very large.
+
+        import numpy
+
+        x = numpy.asarray(x, dtype=float)
+        y = numpy.asarray(y, dtype=float)
+
+        rows = []
+
+        # each motor, with its arms, is a two-link arm reaching from the motor to the pen; sign is how its inner
+        # angle enters the motor's angle
+        for motor_pos, sign in ((self.MOTOR_1_POS, -1), (self.MOTOR_2_POS, 1)):
+
+            x_relative_to_motor = motor_pos - x
+            d = numpy.hypot(x_relative_to_motor, y)
+
+            with numpy.errstate(invalid="ignore", divide="ignore"):
+
+                inner_cosine = (self.DRIVER **2 + d ** 2 - self.FOLLOWER ** 2) / (2 * self.DRIVER * d)
+
+                # how quickly the inner angle changes with d
+                inner_angle_per_unit = - (d ** 2 - self.DRIVER ** 2 + self.FOLLOWER ** 2) / (
+                    2 * d ** 2 * self.DRIVER * numpy.sqrt(1 - inner_cosine ** 2)
+                )
+
+                # the outer angle, - atan(x_relative_to_motor / y), and d itself, with x and y
+                outer_angle_dx, outer_angle_dy = y / d ** 2, x_relative_to_motor / d ** 2
+                d_dx, d_dy = - x_relative_to_motor / d, y / d
 
-# pg = PantoGraph(correction_1=45, correction_2=-45)
+            rows.append(numpy.stack((
+                outer_angle_dx + sign * inner_angle_per_unit * d_dx,
+                outer_angle_dy + sign * inner_angle_per_unit * d_dy,
+            ), axis=-1))
 
-# small servo version
-#
-# pg = PantoGraph(MOTOR_1_POS=4, MOTOR_2_POS=7, centre_1 = 1050, multiplier_1 =970/90, centre_2= 2100, multiplier_2=950/90, box_bounds=(0,0,10,7), HEIGHT=19)
+        return numpy.degrees(numpy.stack(rows, axis=-2)) * self.angle_multiplier
 
-# pg = PantoGraph(MOTOR_1_POS=-1.5, MOTOR_2_POS=1.5, L=12, centre_1 = 1900, multiplier_1 = 10.333, centre_2= 900, multiplier_2 = 10.445, box_bounds=(-3, -3, 3, 3))
 
-# pg = PantoGraph(MOTOR_1_POS=-2.5, MOTOR_2_POS=2.5, L=9.8, centre_1 = 1620, multiplier_1 = 9.556, centre_2= 1090, multiplier_2 = 9.111, box_bounds=(-4, 0, 4, 5))
+    def check_reach(self, lines, interpolate=10):
 
-# # large servos and box
-#
-# pg = PantoGraph(driver=4, follower=9.8, motor_1_pos=-1.7, motor_2_pos=1.7, centre_1 = 1864, multiplier_1 = 9.2779, centre_2= 964, multiplier_2 = 9.4222, box_bounds=(-4, 0, 4, 5))
+        # Checks all the positions the pen would pass through in drawing the lines, interpolated just as xy() will
+        # interpolate them, and returns a list of workspace.Unreachable strokes, those with positions the arms can't
+        # reach. An empty list means the lines can be drawn.
 
-# pg = PantoGraph(driver=6.8, follower=10.7, motor_1_pos=-1.7, motor_2_pos=1.7, centre_1 = 1639, multiplier_1 = 9.211, centre_2= 1060, multiplier_2 = 9.4444, box_bounds=(-6, 7, 6, 15.5))
+        import workspace
 
+        with self.profiler.timer("validating"):
+            return workspace.check_reach(lines, self.batch_xy_to_angles, interpolate=interpolate)
 
-# # small servos and box
-#
-# pg = PantoGraph(driver=4, follower=9.8, motor_1_pos=-1.5, motor_2_pos=1.5, centre_1 = 2040, multiplier_1 = 10.6222, centre_2= 950, multiplier_2 = 10.2778, box_bounds=(-4, 0, 4, 5))
 
-# pg = PantoGraph(driver=4.65, follower=9.8, motor_1_pos=-1.5, motor_2_pos=1.5, centre_1 = 2225, multiplier_1 = 9.5, centre_2=900, multiplier_2 = 10.2221, box_bounds=(-4.5, 7, 4.5, 13))
+    # ----------------- simulation methods -----------------
 
-# set 1
-# pg = PantoGraph(driver=6.8, follower=10.7, motor_1_pos=-1.5, motor_2_pos=1.5, centre_1 = 1730, multiplier_1 = 9.5556, centre_2= 1110, multiplier_2 = 10, box_bounds=(-5, 8, 5, 15))
+    def batch_pulse_widths(self, x, y):
 
-# set 2
-# pg = PantoGraph(driver=6.85, follower=11.85, motor_1_pos=-1.5, motor_2_pos=1.5, centre_1 = 1670, multiplier_1 = 9.6667, centre_2= 1100, multiplier_2 = 9.6667, box_bounds=(-7, 8, 7, 18))
+        # the pulse-widths that would be sent for arrays of x/y positions
 
-# set 3
-# pg = PantoGraph(driver=8.5, follower=12.65, motor_1_pos=-1.5, motor_2_pos=1.5, centre_1 = 1760, multiplier_1 = 9.6667, centre_2= 922, multiplier_2 = 9.6667, box_bounds=(-7, 8, 7, 18))
+        return self.angles_to_pulse_widths(*self.batch_xy_to_angles(x, y))
 
-# set 4
-# pg = PantoGraph(driver=6.9, follower=10.7, motor_1_pos=-1.5, motor_2_pos=1.5, centre_1 = 2042, multiplier_1 = 10.2667, centre_2= 813, multiplier_2 = 9.4556, box_bounds=(-6.5, 7, 6.5, 15))
 
-# set 4
-# pg = PantoGraph(driver=6.85, follower=10.7, motor_1_pos=-1.55, motor_2_pos=1.55, centre_1 = 1721, multiplier_1 = 9.6778, centre_2= 850, multiplier_2 = 9.8889, box_bounds=(-6.5, 7, 6.5, 15))
+    def batch_pulse_widths_to_xy(self, pw_1, pw_2):
 
-# set 5
-pg = PantoGraph(driver=6.85, follower=10.7, motor_1_pos=-1.55, motor_2_pos=1.55, centre_1 = 1721, multiplier_1 = 9.6778, centre_2= 983, multiplier_2 = 9.8889, box_bounds=(-6, 8, 6, 15.5))
+        # where the pen will really be for arrays of pulse-widths
+
+        import numpy
+
+        angle_1 = (numpy.asarray(pw_1) - self.centre_1) / self.multiplier_1 - self.correction_1
+        angle_2 = (numpy.asarray(pw_2) - self.centre_2) / self.multiplier_2 - self.correction_2
+
+        return self.batch_angles_to_xy(angle_1, angle_2)
+
+
+    def simulate(self, lines=[], interpolate=10, bounds=None, filename=None):
+
+        # Predicts what the plotter will actually draw for the lines, and returns a report of the distortion. If a
+        # filename is supplied, the predicted drawing is rendered there (in black) over the ideal one (in grey).
+        #
+        # The PantoGraph's calibration is linear, and batch_pulse_widths_to_xy() is its exact inverse, so the only
+        # distortion the simulation can show is from rounding the pulse-widths to whole microseconds.
+
+        import simulation
+
+        bounds = bounds or self.box_bounds
+
+        lines = self.fit_lines(lines, bounds)
+
+        ideal, predicted, report = simulation.simulate(
+            lines, self.batch_pulse_widths, self.batch_pulse_widths_to_xy, interpolate
+        )
+
+        if filename:
+            simulation.render(ideal, predicted, filename)
+
+        return report
+
+
+    def quiet(self, servos=[14, 15, 18]):
+
+        # if we're not connected, there are no pulses to stop
+
+        if self._rpi is not None:
+
+            for servo in servos:
+                self._rpi.set_servo_pulsewidth(servo, 0)
+
+            self.profiler.count("daemon_calls", len(servos))
+
+
+class Pen:
+
+    def __init__(self, pg, pin=18, pw_up=1650, pw_down=2100, transition_time=0.25):
+
+        self.pg = pg
+        self.pin = pin
+        self.pw_up = pw_up
+        self.pw_down = pw_down
+        self.transition_time = transition_time
+
+
+    @property
+    def rpi(self):
+
+        # the pen shares the PantoGraph's connection to pigpio
+
+        return self.pg.rpi
+
+
+    def down(self):
+        self.rpi.set_servo_pulsewidth(self.pin, self.pw_down)
+        self.pg.profiler.count("pen_transitions")
+        self.pg.profiler.count("daemon_calls")
+        self.pg.profiler.sleep(self.transition_time, "pen")
+
+
+    def up(self):
+        self.rpi.set_servo_pulsewidth(self.pin, self.pw_up)
+        self.pg.profiler.count("pen_transitions")
+        self.pg.profiler.count("daemon_calls")
+        self.pg.profiler.sleep(self.transition_time, "pen")
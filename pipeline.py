@@ -0,0 +1,94 @@
+# Plotting an image while it's still being vectorised.
+#
+# linedraw's stream_vectorise() produces a drawing a piece at a time: the contours, and then the hatching, band by
+# band. Here it runs in a thread of its own, putting each piece into a queue as soon as it's ready, while the plotter
+# takes them out and draws them. So the arm starts moving as soon as the contours are done, rather than when the
+# whole image has been vectorised, sorted and saved. The queue is bounded, so that vectorising can't run far ahead of
+# the plotter, holding pieces in memory.
+#
+#     import pipeline
+#     pipeline.plot_image(bg, "africa.jpg", band_height=128)
+#
+# Vectorising shares the Pi's processor with the plotter, so movements may be a little less smooth until it's done.
+
+import queue
+import threading
+
+import linedraw
+
+
+# put in the queue after the last piece
+finished = object()
+
+
+def stream_pieces(image_filename, queue_size=4, **options):
+
+    # Runs stream_vectorise() for the image in a thread, and yields the pieces as they come out of the queue. If
+    # vectorising fails, the error is raised here. The options are passed on to stream_vectorise().
+    #
+    # If the pieces stop being taken - because the plotting was cancelled, or failed - vectorising stops too, rather
+    # than waiting forever for room in the queue.
+
+    pieces = queue.Queue(maxsize=queue_size)
+    stopped = threading.Event()
+
+    def put(item):
+
+        # puts the item in the queue, waiting for room unless the pieces have stopped being taken; returns whether
+        # it was put there
+
+        while not stopped.is_set():
+            try:
+                pieces.put(item, timeout=.5)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    def vectorise():
+        try:
+            for piece in linedraw.stream_vectorise(image_filename, **options):
+                if not put(piece):
+                    return
+        except Exception as error:
+            put(error)
+        finally:
+            put(finished)
+
+    threading.Thread(target=vectorise, daemon=True).start()
+
+    try:
+        while True:
+
+            piece = pieces.get()
+
+            if piece is finished:
+                return
+
+            if isinstance(piece, Exception):
+                raise piece
+
+            yield piece
+
+    finally:
+        stopped.set()
+
+
+def plot_image(
+    plotter, image_filename, queue_size=4, band_height=128, wait=.1, interpolate=10, progress_callback=None, **options
+):
+
+    # Vectorises the image and plots it at the same time, using the plotter's plot_stream(). queue_size is the
+    # number of pieces that may be waiting to be drawn; band_height, and any other options, are passed on to
+    # stream_vectorise().
+
+    extent = linedraw.drawing_extent(image_filename, options.get("resolution", 1024))
+
+    return plotter.plot_stream(
+        stream_pieces(image_filename, queue_size, band_height=band_height, **options),
+        extent,
+        wait=wait,
+        interpolate=interpolate,
+        progress_callback=progress_callback,
+    )
@@ -0,0 +1,526 @@
+# A daemon that keeps a plotter busy. It accepts plotting jobs over HTTP - on a local port, or a Unix socket - and
+# plots them one after another from a persistent queue. While one job is being drawn, the next is loaded and prepared
+# (fitted to the bounds and simplified), so that the plotter can start on it as soon as the first is finished.
+#
+#     python plot_daemon.py profiles/brachiograph.json --port 8000
+#     python plot_daemon.py profiles/brachiograph.json --socket /tmp/plotter.sock
+#
+# The API:
+#
+#     POST   /jobs        submits a job: a JSON line file (as saved by linedraw), or - with the Content-Type
+#                         application/octet-stream - Strokes saved by Strokes.to_bytes(). The query string can give
+#                         the job a name, and a simplify tolerance (in plotter units). Returns the job.
+#     GET    /jobs        all the jobs, with their states
+#     GET    /jobs/<id>   a single job
+#     DELETE /jobs/<id>   cancels a job: a queued job is taken out of the queue; the job being drawn stops
+#     GET    /status      the job being drawn and its progress, the number of jobs waiting, and an estimate of the
+#                         time needed to finish them all
+#
+# For example:
+#
+#     curl --data-binary @images/africa.jpg.json "localhost:8000/jobs?name=africa&simplify=0.02"
+#     curl localhost:8000/status
+#     curl -X DELETE localhost:8000/jobs/3
+#     curl --unix-socket /tmp/plotter.sock http://localhost/status
+
+import argparse
+import copy
+import http.server
+import json
+import os
+import socketserver
+import threading
+import time
+import urllib.parse
+
+import profiling
+
+
+class JobQueue:
+
+    # A persistent queue of plotting jobs. Each job is kept in the queue folder as two files: <id>.json holds what's
+    # known about it - its name, options, state and timings - and <id>.lines holds its lines, as they were submitted.
+    # When the daemon restarts, jobs that were waiting are queued again; a job that was being drawn is marked as
+    # interrupted, rather than being drawn again over the top of itself.
+    #
+    # One thread prepares jobs and another plots them. Preparing a job also measures it - the number of points, and
+    # the distance the pen will travel - for estimating how long the queue will take. Only the next job to be drawn is
+    # kept prepared in memory.
+
+    def __init__(self, plotter, folder="queue", wait=.1, interpolate=10):
+
+        self.plotter = plotter
+        self.folder = folder
+        self.plot_options = {"wait": wait, "interpolate": interpolate}
+
+        self.jobs = {}          # id: job
+        self.prepared = {}      # id: the job's Strokes, ready to plot
+        self.current = None     # the job being drawn
+        self.progress = None    # and its Progress
+        self.cancelled = False  # whether the job being drawn has been cancelled - perhaps before its first report
+
+        # Jobs are prepared while another is being drawn, so they're prepared by a copy of the plotter with a profiler
+        # of its own; otherwise its timings would be mixed up with those of the job being drawn.
+        self.preparer = copy.copy(plotter)
+        self.preparer.profiler = profiling.Profiler()
+
+        # the seconds and distance of the jobs drawn so far, for estimating how long others will take
+        self.seconds_drawn = self.distance_drawn = 0
+
+        # guards all of the above, and is notified whenever a job is submitted, prepared, finished or cancelled
+        self.condition = threading.Condition()
+
+        os.makedirs(folder, exist_ok=True)
+
+        self.load()
+
+
+    def load(self):
+
+        # loads the jobs saved in the queue folder
+
+        for filename in os.listdir(self.folder):
+
+            if not filename.endswith(".json"):
+                continue
+
+            with open(os.path.join(self.folder, filename)) as job_file:
+                job = json.load(job_file)
+
+            if job["state"] == "plotting":
+                job["state"] = "interrupted"
+                self.save(job)
+
+            self.jobs[job["id"]] = job
+
+
+    def save(self, job):
+
+        # Saves what's known about a job. The file is written in full before it replaces the old one, so that it's
+        # never left half-written.
+
+        filename = os.path.join(self.folder, "{}.json".format(job["id"]))
+
+        with open(filename + ".tmp", "w") as job_file:
+            json.dump(job, job_file, indent=4)
+
+        os.replace(filename + ".tmp", filename)
+
+
+    def lines_filename(self, job):
+        return os.path.join(self.folder, "{}.lines".format(job["id"]))
+
+
+    def queued(self):
+
+        # the jobs waiting to be drawn, in order
+
+        return [job for job_id, job in sorted(self.jobs.items()) if job["state"] == "queued"]
+
+
+    # ----------------- the API -----------------
+
+    def submit(self, data, binary=False, name=None, simplify=0):
+
+        # Adds a job to the queue, given the contents of a JSON line file - or if binary is True, of Strokes saved
+        # by Strokes.to_bytes() - and returns it.
+
+        with self.condition:
+
+            job = {
+                "id": max(self.jobs, default=0) + 1,
+                "name": name,
+                "format": "strokes" if binary else "json",
+                "simplify": simplify,
+                "state": "queued",
+                "submitted": time.time(),
+                "started": None,
+                "finished": None,
+                "points": None,
+                "distance": None,
+                "error": None,
+            }
+
+            with open(self.lines_filename(job), "wb") as lines_file:
+                lines_file.write(data)
+
+            self.save(job)
+            self.jobs[job["id"]] = job
+
+            self.condition.notify_all()
+
+            return job
+
+
+    def cancel(self, job_id):
+
+        # Cancels a job: if it's waiting, it's taken out of the queue; if it's being drawn, the plotter stops at the
+        # end of the current movement. Returns the job, or None if there's no such job.
+
+        with self.condition:
+
+            job = self.jobs.get(job_id)
+
+            if job is None:
+                return None
+
+            if job["state"] == "queued":
+                job["state"] = "cancelled"
+                self.prepared.pop(job_id, None)
+                self.save(job)
+                self.condition.notify_all()
+
+            elif job is self.current:
+                self.cancelled = True
+                if self.progress:
+                    self.progress.cancel()
+
+            return job
+
+
+    def job_status(self, job):
+
+        # a job, along with the progress of drawing it if it's the current one
+
+        status = dict(job)
+
+        if job is self.current and self.progress:
+            status["progress"] = {
+                "points": self.progress.points,
+                "distance": self.progress.distance,
+                "fraction": self.progress.fraction,
+                "eta": self.progress.eta,
+            }
+
+        return status
+
+
+    def status(self):
+
+        # The job being drawn, the number waiting, and an estimate of the seconds needed to finish them all - or None
+        # if there's nothing yet to base an estimate on, or some of the waiting jobs haven't been measured yet.
+
+        with self.condition:
+
+            queued = self.queued()
+
+            return {
+                "current": self.current and self.job_status(self.current),
+                "queued": len(queued),
+                "eta": self.eta(queued),
+            }
+
+
+    def eta(self, queued):
+
+        # the current job's own estimate, plus the time the waiting jobs will take at the rate drawn so far
+
+        current_eta = self.progress.eta if self.current and self.progress else 0
+
+        seconds, distance = self.seconds_drawn, self.distance_drawn
+
+        if self.current and self.progress:
+            seconds, distance = seconds + self.progress.elapsed, distance + self.progress.distance
+
+        if current_eta is None or any(job["distance"] is None for job in queued):
+            return None
+
+        if not queued:
+            return current_eta
+
+        if not distance:
+            return None
+
+        return current_eta + sum(job["distance"] for job in queued) * seconds / distance
+
+
+    # ----------------- the work -----------------
+
+    def start(self):
+
+        for work in (self.prepare_jobs, self.plot_jobs):
+            threading.Thread(target=work, daemon=True).start()
+
+
+    def prepare(self, job):
+
+        # loads a job's lines and prepares them for plotting
+
+        import strokes
+        import workspace
+
+        with open(self.lines_filename(job), "rb") as lines_file:
+            data = lines_file.read()
+
+        if job["format"] == "strokes":
+            lines = strokes.Strokes.from_bytes(data)
+        else:
+            lines = json.loads(data)
+
+        # line files have y increasing downwards, like the images they were made from, so they're flipped - just
+        # as plot_file() does
+        lines = self.preparer.prepare_lines(lines, flip=True, simplify=job["simplify"])
+
+        # a job that can't be drawn fails now, rather than partway through the sheet
+        report = self.preparer.check_reach(lines, self.plot_options["interpolate"])
+
+        if report:
+            raise workspace.UnreachableError(report)
+
+        return lines
+
+
+    def next_to_prepare(self):
+
+        # The next job to be drawn, if it isn't prepared yet; otherwise, the first waiting job that hasn't yet been
+        # measured; or None.
+
+        queued = self.queued()
+
+        if queued and queued[0]["id"] not in self.prepared:
+            return queued[0]
+
+        return next((job for job in queued if job["distance"] is None), None)
+
+
+    def prepare_jobs(self):
+
+        import numpy
+
+        while True:
+
+            with self.condition:
+                self.condition.wait_for(self.next_to_prepare)
+                job = self.next_to_prepare()
+
+            try:
+                lines, error = self.prepare(job), None
+            except Exception as exception:
+                lines, error = None, exception
+
+            with self.condition:
+
+                # it may have been cancelled in the meantime
+                if job["state"] != "queued":
+                    pass
+
+                elif lines is None:
+                    job["state"], job["error"] = "failed", "Couldn't prepare the job: {}".format(error)
+
+                else:
+                    # the distance the pen travels, up and down, measured as the plotter's Progress measures it
+                    job["points"] = len(lines.points)
+                    job["distance"] = float(numpy.hypot(*numpy.diff(lines.points, axis=0).T).sum())
+
+                    # only the next job to be drawn is kept
+                    queued = self.queued()
+                    if queued and queued[0] is job:
+                        self.prepared = {job["id"]: lines}
+
+                self.save(job)
+                self.condition.notify_all()
+
+
+    def plot_jobs(self):
+
+        while True:
+
+            with self.condition:
+
+                self.condition.wait_for(lambda: self.queued() and self.queued()[0]["id"] in self.prepared)
+
+                job = self.queued()[0]
+                lines = self.prepared.pop(job["id"])
+
+                job["state"], job["started"] = "plotting", time.time()
+                self.current, self.progress, self.cancelled = job, None, False
+                self.save(job)
+
+            try:
+                with self.plotter.profiler.job(job["name"] or "job {}".format(job["id"])):
+                    self.plotter.plot_strokes(lines, progress_callback=self.report, **self.plot_options)
+
+            except Exception as error:
+                failure = "Plotting failed: {}".format(error)
+                self.plotter.quiet()
+
+            else:
+                failure = None
+
+            with self.condition:
+
+                if failure:
+                    job["state"], job["error"] = "failed", failure
+                else:
+                    job["state"] = "cancelled" if self.cancelled else "done"
+
+                if job["state"] == "done":
+                    self.seconds_drawn += self.progress.elapsed
+                    self.distance_drawn += self.progress.distance
+
+                job["finished"] = time.time()
+                self.current, self.progress = None, None
+                self.save(job)
+                self.condition.notify_all()
+
+
+    def report(self, progress):
+
+        # The progress callback for the current job: it keeps the Progress, for the status. The first report comes
+        # before anything is drawn, so a job cancelled before then is stopped before it starts.
+
+        with self.condition:
+
+            self.progress = progress
+
+            if self.cancelled:
+                progress.cancel()
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+
+    # Handles the API requests, for the JobQueue attached to the server.
+
+    def do_GET(self):
+
+        queue = self.server.queue
+        path = urllib.parse.urlparse(self.path).path.rstrip("/")
+
+        if path == "/status":
+            self.send_json(queue.status())
+
+        elif path == "/jobs":
+            with queue.condition:
+                self.send_json([queue.job_status(job) for job_id, job in sorted(queue.jobs.items())])
+
+        elif self.job_id(path) in queue.jobs:
+            with queue.condition:
+                self.send_json(queue.job_status(queue.jobs[self.job_id(path)]))
+
+        else:
+            self.send_json({"error": "Not found"}, 404)
+
+
+    def do_POST(self):
+
+        url = urllib.parse.urlparse(self.path)
+
+        if url.path.rstrip("/") != "/jobs":
+            self.send_json({"error": "Not found"}, 404)
+            return
+
+        query = urllib.parse.parse_qs(url.query)
+
+        try:
+            simplify = float(query.get("simplify", [0])[0])
+        except ValueError:
+            self.send_json({"error": "simplify must be a number"}, 400)
+            return
+
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        if not data:
+            self.send_json({"error": "No lines were supplied"}, 400)
+            return
+
+        job = self.server.queue.submit(
+            data,
+            binary=self.headers.get("Content-Type") == "application/octet-stream",
+            name=query.get("name", [None])[0],
+            simplify=simplify,
+        )
+
+        self.send_json(job, 201)
+
+
+    def do_DELETE(self):
+
+        job = self.server.queue.cancel(self.job_id(urllib.parse.urlparse(self.path).path.rstrip("/")))
+
+        if job is None:
+            self.send_json({"error": "Not found"}, 404)
+        else:
+            self.send_json(job)
+
+
+    def job_id(self, path):
+
+        # the id of the job in a /jobs/<id> path, or None
+
+        prefix, _, job_id = path.rpartition("/")
+
+        return int(job_id) if prefix == "/jobs" and job_id.isdigit() else None
+
+
+    def send_json(self, value, status=200):
+
+        body = json.dumps(value).encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def address_string(self):
+
+        # connections over a Unix socket have no address
+
+        return self.client_address[0] if self.client_address else "unix socket"
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+
+def serve(queue, port=8000, socket_path=None):
+
+    # Serves the API for the queue - on a Unix socket if a path is given, otherwise on the port, for connections
+    # from this machine only - until interrupted.
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+        server = UnixHTTPServer(socket_path, Handler)
+
+    else:
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", port), Handler)
+
+    server.queue = queue
+    queue.start()
+
+    try:
+        server.serve_forever()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        server.server_close()
+        queue.plotter.quiet()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plot jobs from a queue, submitted over HTTP.")
+    parser.add_argument("profile", help="The calibration profile of the BrachioGraph (see calibration.py)")
+    parser.add_argument("--port", type=int, default=8000, help="The local port to listen on")
+    parser.add_argument("--socket", help="A Unix socket to listen on, instead of a port")
+    parser.add_argument("--queue", default="queue", help="The folder in which the queue is kept")
+    parser.add_argument("--wait", type=float, default=.1, help="The wait value for plotting")
+    parser.add_argument("--interpolate", type=int, default=10, help="The interpolate value for plotting")
+
+    args = parser.parse_args()
+
+    from brachiograph import BrachioGraph
+
+    queue = JobQueue(
+        BrachioGraph.from_profile(args.profile), folder=args.queue, wait=args.wait, interpolate=args.interpolate
+    )
+
+    # connect to the plotter and home it now, rather than when the first job arrives
+    queue.plotter.connect()
+
+    serve(queue, port=args.port, socket_path=args.socket)
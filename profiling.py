@@ -0,0 +1,186 @@
+# Instrumentation for finding out where the time in a job goes.
+#
+# A Profiler keeps named timers (total seconds and number of calls) and named counters. The plotters and linedraw use
+# them to record time spent on geometry, pulse-width calculation, pigpio calls, sleeping and pen movements, along with
+# counts of steps, daemon calls and pen transitions. When a profiler is disabled - as it is by default - each hook
+# does almost nothing, so they can stay in the hot loops.
+#
+# The figures for a job can be exported as JSON, or as text in the Prometheus exposition format.
+
+import contextlib
+import functools
+import json
+import time
+
+
+# the context manager used in place of a timer when profiling is disabled
+null_timer = contextlib.nullcontext()
+
+
+class Profiler:
+
+    def __init__(self, enabled=False):
+
+        self.enabled = enabled
+        self.reset()
+
+
+    def reset(self):
+
+        self.job_name = None
+        self.timers = {}    # name: [total seconds, calls]
+        self.counters = {}  # name: total
+
+
+    def count(self, name, value=1):
+
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+
+    def add_time(self, name, seconds):
+
+        if self.enabled:
+            timer = self.timers.setdefault(name, [0, 0])
+            timer[0] += seconds
+            timer[1] += 1
+
+
+    def timer(self, name):
+
+        # Returns a context manager that adds the time spent in its block to the named timer.
+
+        if not self.enabled:
+            return null_timer
+
+        return Timer(self, name)
+
+
+    def timed(self, name):
+
+        # A decorator that adds the time spent in every call of the function to the named timer.
+
+        def decorator(function):
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+
+    @contextlib.contextmanager
+    def job(self, name):
+
+        # Times a whole job under the "job" timer, first clearing the figures from any previous one, so that each
+        # job's figures can be exported on their own.
+
+        if self.enabled:
+            self.reset()
+            self.job_name = name
+
+        with self.timer("job"):
+            yield
+
+
+    def sleep(self, seconds, name="sleep"):
+
+        # Sleeps, adding the time actually slept to the named timer.
+
+        if not self.enabled:
+            time.sleep(seconds)
+            return
+
+        start = time.perf_counter()
+        time.sleep(seconds)
+        self.add_time(name, time.perf_counter() - start)
+
+
+    def report(self):
+
+        # Returns the figures as a dictionary. "unaccounted_seconds" is the time in the job not recorded by any other
+        # timer - the Python overhead of the loops, progress bars and so on.
+
+        report = {
+            "job": self.job_name,
+            "timers": {name: {"seconds": seconds, "calls": calls} for name, (seconds, calls) in self.timers.items()},
+            "counters": dict(self.counters),
+        }
+
+        if "job" in self.timers:
+            report["unaccounted_seconds"] = self.timers["job"][0] - sum(
+                seconds for name, (seconds, calls) in self.timers.items() if name != "job"
+            )
+
+        return report
+
+
+    def to_json(self, filename=None):
+
+        # Returns the report as JSON, saving it too if a filename is supplied.
+
+        report = json.dumps(self.report(), indent=4)
+
+        if filename:
+            with open(filename, "w") as report_file:
+                report_file.write(report)
+
+        return report
+
+
+    def to_prometheus(self, prefix="plotter"):
+
+        # Returns the figures in the Prometheus text exposition format, labelled with the job name.
+
+        job = 'job="{}",'.format(label(self.job_name)) if self.job_name else ""
+
+        out = [
+            "# HELP {}_timer_seconds_total Time spent, by timer.".format(prefix),
+            "# TYPE {}_timer_seconds_total counter".format(prefix),
+        ]
+        for name, (seconds, calls) in self.timers.items():
+            out.append('{}_timer_seconds_total{{{}timer="{}"}} {}'.format(prefix, job, label(name), seconds))
+
+        out += [
+            "# HELP {}_timer_calls_total Number of timed calls, by timer.".format(prefix),
+            "# TYPE {}_timer_calls_total counter".format(prefix),
+        ]
+        for name, (seconds, calls) in self.timers.items():
+            out.append('{}_timer_calls_total{{{}timer="{}"}} {}'.format(prefix, job, label(name), calls))
+
+        out += [
+            "# HELP {}_events_total Number of events, by counter.".format(prefix),
+            "# TYPE {}_events_total counter".format(prefix),
+        ]
+        for name, value in self.counters.items():
+            out.append('{}_events_total{{{}counter="{}"}} {}'.format(prefix, job, label(name), value))
+
+        return "\n".join(out) + "\n"
+
+
+def label(value):
+
+    # a value made safe for a Prometheus label - a job's name, for example, can contain anything
+
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Timer:
+
+    def __init__(self, profiler, name):
+
+        self.profiler = profiler
+        self.name = name
+
+
+    def __enter__(self):
+
+        self.start = time.perf_counter()
+
+
+    def __exit__(self, *exception):
+
+        self.profiler.add_time(self.name, time.perf_counter() - self.start)
@@ -0,0 +1,153 @@
+# Progress reporting for plotting jobs.
+#
+# Rather than a progress bar for each line and for each movement - constantly redrawing the terminal in the middle of
+# the motion loop - a job keeps a single Progress, which counts the points and the distance done, and passes itself
+# to a callback no more often than every interval seconds. The callback can update a progress bar, write to a log, or
+# do anything else with it.
+#
+# A job can be cancelled through its Progress: the plotter checks it between movements, and stops drawing.
+
+import time
+
+
+class Progress:
+
+    def __init__(self, total_points, total_distance=0, callback=None, interval=.5):
+
+        self.total_points = total_points
+        self.total_distance = total_distance
+        self.callback = callback
+        self.interval = interval
+
+        self.points = 0
+        self.distance = 0
+        self.finished = False
+        self.cancelled = False
+
+        self.start_time = self.last_report = time.monotonic()
+        self.finish_time = None
+
+        self.report()
+
+
+    def advance(self, points=1, distance=0):
+
+        # Counts the points and distance done; this is called for every point, so it does as little as possible.
+
+        self.points += points
+        self.distance += distance
+
+        if self.callback and time.monotonic() - self.last_report >= self.interval:
+            self.report()
+
+
+    def cancel(self):
+
+        # asks the plotter to stop the job; it does so at the end of the current movement, and then finishes it
+
+        self.cancelled = True
+
+
+    def finish(self):
+
+        self.finished = True
+        self.finish_time = time.monotonic()
+        self.report()
+
+
+    def report(self):
+
+        self.last_report = time.monotonic()
+
+        if self.callback:
+            self.callback(self)
+
+
+    @property
+    def elapsed(self):
+        return (self.finish_time or time.monotonic()) - self.start_time
+
+
+    @property
+    def fraction(self):
+
+        # The fraction of the job done. The time taken to draw is roughly proportional to the distance covered, so
+        # distance is the better measure; points are used if the distance isn't known.
+
+        if self.total_distance:
+            return min(self.distance / self.total_distance, 1)
+
+        if self.total_points:
+            return min(self.points / self.total_points, 1)
+
+        return 1
+
+
+    @property
+    def eta(self):
+
+        # the estimated number of seconds remaining, or None if nothing is done yet to base an estimate on
+
+        fraction = self.fraction
+
+        if self.finished or fraction >= 1:
+            return 0
+
+        if not fraction:
+            return None
+
+        return self.elapsed * (1 - fraction) / fraction
+
+
+    def __str__(self):
+
+        eta = self.eta
+
+        return "{}/{} points, {:.1f}/{:.1f} distance, {:.0f}% done, {}".format(
+            self.points, self.total_points, self.distance, self.total_distance, self.fraction * 100,
+            "cancelled after {:.0f}s".format(self.elapsed) if self.finished and self.cancelled else
+            "finished in {:.0f}s".format(self.elapsed) if self.finished else
+            "ETA {:.0f}s".format(eta) if eta is not None else "ETA unknown"
+        )
+
+
+class TqdmReporter:
+
+    # A callback that shows a job's progress on a single tqdm bar, counting points.
+
+    def __init__(self, **kwargs):
+
+        self.kwargs = kwargs
+        self.bar = None
+
+
+    def __call__(self, progress):
+
+        import tqdm
+
+        if self.bar is None:
+            self.bar = tqdm.tqdm(total=progress.total_points, unit="point", **self.kwargs)
+
+        # the total can grow, if the job arrives in pieces
+        self.bar.total = progress.total_points
+        self.bar.n = progress.points
+        self.bar.refresh()
+
+        if progress.finished:
+            self.bar.close()
+            self.bar = None
+
+
+class LogReporter:
+
+    # A callback that writes a line describing a job's progress, using the given function (print by default, or for
+    # example a logger's info method).
+
+    def __init__(self, log=print):
+
+        self.log = log
+
+
+    def __call__(self, progress):
+
+        self.log(str(progress))
@@ -0,0 +1,72 @@
+# Simulates what a plotter will actually draw.
+#
+# The pulse-widths a plotter sends to its servos are worked out from a calibration that is only an approximation of
+# how the servos really behave. By taking the pulse-widths that would be sent and working back through the measured
+# behaviour of the servos to the angles they will really reach, and from those to the position of the pen, we can
+# predict the drawing the plotter will produce - and how far it will be from the ideal - without using the plotter.
+
+import numpy
+
+import workspace
+
+
+def interpolate_lines(lines, interpolate=10):
+
+    # Returns all the points the pen will be moved through to draw the lines - as the plotters' xy() methods
+    # interpolate them, and as check_reach() checks them (see workspace.path_positions()), but without the pen-up
+    # moves between the lines - as a single array, along with the index in it at which each line starts.
+
+    positions, stroke, drawing = workspace.path_positions(lines, interpolate, pen_up=False)
+
+    return positions, numpy.searchsorted(stroke, numpy.arange(len(lines)))
+
+
+def simulate(lines, pulse_widths, pulse_widths_to_xy, interpolate=10):
+
+    # Given the lines (in plotter co-ordinates), a function that returns the pulse-widths the plotter would send for
+    # arrays of x and y values, and a function that returns where the pen would really end up for arrays of
+    # pulse-widths, returns:
+    #
+    # * the ideal lines, as the points the pen should pass through
+    # * the predicted lines, as the points the pen is expected to actually pass through
+    # * a report of the distortion: how far the predicted points are from the ideal ones
+
+    points, starts = interpolate_lines(lines, interpolate)
+
+    if not len(points):
+        report = {"points": 0, "mean_error": 0., "rms_error": 0., "max_error": 0., "unreachable_points": 0}
+        return [], [], report
+
+    pw_1, pw_2 = pulse_widths(points[:, 0], points[:, 1])
+
+    # pigpio only works in whole microseconds
+    x, y = pulse_widths_to_xy(numpy.round(pw_1), numpy.round(pw_2))
+
+    predicted = numpy.column_stack((x, y))
+    errors = numpy.hypot(*(predicted - points).T)
+
+    # the errors are measured over the points that can be reached; if none can, there are none to measure
+    reached = errors[numpy.isfinite(errors)]
+
+    report = {
+        "points": len(points),
+        "mean_error": float(reached.mean()) if len(reached) else numpy.nan,
+        "rms_error": float(numpy.sqrt((reached ** 2).mean())) if len(reached) else numpy.nan,
+        "max_error": float(reached.max()) if len(reached) else numpy.nan,
+        "unreachable_points": len(errors) - len(reached),
+    }
+
+    return numpy.split(points, starts[1:]), numpy.split(predicted, starts[1:]), report
+
+
+def render(ideal, predicted, filename):
+
+    # Renders the predicted lines in black over the ideal ones in grey. The lines are in plotter co-ordinates, with y
+    # increasing upwards, while images have it increasing downwards, so they are turned the right way up first.
+
+    import linedraw
+
+    def upright(lines):
+        return [numpy.asarray(line) * (1, -1) for line in lines]
+
+    return linedraw.render(upright(predicted), filename, reference=upright(ideal))
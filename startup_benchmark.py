@@ -0,0 +1,77 @@
+# Measures how quickly the plotter's modules start up.
+#
+# Each benchmark is run several times, each time in a fresh Python process (so that nothing is already imported), and
+# the median time is reported - along with which of the slow-to-import third-party modules it loaded. Run it on the
+# Raspberry Pi itself to see the times that matter:
+#
+#     python startup_benchmark.py
+#     python startup_benchmark.py --repeat 10
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+
+# the modules that are slow to import, particularly on a Pi Zero
+heavy_modules = ["numpy", "cv2", "PIL", "pigpio", "readchar", "tqdm"]
+
+benchmarks = {
+    "import brachiograph": "import brachiograph",
+    "import linedraw": "import linedraw",
+    "import pantograph": "import pantograph",
+    "create a BrachioGraph": "import brachiograph; brachiograph.BrachioGraph(inner_arm=8, outer_arm=8)",
+    "create a PantoGraph": "import pantograph; pantograph.PantoGraph()",
+    "plan a line (no hardware)": (
+        "import brachiograph; "
+        "brachiograph.BrachioGraph(inner_arm=8, outer_arm=8, bounds=(-8, 4, 6, 13)).simulate([[(0, 0), (1, 1)]])"
+    ),
+}
+
+# run in the fresh process: times the statement, and reports which heavy modules it imported
+runner = """
+import sys, time
+start = time.perf_counter()
+exec({statement!r})
+elapsed = time.perf_counter() - start
+print(elapsed, *[module for module in {heavy_modules!r} if module in sys.modules])
+"""
+
+
+def run(statement, repeat=5):
+
+    # Returns the median time taken by the statement, and the heavy modules it imported - or None and the error if it
+    # failed.
+
+    times = []
+
+    for _ in range(repeat):
+
+        result = subprocess.run(
+            [sys.executable, "-c", runner.format(statement=statement, heavy_modules=heavy_modules)],
+            capture_output=True, text=True
+        )
+
+        if result.returncode:
+            return None, result.stderr.strip().splitlines()[-1]
+
+        elapsed, *modules = result.stdout.strip().splitlines()[-1].split()
+        times.append(float(elapsed))
+
+    return statistics.median(times), modules
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure how quickly the plotter's modules start up.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs of each benchmark")
+
+    args = parser.parse_args()
+
+    for name, statement in benchmarks.items():
+
+        elapsed, modules = run(statement, args.repeat)
+
+        if elapsed is None:
+            print("{:<28} failed: {}".format(name, modules))
+        else:
+            print("{:<28} {:8.3f}s   {}".format(name, elapsed, ", ".join(modules) or "-"))
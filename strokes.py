@@ -0,0 +1,261 @@
+# Tools for working with lines - lists of lines, each of which is a list of x/y points - between vectorising an image
+# and plotting it.
+
+import io
+
+import numpy
+
+
+class Strokes:
+
+    # A memory-compact container for lines. All the points of all the lines are held in a single contiguous array of
+    # shape (points, 2), and the lines are marked out by an array of offsets into it: line i runs from offsets[i] up
+    # to offsets[i + 1]. This takes a fraction of the memory of a list of lists of points, and allows operations on
+    # all the points at once to be vectorised.
+    #
+    # Strokes behaves like a list of lines - each line an array of points - so it can be used wherever a list of
+    # lines is expected.
+
+    def __init__(self, points=None, offsets=None):
+
+        if points is None:
+            points = numpy.zeros((0, 2))
+
+        if offsets is None:
+            offsets = numpy.zeros(1, dtype=int)
+
+        self.points = numpy.asarray(points, dtype=float).reshape(-1, 2)
+        self.offsets = numpy.asarray(offsets, dtype=int)
+
+
+    @classmethod
+    def from_lines(cls, lines):
+
+        # Returns a Strokes object containing the lines; if lines is already a Strokes object, it's returned as it is.
+
+        if isinstance(lines, cls):
+            return lines
+
+        lines = [numpy.asarray(line, dtype=float).reshape(-1, 2) for line in lines]
+
+        offsets = numpy.zeros(len(lines) + 1, dtype=int)
+        offsets[1:] = numpy.cumsum([len(line) for line in lines])
+
+        return cls(numpy.concatenate(lines) if lines else None, offsets)
+
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+    def __repr__(self):
+        return "<Strokes: {} strokes, {} points>".format(len(self), len(self.points))
+
+
+    def __getitem__(self, index):
+
+        # A single stroke is returned as a view of its points; a slice as a new Strokes object.
+
+        if isinstance(index, slice):
+            indices = range(len(self))[index]
+
+            if indices.step == 1:
+                start, stop = self.offsets[indices.start], self.offsets[indices.stop]
+                return Strokes(self.points[start:stop], self.offsets[indices.start:indices.stop + 1] - start)
+
+            return self.reorder(list(indices))
+
+        index = range(len(self))[index]
+
+        return self.points[self.offsets[index]:self.offsets[index + 1]]
+
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+    def __add__(self, other):
+
+        other = Strokes.from_lines(other)
+
+        return Strokes(
+            numpy.concatenate((self.points, other.points)),
+            numpy.concatenate((self.offsets, other.offsets[1:] + self.offsets[-1])),
+        )
+
+
+    def reversed(self, index):
+
+        # a view of the points of a stroke, in reverse order
+
+        return self[index][::-1]
+
+
+    def reorder(self, order, reverse=None):
+
+        # Returns a new Strokes object containing the strokes at the indices in order, in that order - each one
+        # reversed if the corresponding value in reverse is True.
+
+        order = numpy.asarray(order, dtype=int)
+        reverse = numpy.zeros(len(order), dtype=bool) if reverse is None else numpy.asarray(reverse, dtype=bool)
+
+        starts, ends = self.offsets[:-1][order], self.offsets[1:][order]
+        lengths = ends - starts
+
+        offsets = numpy.zeros(len(order) + 1, dtype=int)
+        offsets[1:] = numpy.cumsum(lengths)
+
+        # for each point of the new strokes, its position within its stroke, and so the index of its source point
+        position = numpy.arange(offsets[-1]) - numpy.repeat(offsets[:-1], lengths)
+        source = numpy.where(
+            numpy.repeat(reverse, lengths),
+            numpy.repeat(ends, lengths) - 1 - position,
+            numpy.repeat(starts, lengths) + position,
+        )
+
+        return Strokes(self.points[source], offsets)
+
+
+    def copy(self):
+        return Strokes(self.points.copy(), self.offsets.copy())
+
+
+    @property
+    def starts(self):
+        # the first point of each stroke
+        return self.points[self.offsets[:-1]]
+
+
+    @property
+    def ends(self):
+        # the last point of each stroke
+        return self.points[self.offsets[1:] - 1]
+
+
+    @property
+    def bounds(self):
+        # the rectangle enclosing all the strokes, as (min x, min y, max x, max y)
+        return (*self.points.min(axis=0), *self.points.max(axis=0))
+
+
+    def lengths(self):
+
+        # the length of each stroke - the distance the pen travels while drawing it
+
+        distances = numpy.hypot(*numpy.diff(self.points, axis=0).T)
+
+        # which stroke each point belongs to; the distance between two points only counts if it's the same one
+        stroke = numpy.repeat(numpy.arange(len(self)), numpy.diff(self.offsets))
+        same = stroke[1:] == stroke[:-1]
+
+        return numpy.bincount(stroke[:-1][same], weights=distances[same], minlength=len(self))
+
+
+    @property
+    def length(self):
+        # the total length of all the strokes
+        return float(self.lengths().sum())
+
+
+    def travel(self, start=None):
+
+        # the distance the pen travels with the pen up, from the end of each stroke to the start of the next - and
+        # first from the start position to the first stroke, if one is given
+
+        gaps = numpy.hypot(*(self.starts[1:] - self.ends[:-1]).T).sum() if len(self) else 0.
+
+        if start is not None and len(self):
+            gaps += numpy.hypot(*(self.starts[0] - numpy.asarray(start, dtype=float)))
+
+        return float(gaps)
+
+
+    @classmethod
+    def from_bytes(cls, data):
+
+        # Returns the Strokes saved by to_bytes().
+
+        with numpy.load(io.BytesIO(data)) as arrays:
+            return cls(arrays["points"], arrays["offsets"])
+
+
+    def to_bytes(self):
+
+        # the strokes in numpy's binary .npz format: much smaller, and much quicker to read, than JSON
+
+        buffer = io.BytesIO()
+        numpy.savez(buffer, points=self.points, offsets=self.offsets)
+
+        return buffer.getvalue()
+
+
+    def tolist(self):
+        # the strokes as a list of lists of [x, y] points, as saved in JSON files
+        return [self.points[start:end].tolist() for start, end in zip(self.offsets[:-1], self.offsets[1:])]
+
+
+def simplify_line(line, tolerance):
+
+    # Simplifies a line using the Ramer-Douglas-Peucker algorithm: it keeps only the points needed for the simplified
+    # line never to stray further than tolerance from the original one. Returns an array of the points kept.
+
+    points = numpy.asarray(line, dtype=float)
+
+    if len(points) < 3:
+        return points
+
+    keep = numpy.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+
+    sections = [(0, len(points) - 1)]
+
+    while sections:
+
+        start, end = sections.pop()
+
+        if end - start < 2:
+            continue
+
+        # the distance of every point in this section from the straight line between its ends
+        chord = points[end] - points[start]
+        offsets = points[start + 1:end] - points[start]
+        chord_length = numpy.hypot(*chord)
+
+        if chord_length:
+            distances = numpy.abs(chord[0] * offsets[:, 1] - chord[1] * offsets[:, 0]) / chord_length
+        else:
+            distances = numpy.hypot(offsets[:, 0], offsets[:, 1])
+
+        furthest = numpy.argmax(distances)
+
+        # if any point is too far away, keep it and simplify the sections on either side of it
+        if distances[furthest] > tolerance:
+            index = start + 1 + furthest
+            keep[index] = True
+            sections.append((start, index))
+            sections.append((index, end))
+
+    return points[keep]
+
+
+def simplify_lines(lines, tolerance, report=False):
+
+    # Simplifies all the lines. Each point removed saves the plotter a movement. If the lines are Strokes, so is the
+    # result. If report is True, how many points were removed is printed.
+
+    if isinstance(lines, Strokes):
+        simplified = Strokes.from_lines([simplify_line(line, tolerance) for line in lines])
+    else:
+        simplified = [simplify_line(line, tolerance).tolist() for line in lines]
+
+    if report:
+        before = sum(len(line) for line in lines)
+        after = sum(len(line) for line in simplified)
+
+        print(
+            "simplified", before, "points to", after,
+            "({:.0f}% fewer).".format(100 * (before - after) / before if before else 0)
+        )
+
+    return simplified
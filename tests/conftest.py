@@ -0,0 +1,52 @@
+# The modules live at the top of the repository, rather than in a package, so the tests import them from there.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import types
+
+import pytest
+
+
+class FakePi:
+
+    # stands in for a pigpio.pi() instance, remembering the pulse-widths it has been sent - in whole microseconds, as
+    # pigpio does
+
+    def __init__(self):
+        self.pulse_widths = {}
+        self.sent = []
+
+    def set_PWM_frequency(self, pin, frequency):
+        pass
+
+    def set_servo_pulsewidth(self, pin, pulse_width):
+        self.pulse_widths[pin] = int(pulse_width)
+        self.sent.append((pin, int(pulse_width)))
+
+    def get_servo_pulsewidth(self, pin):
+        return self.pulse_widths.get(pin, 0)
+
+
+@pytest.fixture
+def fake_pigpio(monkeypatch):
+
+    # plotters created in the test drive a FakePi instead of a Raspberry Pi, and don't wait for their servos
+
+    import brachiograph
+    import pantograph
+
+    pis = []
+
+    def pi():
+        pis.append(FakePi())
+        return pis[-1]
+
+    monkeypatch.setitem(sys.modules, "pigpio", types.SimpleNamespace(pi=pi))
+    monkeypatch.setattr("time.sleep", lambda seconds: None)
+    monkeypatch.setattr(brachiograph, "sleep", lambda seconds: None)
+    monkeypatch.setattr(pantograph, "sleep", lambda seconds: None)
+
+    return pis
@@ -0,0 +1,109 @@
+import json
+
+import numpy
+import pytest
+
+import calibration
+from brachiograph import BrachioGraph
+from pantograph import PantoGraph
+
+
+def servo(angle):
+
+    # the pulse-width a slightly non-linear servo needs to reach an angle
+    return 1500 + angle * 10.5 + angle ** 2 / 200
+
+
+def test_fit_servo_and_its_inverse():
+
+    fit = calibration.fit_servo([(angle, servo(angle)) for angle in range(-90, 91, 15)])
+
+    angles = numpy.linspace(-90, 90, 13)
+
+    assert fit["angle_range"] == [-90, 90]
+    assert numpy.allclose(numpy.poly1d(fit["angles_to_pw"])(angles), servo(angles))
+    assert numpy.allclose(numpy.poly1d(fit["pw_to_angles"])(servo(angles)), angles, atol=.01)
+
+    # the fit can be saved as it is
+    json.dumps(fit)
+
+
+def test_fit_servo_bidi():
+
+    fit = calibration.fit_servo_bidi([(angle, servo(angle) + 4, servo(angle) - 4) for angle in range(-90, 91, 15)])
+
+    angles = numpy.linspace(-90, 90, 13)
+
+    assert numpy.allclose(numpy.poly1d(fit["angles_to_pw"])(angles), servo(angles))
+    assert numpy.allclose(numpy.poly1d(fit["angles_to_pw_increasing"])(angles), servo(angles) + 4)
+    assert numpy.allclose(numpy.poly1d(fit["angles_to_pw_decreasing"])(angles), servo(angles) - 4)
+
+
+@pytest.mark.parametrize("slope, samples", [
+    (1, [(0, 1497), (0, 1503), (10, 1603), (10, 1597), (20, 1700)]),
+    (-1, [(0, 1503), (0, 1497), (10, 1397), (10, 1403), (20, 1300)]),
+], ids=["increasing", "decreasing"])
+def test_pair_directions(slope, samples):
+
+    # each angle is arrived at once from each side, in no particular order; the last is only measured once
+    paired = calibration.pair_directions(samples)
+
+    assert [angle for angle, increasing, decreasing in paired] == [0, 10]
+
+    # arriving with the angle increasing leaves the servo short of it, so it takes the pulse-width further along
+    for angle, increasing, decreasing in paired:
+        assert (increasing - decreasing) * slope == 6
+
+
+def test_load_profile_for_the_wrong_plotter(tmp_path):
+
+    filename = str(tmp_path / "profile.json")
+    calibration.save_profile(filename, "PantoGraph", {"driver": 6})
+
+    assert calibration.load_profile(filename, "PantoGraph") == {"driver": 6}
+
+    with pytest.raises(ValueError):
+        calibration.load_profile(filename, "BrachioGraph")
+
+
+def test_brachiograph_profile_round_trip(tmp_path):
+
+    filename = str(tmp_path / "profiles" / "brachiograph.json")
+
+    original = BrachioGraph(
+        8, 8, bounds=(-6, 4, 6, 12),
+        servo_1_angle_pws_bidi=[(angle, servo(angle + 90) + 4, servo(angle + 90) - 4) for angle in range(-180, 1, 30)],
+        servo_2_angle_pws=[(angle, servo(angle - 90)) for angle in range(0, 181, 30)],
+        max_angular_velocity=300,
+    )
+    original.save_profile(filename, samples=[1, 2, 3])
+
+    restored = BrachioGraph.from_profile(filename)
+
+    assert restored.servo_1_fit == original.servo_1_fit and restored.servo_2_fit == original.servo_2_fit
+    assert restored.bounds == list(original.bounds)
+    assert restored.max_angular_velocity == 300
+
+    x, y = numpy.meshgrid(numpy.linspace(-6, 6, 7), numpy.linspace(4, 12, 5))
+    assert numpy.allclose(restored.batch_pulse_widths(x, y), original.batch_pulse_widths(x, y))
+    assert numpy.allclose(restored.hysteresis_1(-90), original.hysteresis_1(-90))
+
+    # other arguments override the profile
+    assert BrachioGraph.from_profile(filename, max_angular_velocity=100).max_angular_velocity == 100
+
+
+def test_pantograph_profile_round_trip(tmp_path):
+
+    filename = str(tmp_path / "pantograph.json")
+
+    original = PantoGraph(centre_1=1400, centre_2=1300, box_bounds=(-3.75, 8, 3.75, 13))
+    original.save_profile(filename)
+
+    restored = PantoGraph.from_profile(filename)
+
+    x, y = numpy.meshgrid(numpy.linspace(-3.75, 3.75, 7), numpy.linspace(8, 13, 5))
+    assert numpy.allclose(restored.batch_pulse_widths(x, y), original.batch_pulse_widths(x, y))
+    assert restored.box_bounds == list(original.box_bounds)
+
+    with pytest.raises(ValueError):
+        BrachioGraph.from_profile(filename)
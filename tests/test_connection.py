@@ -0,0 +1,89 @@
+import pytest
+
+from brachiograph import BrachioGraph
+from pantograph import PantoGraph
+
+
+def brachiograph():
+    return BrachioGraph(8, 8)
+
+
+def pantograph():
+    return PantoGraph()
+
+
+plotters = pytest.mark.parametrize("make_plotter", [brachiograph, pantograph], ids=["brachiograph", "pantograph"])
+
+
+def count_homing(plotter, monkeypatch):
+
+    # counts the times the plotter is homed, and the times its pen is tested (only the BrachioGraph's pen has a test)
+
+    counts = {"home": 0, "test": 0}
+
+    def counted(name, method):
+        def call(*args, **kwargs):
+            counts[name] += 1
+            return method(*args, **kwargs)
+        return call
+
+    monkeypatch.setattr(plotter, "home", counted("home", plotter.home))
+
+    if hasattr(plotter.pen, "test"):
+        monkeypatch.setattr(plotter.pen, "test", counted("test", plotter.pen.test))
+
+    return counts
+
+
+@plotters
+def test_creating_a_plotter_does_not_connect(make_plotter, fake_pigpio):
+
+    make_plotter()
+
+    assert not fake_pigpio
+
+
+@plotters
+def test_first_use_homes_once(make_plotter, fake_pigpio, monkeypatch):
+
+    plotter = make_plotter()
+    counts = count_homing(plotter, monkeypatch)
+
+    plotter.pen.up()
+    plotter.pen.down()
+
+    assert len(fake_pigpio) == 1
+    assert counts["home"] == 1
+
+
+@plotters
+@pytest.mark.parametrize("first", ["home", "connect"])
+def test_home_or_connect_homes_once(make_plotter, first, fake_pigpio, monkeypatch):
+
+    plotter = make_plotter()
+    counts = count_homing(plotter, monkeypatch)
+
+    getattr(plotter, first)()
+
+    assert len(fake_pigpio) == 1
+    assert counts["home"] == 1
+
+    if isinstance(plotter, BrachioGraph):
+        assert counts["test"] == 1
+
+    # once connected, connecting again does nothing
+    plotter.connect()
+
+    assert len(fake_pigpio) == 1
+    assert counts["home"] == 1
+
+
+def test_connect_without_homing(fake_pigpio, monkeypatch):
+
+    plotter = brachiograph()
+    counts = count_homing(plotter, monkeypatch)
+
+    plotter.connect(home=False)
+
+    assert len(fake_pigpio) == 1
+    assert counts["home"] == 0 and not fake_pigpio[0].sent
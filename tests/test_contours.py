@@ -0,0 +1,70 @@
+import pytest
+
+import linedraw
+
+Image = pytest.importorskip("PIL.Image")
+ImageDraw = pytest.importorskip("PIL.ImageDraw")
+pytest.importorskip("cv2")
+
+
+def shapes(size=96):
+
+    # dark shapes on a white image, some of them lying across the seams between tiles of 48 pixels
+
+    image = Image.new("L", (size, size), 255)
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((20, 20, 76, 76), fill=0)
+    draw.rectangle((4, 60, 40, 90), fill=120)
+    draw.line((0, 10, 95, 30), fill=0, width=3)
+
+    return image
+
+
+def points(contours):
+    return [point for contour in contours for point in contour]
+
+
+def test_a_single_tile_is_the_whole_image(capsys):
+
+    image = shapes()
+    whole = (0, 0) + image.size
+
+    assert linedraw.tile_contours((image, whole, whole)) == linedraw.image_contours(image)
+
+
+def test_tiles_only_keep_their_own_points(capsys):
+
+    image = shapes()
+    box, core = (32, 32, 96, 96), (48, 48, 96, 96)
+
+    pieces = linedraw.tile_contours((image.crop(box), box, core))
+
+    assert pieces
+    assert all(48 <= x < 96 and 48 <= y < 96 for x, y in points(pieces))
+
+
+def test_tiled_contours_match_the_whole_image(capsys):
+
+    image = shapes()
+
+    whole = points(linedraw.image_contours(image))
+    tiled = points(linedraw.tiled_contours(image, tile_size=48, overlap=16, processes=2))
+
+    # each point is found by the tile it's in, just as it is in the whole image, and not again by its neighbours
+    # (though a point can be found twice in either, scanning across the image and down it)
+    assert sorted(tiled) == sorted(whole)
+
+
+def test_getcontours_in_tiles(capsys):
+
+    image = shapes()
+
+    contours = linedraw.getcontours(image, sc=2, tile_size=48, processes=2)
+
+    assert "processing 4 tiles" in capsys.readouterr().out
+    assert contours and all(len(contour) > 1 for contour in contours)
+    assert all(0 <= x < 192 and 0 <= y < 192 for x, y in points(contours))
+
+    # small images aren't divided
+    linedraw.getcontours(image, sc=2, tile_size=96)
+    assert "tiles" not in capsys.readouterr().out
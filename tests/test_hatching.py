@@ -0,0 +1,143 @@
+import pytest
+
+import linedraw
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def gradient(width=12, height=10):
+
+    # an image that darkens from top to bottom and from left to right, so that every kind of hatching is used
+
+    image = Image.new("L", (width, height))
+    image.putdata([255 - (x + y) * 255 // (width + height - 2) for y in range(height) for x in range(width)])
+
+    return image
+
+
+def lines_as_set(lines):
+    return {tuple(map(tuple, line)) for line in lines}
+
+
+def test_thinning_without_a_spacing_keeps_everything():
+
+    horizontal, diagonal = linedraw.hatch_cells(gradient())
+
+    assert linedraw.thinned_hatch(horizontal, diagonal) == (horizontal, diagonal)
+
+
+def test_thinning_keeps_whole_rows_and_diagonals():
+
+    sc = 16
+    horizontal, diagonal = linedraw.hatch_cells(gradient(), sc)
+
+    kept_horizontal, kept_diagonal = linedraw.thinned_hatch(horizontal, diagonal, sc, spacing=2 * sc)
+
+    # every fourth row of horizontal lines, and every third diagonal
+    assert kept_horizontal == [line for line in horizontal if round((line[0][1] - sc/4) / (sc/2)) % 4 == 0]
+    assert kept_diagonal == [line for line in diagonal if round((line[0][0] + line[0][1]) / sc) % 3 == 0]
+    assert 0 < len(kept_horizontal) < len(horizontal) and 0 < len(kept_diagonal) < len(diagonal)
+
+
+def test_thinning_to_a_maximum_length(capsys):
+
+    horizontal, diagonal = linedraw.hatch_cells(gradient())
+    full_length = linedraw.hatch_length(horizontal, diagonal)
+
+    kept = linedraw.thin_hatch(horizontal, diagonal, max_length=full_length / 3)
+
+    assert linedraw.hatch_length(*kept) <= full_length / 3
+    assert "thinned hatching" in capsys.readouterr().out
+
+
+def test_bands_are_thinned_as_the_whole_image_is():
+
+    image = gradient()
+    spacing = linedraw.thinned_spacing(*linedraw.hatch_cells(image), max_length=1000)
+    assert spacing > 8
+
+    whole = linedraw.thinned_hatch(*linedraw.hatch_cells(image), spacing=spacing)
+
+    bands = [], []
+    for top in range(0, image.size[1], 3):
+        band = image.crop((0, top, image.size[0], min(top + 3, image.size[1])))
+        for lines, kept in zip(bands, linedraw.thinned_hatch(*linedraw.hatch_cells(band, top=top), spacing=spacing)):
+            lines.extend(kept)
+
+    assert lines_as_set(bands[0]) == lines_as_set(whole[0])
+    assert lines_as_set(bands[1]) == lines_as_set(whole[1])
+
+
+def test_hatch_joins_up_the_lines(capsys):
+
+    image = gradient()
+    horizontal, diagonal = linedraw.hatch_cells(image)
+
+    lines = linedraw.hatch(image)
+
+    # fewer, longer lines, covering the same length
+    assert len(lines) < len(horizontal) + len(diagonal)
+    assert sum(linedraw.distsum(*line) for line in lines) == pytest.approx(linedraw.hatch_length(horizontal, diagonal))
+
+
+def rectangle(width=64, height=48, box=(16, 8, 48, 40), shade=0):
+
+    # a white image with a dark rectangle in it
+
+    image = Image.new("L", (width, height), 255)
+    image.paste(shade, box)
+
+    return image
+
+
+def test_scanlines_cover_the_dark_runs(capsys):
+
+    lines = linedraw.scanline_hatch(rectangle(), spacing=4, layers=[(144, 0)])
+
+    # horizontal strokes, across the rectangle and only across it, 4 pixels apart
+    assert 7 <= len(lines) <= 9
+
+    for (x0, y0), (x1, y1) in lines:
+        assert y0 == pytest.approx(y1)
+        assert 8 <= y0 < 40
+        assert 16 <= min(x0, x1) < 17 and 47 <= max(x0, x1) < 48
+
+
+def test_scanlines_at_an_angle(capsys):
+
+    lines = linedraw.scanline_hatch(rectangle(), spacing=4, layers=[(144, 90)])
+
+    for (x0, y0), (x1, y1) in lines:
+        assert x0 == pytest.approx(x1)
+        assert 16 <= x0 < 48
+
+
+def test_scanline_layers_follow_the_thresholds(capsys):
+
+    layers = [(144, 0), (64, 45), (16, -45)]
+
+    # a mid-grey rectangle is only hatched by the first layer; a black one by all three
+    grey = linedraw.scanline_hatch(rectangle(shade=100), spacing=4, layers=layers)
+    black = linedraw.scanline_hatch(rectangle(shade=0), spacing=4, layers=layers)
+
+    assert len(grey) == len(linedraw.scanline_hatch(rectangle(), spacing=4, layers=layers[:1]))
+    assert len(black) > 2 * len(grey)
+
+    assert linedraw.scanline_hatch(rectangle(shade=255), spacing=4, layers=layers) == []
+
+
+def test_scanlines_to_a_maximum_length(capsys):
+
+    image = rectangle()
+
+    full_length = sum(linedraw.distsum(*line) for line in linedraw.scanline_hatch(image, spacing=2))
+    lines = linedraw.scanline_hatch(image, spacing=2, max_length=full_length / 3)
+
+    assert sum(linedraw.distsum(*line) for line in lines) <= full_length / 3
+
+
+def test_scanlines_make_fewer_strokes_than_cells(capsys):
+
+    image = gradient(48, 40)
+
+    assert len(linedraw.scanline_hatch(image, spacing=4)) < len(linedraw.hatch(image, sc=8))
@@ -0,0 +1,70 @@
+import numpy
+import pytest
+
+from brachiograph import BrachioGraph
+
+
+# each servo needs 5µS more than the midway pulse-width to arrive at an angle with it increasing, and 5µS less with it
+# decreasing
+def bidi_samples(angles, centre):
+    return [(angle, centre + angle * 10 + 5, centre + angle * 10 - 5) for angle in angles]
+
+
+def plotter():
+    return BrachioGraph(
+        8, 8,
+        servo_1_angle_pws_bidi=bidi_samples(range(-180, 1, 30), 2400),
+        servo_2_angle_pws_bidi=bidi_samples(range(0, 181, 30), 600),
+    )
+
+
+def test_hysteresis_is_half_the_difference_between_the_directions():
+
+    bg = plotter()
+
+    angles = numpy.linspace(-180, 0, 19)
+
+    assert numpy.allclose(bg.hysteresis_1(angles), 5)
+    assert numpy.allclose(bg.hysteresis_2(angles + 180), 5)
+
+    # the calibration curves lie midway between the two directions'
+    assert numpy.allclose(bg.angles_to_pw_1(angles), 2400 + angles * 10)
+
+
+def test_no_hysteresis_without_bidirectional_samples():
+
+    bg = BrachioGraph(8, 8, servo_1_angle_pws=[(angle, 2400 + angle * 10) for angle in range(-180, 1, 30)])
+
+    assert bg.hysteresis_1 is None and bg.hysteresis_2 is None
+
+
+def test_compensation_follows_the_direction_of_turning():
+
+    bg = plotter()
+    bg.angle_1, bg.direction_1 = -90, 0
+
+    angles = [-80, -70, -70, -75, -75]
+    pw_1, pw_2 = bg.compensate_hysteresis(angles, [90] * 5, bg.angles_to_pw_1(angles), [1500] * 5)
+
+    # increasing, increasing, still where it got to by increasing, decreasing, still where it got to by decreasing
+    assert numpy.allclose(pw_1 - bg.angles_to_pw_1(angles), [5, 5, 5, -5, -5])
+
+    assert bg.angle_1 == -75 and bg.direction_1 == -1
+
+
+@pytest.mark.parametrize("compensated", [True, False])
+def test_moving_to_where_the_pen_is_sends_nothing(compensated, fake_pigpio):
+
+    bg = plotter() if compensated else BrachioGraph(8, 8)
+
+    bg.xy(0, 10, wait=0)
+    (pi,) = fake_pigpio
+    sent = len(pi.sent)
+
+    # the pulse-widths that were sent are compensated for hysteresis, if it's known
+    angle_1, angle_2 = bg.xy_to_angles(0, 10)
+    assert compensated != (bg.get_pulse_widths() == pytest.approx(bg.angles_to_pulse_widths(angle_1, angle_2), abs=1))
+
+    bg.xy(0, 10, wait=0)
+
+    assert len(pi.sent) == sent
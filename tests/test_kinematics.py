@@ -0,0 +1,136 @@
+import numpy
+import pytest
+
+from brachiograph import BrachioGraph
+from pantograph import PantoGraph
+
+
+def brachiograph():
+    return BrachioGraph(8, 8)
+
+
+def pantograph():
+    return PantoGraph()
+
+
+plotters = pytest.mark.parametrize("make_plotter", [brachiograph, pantograph], ids=["brachiograph", "pantograph"])
+
+# for each plotter, a drawing area in front of it; the PantoGraph's bottom corners need its driver arms turned
+# further than 90˚
+drawing_bounds = {"BrachioGraph": (-8, 4, 6, 13), "PantoGraph": (-3.75, 8, 3.75, 13)}
+
+
+def reachable_positions(plotter):
+
+    # a grid over the plotter's drawing area, corners included, less any positions its arms can't reach
+
+    left, bottom, right, top = drawing_bounds[type(plotter).__name__]
+
+    x, y = numpy.meshgrid(numpy.linspace(left, right, 9), numpy.linspace(bottom, top, 8))
+    x, y = x.ravel(), y.ravel()
+
+    angle_1, angle_2 = plotter.batch_xy_to_angles(x, y)
+    reachable = numpy.isfinite(angle_1) & numpy.isfinite(angle_2)
+
+    assert reachable.sum() > 20
+
+    return x[reachable], y[reachable]
+
+
+@plotters
+def test_batch_xy_to_angles_matches_scalar(make_plotter):
+
+    plotter = make_plotter()
+    x, y = reachable_positions(plotter)
+
+    batch = numpy.column_stack(plotter.batch_xy_to_angles(x, y))
+    scalar = numpy.array([plotter.xy_to_angles(x_, y_) for x_, y_ in zip(x, y)])
+
+    assert numpy.allclose(batch, scalar)
+
+
+@plotters
+def test_batch_angles_to_xy_matches_scalar(make_plotter):
+
+    plotter = make_plotter()
+    angle_1, angle_2 = plotter.batch_xy_to_angles(*reachable_positions(plotter))
+
+    batch = numpy.column_stack(plotter.batch_angles_to_xy(angle_1, angle_2))
+    scalar = numpy.array([plotter.angles_to_xy(a_1, a_2) for a_1, a_2 in zip(angle_1, angle_2)])
+
+    assert numpy.allclose(batch, scalar)
+
+
+@plotters
+def test_angles_round_trip(make_plotter):
+
+    plotter = make_plotter()
+    x, y = reachable_positions(plotter)
+
+    assert numpy.allclose(plotter.batch_angles_to_xy(*plotter.batch_xy_to_angles(x, y)), (x, y))
+
+
+def test_pantograph_round_trip_with_arms_past_90_degrees():
+
+    plotter = pantograph()
+
+    # the whole drawing area can be reached
+    left, bottom, right, top = drawing_bounds["PantoGraph"]
+    x, y = numpy.meshgrid(numpy.linspace(left, right, 9), numpy.linspace(bottom, top, 8))
+    assert numpy.isfinite(plotter.batch_xy_to_angles(x, y)).all()
+
+    for corner in ((left, bottom), (right, bottom)):
+
+        angle_1, angle_2 = plotter.xy_to_angles(*corner)
+        assert max(abs(angle_1), abs(angle_2)) > 90
+
+        assert numpy.allclose(plotter.angles_to_xy(angle_1, angle_2), corner)
+        assert numpy.allclose(plotter.batch_angles_to_xy(angle_1, angle_2), corner)
+
+
+def test_brachiograph_unreachable_positions_are_nan():
+
+    angle_1, angle_2 = brachiograph().batch_xy_to_angles([0, 0], [8, 20])
+
+    assert numpy.isfinite([angle_1[0], angle_2[0]]).all()
+    assert numpy.isnan([angle_1[1], angle_2[1]]).all()
+
+
+@plotters
+def test_jacobian_matches_finite_differences(make_plotter):
+
+    plotter = make_plotter()
+    x, y = reachable_positions(plotter)
+    step = 1e-6
+
+    jacobian = plotter.batch_jacobian(x, y)
+
+    dx = (numpy.column_stack(plotter.batch_xy_to_angles(x + step, y)) -
+          numpy.column_stack(plotter.batch_xy_to_angles(x - step, y))) / (2 * step)
+    dy = (numpy.column_stack(plotter.batch_xy_to_angles(x, y + step)) -
+          numpy.column_stack(plotter.batch_xy_to_angles(x, y - step))) / (2 * step)
+
+    assert jacobian.shape == (len(x), 2, 2)
+    assert numpy.allclose(jacobian, numpy.stack((dx, dy), axis=-1), rtol=1e-4, atol=1e-4)
+
+
+def test_profiled_and_blended_moves_work_out_angles_in_batches(fake_pigpio, monkeypatch):
+
+    plotter = BrachioGraph(8, 8, bounds=(-6, 4, 6, 12), max_angular_velocity=300, max_angular_acceleration=3000)
+    lines = [[(-2, 6), (0, 6), (0, 8), (2, 10)], [(1, 5), (3, 5)]]
+
+    # the scalar method is still used once for each move, for the position it's going to - but not for each step,
+    # nor for each point when blending
+    scalar = plotter.xy_to_angles
+    calls = []
+
+    def counted(x, y):
+        calls.append((x, y))
+        return scalar(x, y)
+
+    monkeypatch.setattr(plotter, "xy_to_angles", counted)
+
+    plotter.plot_lines(lines, wait=0, blend=True, progress_callback=False)
+
+    # one move to each point, and one to park
+    assert len(calls) == sum(len(line) for line in lines) + 1
@@ -0,0 +1,83 @@
+import warnings
+
+import numpy
+
+import motion
+
+
+def straight_move(steps, turn=10):
+
+    # the angles of a movement in which both servos turn steadily, by turn degrees each in all
+
+    return numpy.column_stack((numpy.linspace(0, turn, steps + 1), numpy.linspace(0, -turn, steps + 1)))
+
+
+def test_trapezoidal_profile_starts_and_ends_at_rest():
+
+    durations, speeds = motion.trapezoidal_profile(straight_move(20), 1, max_velocity=100, max_acceleration=400)
+
+    assert len(durations) == 20 and len(speeds) == 21
+    assert speeds[0] == speeds[-1] == 0
+    assert (durations > 0).all()
+
+
+def test_trapezoidal_profile_respects_the_limits():
+
+    max_velocity, max_acceleration = 100, 400
+    angles = straight_move(200, turn=40)
+
+    durations, speeds = motion.trapezoidal_profile(angles, 2, max_velocity, max_acceleration)
+
+    # 20 degrees per unit of travel, so the pen may go no faster than 5 units per second
+    assert speeds.max() <= max_velocity / 20 + 1e-9
+
+    # and, from v² = u² + 2as, accelerate no faster than 20 units per second²
+    step_length = 2 / 200
+    assert (numpy.abs(numpy.diff(speeds ** 2)) <= 2 * max_acceleration / 20 * step_length + 1e-9).all()
+
+    # and a move this long reaches that speed
+    assert numpy.isclose(speeds.max(), 5)
+
+
+def test_trapezoidal_profile_entry_and_exit_speeds():
+
+    durations, speeds = motion.trapezoidal_profile(
+        straight_move(50), 1, max_velocity=100, max_acceleration=400, entry_speed=3, exit_speed=2, max_speed=4
+    )
+
+    assert speeds[0] == 3 and speeds[-1] == 2
+    assert speeds.max() <= 4
+
+
+def test_plan_line_straight_and_cornered():
+
+    points = numpy.array([[0, 0], [1, 0], [2, 0], [2, 1]])
+    angles = points * 10
+
+    speeds = motion.plan_line(points, angles, max_velocity=100, max_acceleration=400, max_speed=20)
+
+    assert speeds[0] == speeds[-1] == 0
+
+    # the pen keeps moving where the line runs straight, and slows down for the right-angled corner
+    assert speeds[1] > speeds[2] > 0
+
+
+def test_plan_line_with_repeated_points():
+
+    points = numpy.array([[0, 0], [1, 0], [1, 0], [2, 0], [2, 1]])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        speeds = motion.plan_line(points, points * 10, max_velocity=100, max_acceleration=400, max_speed=20)
+
+    expected = motion.plan_line(
+        points[[0, 1, 3, 4]], points[[0, 1, 3, 4]] * 10, max_velocity=100, max_acceleration=400, max_speed=20
+    )
+
+    # a repeated point is passed at the speed of the point it repeats
+    assert numpy.allclose(speeds, expected[[0, 1, 1, 2, 3]])
+
+
+def test_plan_line_short_lines():
+
+    assert (motion.plan_line([[0, 0], [1, 1]], [[0, 0], [10, 10]], 100, 400) == 0).all()
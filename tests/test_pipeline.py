@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+import linedraw
+import pipeline
+
+
+def fake_vectorise(pieces, error=None, produced=None):
+
+    # a stand-in for linedraw.stream_vectorise(), yielding the pieces and then raising the error, if there is one
+
+    def stream_vectorise(image_filename, **options):
+        for piece in pieces:
+            if produced is not None:
+                produced.append(piece)
+            yield piece
+        if error:
+            raise error
+
+    return stream_vectorise
+
+
+def test_pieces_arrive_in_order(monkeypatch):
+
+    pieces = [[[(0, i), (1, i)]] for i in range(10)]
+    monkeypatch.setattr(linedraw, "stream_vectorise", fake_vectorise(pieces))
+
+    assert list(pipeline.stream_pieces("image.jpg", queue_size=2)) == pieces
+
+
+def test_errors_are_raised_where_the_pieces_are_taken(monkeypatch):
+
+    monkeypatch.setattr(linedraw, "stream_vectorise", fake_vectorise([[[(0, 0), (1, 1)]]], OSError("no image")))
+
+    stream = pipeline.stream_pieces("image.jpg")
+
+    assert next(stream) == [[(0, 0), (1, 1)]]
+
+    with pytest.raises(OSError, match="no image"):
+        next(stream)
+
+
+def test_vectorising_stops_when_the_pieces_stop_being_taken(monkeypatch):
+
+    produced = []
+    monkeypatch.setattr(linedraw, "stream_vectorise", fake_vectorise(range(1000), produced=produced))
+
+    before = set(threading.enumerate())
+
+    stream = pipeline.stream_pieces("image.jpg", queue_size=2)
+    assert next(stream) == 0
+
+    (thread,) = set(threading.enumerate()) - before
+
+    # the plotting stops - as if cancelled - and the vectoriser, waiting for room in the queue, gives up
+    stream.close()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert len(produced) < 10
+
+
+def test_plot_image(monkeypatch, fake_pigpio):
+
+    from brachiograph import BrachioGraph
+
+    # the contours, then the hatching in two bands, in image co-ordinates
+    pieces = [[[(0, 0), (100, 0), (100, 50)]], [[(0, 10), (100, 10)]], [[(0, 40), (100, 40)]]]
+    monkeypatch.setattr(linedraw, "stream_vectorise", fake_vectorise(pieces))
+    monkeypatch.setattr(linedraw, "drawing_extent", lambda image_filename, resolution: (0, 0, 100, 50))
+
+    bg = BrachioGraph(8, 8, bounds=(-6, 4, 6, 12))
+    reports = []
+
+    pipeline.plot_image(bg, "image.jpg", wait=0, progress_callback=lambda job: reports.append(job.points))
+
+    # every point is drawn, and the job finishes with the arms parked
+    assert reports[-1] == 7
+    assert (bg.current_x, bg.current_y) == (-8, 8)
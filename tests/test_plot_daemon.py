@@ -0,0 +1,137 @@
+import json
+import os
+
+import pytest
+
+import plot_daemon
+import strokes
+from brachiograph import BrachioGraph
+
+
+square = [[(0, 0), (100, 0), (100, 100), (0, 100), (0, 0)], [(20, 20), (80, 80)]]
+
+
+@pytest.fixture
+def queue(tmp_path, fake_pigpio):
+    return plot_daemon.JobQueue(BrachioGraph(8, 8, bounds=(-6, 4, 6, 12)), folder=str(tmp_path / "queue"), wait=0)
+
+
+def wait_for(queue, predicate):
+
+    # waits for the queue's threads to get the jobs into the expected states
+
+    with queue.condition:
+        assert queue.condition.wait_for(predicate, timeout=10)
+
+
+def test_submit(queue):
+
+    first = queue.submit(json.dumps(square).encode(), name="square")
+    second = queue.submit(strokes.Strokes.from_lines(square).to_bytes(), binary=True, simplify=.1)
+
+    assert (first["id"], second["id"]) == (1, 2)
+    assert (first["format"], second["format"]) == ("json", "strokes")
+    assert [job["id"] for job in queue.queued()] == [1, 2]
+
+    with open(os.path.join(queue.folder, "1.json")) as job_file:
+        assert json.load(job_file)["name"] == "square"
+
+
+def test_prepare_both_formats(queue):
+
+    from_json = queue.prepare(queue.submit(json.dumps(square).encode()))
+    from_strokes = queue.prepare(queue.submit(strokes.Strokes.from_lines(square).to_bytes(), binary=True))
+
+    assert from_json.tolist() == from_strokes.tolist()
+
+    # fitted to the plotter's bounds
+    left, bottom, right, top = from_json.bounds
+    assert left >= -6 and bottom >= 4 and right <= 6 and top <= 12
+
+
+def test_jobs_are_plotted_in_order(queue):
+
+    for name in ("first", "second"):
+        queue.submit(json.dumps(square).encode(), name=name)
+
+    queue.start()
+    wait_for(queue, lambda: all(job["state"] == "done" for job in queue.jobs.values()))
+
+    first, second = queue.jobs[1], queue.jobs[2]
+
+    assert first["finished"] <= second["started"]
+    assert first["points"] == sum(len(line) for line in square)
+    assert queue.status() == {"current": None, "queued": 0, "eta": 0}
+
+    # and what's known about them is saved
+    with open(os.path.join(queue.folder, "2.json")) as job_file:
+        assert json.load(job_file)["state"] == "done"
+
+
+def test_a_job_that_cannot_be_prepared_fails(queue):
+
+    queue.submit(b"not a line file")
+
+    queue.start()
+    wait_for(queue, lambda: queue.jobs[1]["state"] == "failed")
+
+    assert queue.jobs[1]["error"].startswith("Couldn't prepare the job")
+
+
+def test_a_job_that_cannot_be_plotted_fails(queue, monkeypatch):
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("the pen fell off")
+
+    monkeypatch.setattr(queue.plotter, "plot_strokes", fail)
+
+    queue.submit(json.dumps(square).encode())
+
+    queue.start()
+    wait_for(queue, lambda: queue.jobs[1]["state"] == "failed")
+
+    assert queue.jobs[1]["error"] == "Plotting failed: the pen fell off"
+    assert queue.current is None
+
+
+def test_cancel_queued_job(queue):
+
+    job = queue.submit(json.dumps(square).encode())
+
+    assert queue.cancel(job["id"])["state"] == "cancelled"
+    assert queue.cancel(99) is None
+    assert not queue.queued()
+
+
+def test_cancel_current_job_before_it_starts(queue, monkeypatch):
+
+    # the job is cancelled as soon as it's current, before its first progress report
+    plot_strokes = queue.plotter.plot_strokes
+
+    def cancel_then_plot(*args, **kwargs):
+        queue.cancel(queue.current["id"])
+        return plot_strokes(*args, **kwargs)
+
+    monkeypatch.setattr(queue.plotter, "plot_strokes", cancel_then_plot)
+
+    queue.submit(json.dumps(square).encode())
+
+    queue.start()
+    wait_for(queue, lambda: queue.jobs[1]["state"] not in ("queued", "plotting"))
+
+    assert queue.jobs[1]["state"] == "cancelled"
+    assert queue.current is None
+
+
+def test_restart(queue):
+
+    waiting = queue.submit(json.dumps(square).encode())
+    drawing = queue.submit(json.dumps(square).encode())
+
+    drawing["state"] = "plotting"
+    queue.save(drawing)
+
+    restarted = plot_daemon.JobQueue(queue.plotter, folder=queue.folder)
+
+    assert restarted.jobs[waiting["id"]]["state"] == "queued"
+    assert restarted.jobs[drawing["id"]]["state"] == "interrupted"
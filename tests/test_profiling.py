@@ -0,0 +1,110 @@
+import json
+
+import profiling
+
+
+def test_disabled_profiler_records_nothing():
+
+    profiler = profiling.Profiler()
+
+    with profiler.job("job"):
+        with profiler.timer("geometry"):
+            profiler.count("steps")
+        profiler.sleep(0)
+
+    assert profiler.timer("geometry") is profiling.null_timer
+    assert profiler.report() == {"job": None, "timers": {}, "counters": {}}
+
+
+def test_timers_and_counters():
+
+    profiler = profiling.Profiler(enabled=True)
+
+    @profiler.timed("pulse_widths")
+    def work(value):
+        return value * 2
+
+    with profiler.job("first"):
+        for step in range(3):
+            with profiler.timer("geometry"):
+                profiler.count("steps")
+            assert work(step) == step * 2
+        profiler.count("daemon_calls", 6)
+        profiler.sleep(0, "pen")
+
+    report = profiler.report()
+
+    assert report["job"] == "first"
+    assert {name: timer["calls"] for name, timer in report["timers"].items()} == {
+        "geometry": 3, "pulse_widths": 3, "pen": 1, "job": 1
+    }
+    assert report["counters"] == {"steps": 3, "daemon_calls": 6}
+
+    # the time not spent in any other timer
+    timed = sum(timer["seconds"] for name, timer in report["timers"].items() if name != "job")
+    assert abs(report["unaccounted_seconds"] - (report["timers"]["job"]["seconds"] - timed)) < 1e-9
+
+    assert json.loads(profiler.to_json()) == report
+
+
+def test_each_job_starts_afresh():
+
+    profiler = profiling.Profiler(enabled=True)
+
+    with profiler.job("first"):
+        profiler.count("steps", 10)
+
+    with profiler.job("second"):
+        profiler.count("steps")
+
+    assert profiler.report()["job"] == "second"
+    assert profiler.report()["counters"] == {"steps": 1}
+
+
+def test_to_json_saves_the_report(tmp_path):
+
+    profiler = profiling.Profiler(enabled=True)
+    profiler.count("steps")
+
+    filename = str(tmp_path / "report.json")
+    profiler.to_json(filename)
+
+    with open(filename) as report_file:
+        assert json.load(report_file)["counters"] == {"steps": 1}
+
+
+def test_to_prometheus():
+
+    profiler = profiling.Profiler(enabled=True)
+
+    with profiler.job('a "quoted" \\ name\non two lines'):
+        profiler.count("steps", 5)
+
+    lines = profiler.to_prometheus(prefix="bg").splitlines()
+
+    assert "# TYPE bg_timer_seconds_total counter" in lines
+    assert 'bg_timer_calls_total{job="a \\"quoted\\" \\\\ name\\non two lines",timer="job"} 1' in lines
+    assert 'bg_events_total{job="a \\"quoted\\" \\\\ name\\non two lines",counter="steps"} 5' in lines
+
+
+def test_to_prometheus_without_a_job():
+
+    profiler = profiling.Profiler(enabled=True)
+    profiler.count("steps")
+
+    assert 'plotter_events_total{counter="steps"} 1' in profiler.to_prometheus().splitlines()
+
+
+def test_plotting_is_profiled(fake_pigpio):
+
+    from brachiograph import BrachioGraph
+
+    bg = BrachioGraph(8, 8, bounds=(-6, 4, 6, 12), profile=True)
+    bg.plot_lines([[(0, 0), (1, 0), (1, 1)]], wait=0, progress_callback=False)
+
+    report = bg.profiler.report()
+
+    assert report["job"] == "plot_lines"
+    assert report["counters"]["steps"] > 0
+    assert report["counters"]["daemon_calls"] >= 2 * report["counters"]["steps"]
+    assert {"geometry", "pulse_widths", "pigpio", "job"} <= set(report["timers"])
@@ -0,0 +1,118 @@
+import pytest
+
+import progress
+
+
+class Clock:
+
+    # stands in for time.monotonic(), moving on only when told to
+
+    def __init__(self):
+        self.now = 100.
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+
+    clock = Clock()
+    monkeypatch.setattr(progress.time, "monotonic", clock)
+
+    return clock
+
+
+def test_reports_are_limited_by_the_interval(clock):
+
+    reports = []
+    job = progress.Progress(100, 50, callback=lambda job: reports.append(job.points), interval=.5)
+
+    # one report at the start
+    assert reports == [0]
+
+    for point in range(10):
+        clock.now += .25
+        job.advance(1, .5)
+
+    # then one each half-second
+    assert reports == [0, 2, 4, 6, 8, 10]
+
+    job.finish()
+
+    assert reports[-1] == 10 and job.finished
+
+
+def test_fraction_and_eta(clock):
+
+    job = progress.Progress(100, 50)
+
+    assert job.fraction == 0 and job.eta is None
+
+    clock.now += 10
+    job.advance(10, 12.5)
+
+    # the distance is the better measure of how much is done
+    assert job.fraction == .25
+    assert job.eta == pytest.approx(30)
+    assert job.elapsed == pytest.approx(10)
+
+    job.finish()
+    clock.now += 10
+
+    assert job.eta == 0 and job.elapsed == pytest.approx(10)
+
+
+def test_fraction_by_points_without_a_distance():
+
+    job = progress.Progress(8)
+    job.advance(2)
+
+    assert job.fraction == .25
+
+    assert progress.Progress(0).fraction == 1
+
+
+def test_str(clock):
+
+    job = progress.Progress(4, 2)
+
+    assert str(job) == "0/4 points, 0.0/2.0 distance, 0% done, ETA unknown"
+
+    clock.now += 5
+    job.advance(2, 1)
+    assert str(job) == "2/4 points, 1.0/2.0 distance, 50% done, ETA 5s"
+
+    job.cancel()
+    job.finish()
+    assert str(job) == "2/4 points, 1.0/2.0 distance, 50% done, cancelled after 5s"
+
+
+def test_log_reporter():
+
+    lines = []
+    job = progress.Progress(4, callback=progress.LogReporter(lines.append))
+
+    job.finish()
+
+    assert lines[0].endswith("ETA unknown") and lines[1].endswith("finished in 0s")
+
+
+def test_cancelling_a_plot_stops_it(fake_pigpio):
+
+    from brachiograph import BrachioGraph
+
+    bg = BrachioGraph(8, 8, bounds=(-6, 4, 6, 12))
+    reports = []
+
+    # the first report comes before anything is drawn
+    def cancel(job):
+        reports.append((job.points, job.finished))
+        job.cancel()
+
+    bg.plot_lines([[(0, 0), (1, 0)], [(0, 1), (1, 1)]], wait=0, progress_callback=cancel)
+
+    assert reports == [(0, False), (0, True)]
+
+    # and the arms are parked afterwards
+    assert (bg.current_x, bg.current_y) == (-8, 8)
@@ -0,0 +1,82 @@
+import os
+
+import numpy
+import pytest
+
+import brachiograph
+import calibration
+from brachiograph import BrachioGraph
+
+
+bounds = (-6, 4, 6, 12)
+
+# a servo that turns a little further than its nominal 10µS per degree
+measurements = [(angle, 1500 + angle * 10.5 + angle ** 2 / 100) for angle in range(-90, 91, 15)]
+
+
+@pytest.fixture(autouse=True)
+def grid_folder(tmp_path, monkeypatch):
+
+    # keep the grids the tests make out of the repository's own grid folder
+    monkeypatch.setattr(brachiograph, "grid_folder", str(tmp_path))
+
+    return tmp_path
+
+
+def plotter(**kwargs):
+    return BrachioGraph(8, 8, bounds=bounds, pulse_width_grid=0.1, **kwargs)
+
+
+def test_grid_matches_exact_pulse_widths():
+
+    grid = plotter().pulse_width_grid
+
+    x, y = numpy.meshgrid(numpy.linspace(bounds[0], bounds[2], 37), numpy.linspace(bounds[1], bounds[3], 23))
+
+    interpolated = numpy.array(grid.batch_pulse_widths(x, y))
+    exact = numpy.array(grid.exact_pulse_widths(x, y))
+
+    assert numpy.abs(interpolated - exact).max() <= grid.max_error < 1
+
+
+def test_positions_off_the_grid_are_nan():
+
+    pw_1, pw_2 = plotter().pulse_width_grid.batch_pulse_widths([0, 0, 20], [8, -5, 8])
+
+    assert numpy.isfinite([pw_1[0], pw_2[0]]).all()
+    assert numpy.isnan([pw_1[1:], pw_2[1:]]).all()
+
+
+def test_grid_is_saved_and_reused(grid_folder, monkeypatch):
+
+    grid = plotter().pulse_width_grid
+
+    assert os.path.dirname(grid.filename) == str(grid_folder)
+    assert os.listdir(grid_folder) == [os.path.basename(grid.filename)]
+
+    # a plotter with the same configuration loads the grid instead of computing it again
+    monkeypatch.setattr(brachiograph.PulseWidthGrid, "compute", lambda self: pytest.fail("the grid was recomputed"))
+
+    reused = plotter().pulse_width_grid
+
+    assert reused.filename == grid.filename
+    assert numpy.array_equal(reused.pw_1, grid.pw_1) and reused.max_error == grid.max_error
+
+
+def test_grid_depends_on_the_fitted_curves():
+
+    naive = plotter().pulse_width_grid
+    fitted = plotter(servo_1_fit=calibration.fit_servo(measurements)).pulse_width_grid
+    refitted = plotter(servo_1_fit=calibration.fit_servo(measurements, degree=2)).pulse_width_grid
+
+    assert len({naive.filename, fitted.filename, refitted.filename}) == 3
+    assert not numpy.allclose(naive.pw_1, fitted.pw_1)
+
+
+def test_grid_folder_does_not_depend_on_the_working_directory(monkeypatch):
+
+    # without the grid_folder fixture's replacement, it's the folder beside brachiograph.py
+    monkeypatch.undo()
+
+    assert os.path.isabs(brachiograph.grid_folder)
+    assert os.path.dirname(brachiograph.grid_folder) == os.path.dirname(os.path.abspath(brachiograph.__file__))
@@ -0,0 +1,82 @@
+import numpy
+
+import linedraw
+import strokes
+
+
+def short_lines(count=200, seed=1):
+
+    # short lines scattered over a 100 x 100 page
+
+    random = numpy.random.default_rng(seed)
+    starts = random.uniform(0, 100, (count, 2))
+
+    return [[tuple(start), tuple(start + random.uniform(-2, 2, 2))] for start in starts]
+
+
+def test_hilbert_index_visits_every_cell_through_neighbours():
+
+    for order in (1, 2, 3):
+        n = 2 ** order
+        x, y = numpy.meshgrid(numpy.arange(n), numpy.arange(n))
+
+        index = linedraw.hilbert_index(x.ravel(), y.ravel(), order)
+
+        # each cell has its own place along the curve, and each is next to the one before it
+        assert sorted(index) == list(range(n * n))
+
+        path = numpy.column_stack((x.ravel(), y.ravel()))[numpy.argsort(index)]
+        assert (numpy.abs(numpy.diff(path, axis=0)).sum(axis=1) == 1).all()
+
+
+def test_hilbert_index_of_single_cells():
+
+    assert linedraw.hilbert_index(0, 0, 2) == 0
+    assert linedraw.hilbert_index([0, 0, 1, 1], [0, 1, 1, 0], 1).tolist() == [0, 1, 2, 3]
+
+
+def test_tile_sortlines_keeps_every_line(capsys):
+
+    lines = short_lines()
+
+    result = linedraw.tile_sortlines(lines, tiles=4)
+
+    assert isinstance(result, strokes.Strokes) and len(result) == len(lines)
+
+    # every line is there, whichever way round it's drawn
+    def as_set(lines):
+        return {frozenset(map(tuple, numpy.round(line, 9).tolist())) for line in lines}
+
+    assert as_set(result) == as_set(lines)
+
+
+def test_tile_sortlines_finishes_each_tile_first(capsys):
+
+    result = linedraw.tile_sortlines(short_lines(), extent=(0, 0, 100, 100), tiles=4)
+
+    tiles = numpy.clip(((result.starts + result.ends) / 2 // 25).astype(int), 0, 3)
+    order = linedraw.hilbert_index(tiles[:, 0], tiles[:, 1], 2)
+
+    # the tiles come in the curve's order, each of them once
+    assert (numpy.diff(order) >= 0).all()
+
+
+def test_tile_sortlines_travels_less_than_leaving_the_lines_unsorted(capsys):
+
+    lines = short_lines()
+
+    assert linedraw.tile_sortlines(lines, tiles=4).travel() < strokes.Strokes.from_lines(lines).travel() / 4
+
+
+def test_tile_sortlines_starts_near_the_start(capsys):
+
+    lines = short_lines()
+
+    result = linedraw.tile_sortlines(lines, tiles=4, start=(0, 0))
+
+    assert numpy.hypot(*result.starts[0]) < 15
+
+
+def test_tile_sortlines_with_nothing(capsys):
+
+    assert len(linedraw.tile_sortlines([])) == 0
@@ -0,0 +1,77 @@
+import warnings
+
+import numpy
+import pytest
+
+import simulation
+from brachiograph import BrachioGraph
+from pantograph import PantoGraph
+
+
+def brachiograph():
+    return BrachioGraph(8, 8, bounds=(-6, 4, 6, 12))
+
+
+def pantograph():
+    return PantoGraph(box_bounds=(-3.75, 8, 3.75, 13))
+
+
+plotters = pytest.mark.parametrize("make_plotter", [brachiograph, pantograph], ids=["brachiograph", "pantograph"])
+
+square = [[(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)], [(0.2, 0.2), (0.8, 0.8)]]
+
+
+@plotters
+def test_plot_nothing(make_plotter, fake_pigpio):
+
+    plotter = make_plotter()
+
+    plotter.plot_lines([], progress_callback=False)
+
+
+@plotters
+def test_simulate_nothing(make_plotter):
+
+    report = make_plotter().simulate([])
+
+    assert report["points"] == 0 and report["max_error"] == 0
+
+
+@plotters
+def test_simulate(make_plotter):
+
+    report = make_plotter().simulate(square)
+
+    assert report["points"] > 10
+    assert report["unreachable_points"] == 0
+
+    # the plotters' calibrations invert exactly, so only rounding the pulse-widths moves the pen from its path
+    assert 0 <= report["mean_error"] <= report["rms_error"] <= report["max_error"] < 0.05
+
+
+def test_simulate_follows_the_lines():
+
+    plotter = brachiograph()
+    lines = plotter.fit_lines(square, plotter.bounds)
+
+    ideal, predicted, report = simulation.simulate(
+        lines, plotter.batch_pulse_widths, plotter.batch_pulse_widths_to_xy, interpolate=10
+    )
+
+    assert len(ideal) == len(predicted) == 2
+    assert numpy.allclose(ideal[0][0], lines[0][0]) and numpy.allclose(ideal[0][-1], lines[0][-1])
+    assert numpy.allclose(numpy.concatenate(ideal), numpy.concatenate(predicted), atol=0.05)
+
+
+def test_simulate_unreachable_lines():
+
+    plotter = brachiograph()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        ideal, predicted, report = simulation.simulate(
+            [[(0, 20), (1, 20)]], plotter.batch_pulse_widths, plotter.batch_pulse_widths_to_xy
+        )
+
+    assert report["unreachable_points"] == report["points"] > 0
+    assert numpy.isnan(report["max_error"])
@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the modules that are slow to import, particularly on a Pi Zero
+heavy_modules = ["numpy", "cv2", "PIL", "pigpio", "readchar", "tqdm"]
+
+
+@pytest.mark.parametrize("statement", [
+    "import brachiograph; brachiograph.BrachioGraph(inner_arm=8, outer_arm=8)",
+    "import pantograph; pantograph.PantoGraph()",
+    "import linedraw",
+    "import plot_daemon",
+])
+def test_no_heavy_imports_at_startup(statement):
+
+    # run in a fresh process, so that nothing is already imported
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys; {}; print(*sorted(sys.modules))".format(statement)],
+        cwd=repository, capture_output=True, text=True, check=True
+    )
+
+    assert not set(heavy_modules) & set(result.stdout.split())
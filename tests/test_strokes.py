@@ -0,0 +1,92 @@
+import numpy
+
+import strokes
+
+
+def test_simplify_line_removes_points_within_tolerance():
+
+    line = [(0, 0), (1, 0.01), (2, -0.01), (3, 0), (3, 3)]
+
+    assert strokes.simplify_line(line, .05).tolist() == [[0, 0], [3, 0], [3, 3]]
+    assert len(strokes.simplify_line(line, .001)) == len(line)
+
+
+def test_simplify_line_keeps_short_lines_and_ends():
+
+    assert strokes.simplify_line([(0, 0), (1, 1)], 10).tolist() == [[0, 0], [1, 1]]
+
+    # a closed loop, whose ends meet
+    loop = [(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)]
+    assert strokes.simplify_line(loop, .1).tolist() == [[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]
+
+
+def test_simplify_lines(capsys):
+
+    lines = [[(0, 0), (1, 0.01), (2, 0)], [(5, 5)]]
+
+    simplified = strokes.simplify_lines(strokes.Strokes.from_lines(lines), .1)
+
+    assert isinstance(simplified, strokes.Strokes)
+    assert simplified.tolist() == [[[0, 0], [2, 0]], [[5, 5]]]
+    assert strokes.simplify_lines(lines, .1) == [[[0, 0], [2, 0]], [[5, 5]]]
+
+    # nothing is printed unless it's asked for
+    assert capsys.readouterr().out == ""
+
+    strokes.simplify_lines(lines, .1, report=True)
+    assert "4 points to 3" in capsys.readouterr().out
+
+
+def test_strokes_behave_like_a_list_of_lines():
+
+    lines = [[(0, 0), (3, 4)], [(5, 5)], [(1, 1), (1, 2), (2, 2)]]
+    container = strokes.Strokes.from_lines(lines)
+
+    assert len(container) == 3 and len(container.points) == 6
+    assert container.tolist() == [[list(point) for point in line] for line in lines]
+    assert container[-1].tolist() == [[1, 1], [1, 2], [2, 2]]
+    assert container[1:].tolist() == container.tolist()[1:]
+    assert container[::-1].tolist() == container.tolist()[::-1]
+    assert (container + [[(9, 9)]]).tolist()[-1] == [[9, 9]]
+    assert strokes.Strokes.from_lines(container) is container
+
+
+def test_strokes_measurements():
+
+    container = strokes.Strokes.from_lines([[(0, 0), (3, 4)], [(5, 5)], [(1, 1), (1, 2), (2, 2)]])
+
+    assert container.bounds == (0, 0, 5, 5)
+    assert container.lengths().tolist() == [5, 0, 2]
+    assert container.length == 7
+
+    # from (3, 4) to (5, 5), and from (5, 5) to (1, 1)
+    assert numpy.isclose(container.travel(), numpy.hypot(2, 1) + numpy.hypot(4, 4))
+    assert numpy.isclose(container.travel(start=(0, -1)), container.travel() + 1)
+
+
+def test_strokes_reorder():
+
+    container = strokes.Strokes.from_lines([[(0, 0), (1, 0)], [(2, 0)], [(3, 0), (4, 0), (5, 0)]])
+
+    reordered = container.reorder([2, 0], reverse=[True, False])
+
+    assert reordered.tolist() == [[[5, 0], [4, 0], [3, 0]], [[0, 0], [1, 0]]]
+    assert container.reversed(0).tolist() == [[1, 0], [0, 0]]
+
+
+def test_strokes_round_trip():
+
+    lines = strokes.Strokes.from_lines([[(0, 0), (1.5, 2)], [(3, 4)], [(-1, -2), (5, 6), (7, 8.25)]])
+
+    restored = strokes.Strokes.from_bytes(lines.to_bytes())
+
+    assert numpy.array_equal(restored.points, lines.points)
+    assert numpy.array_equal(restored.offsets, lines.offsets)
+    assert restored.tolist() == lines.tolist()
+
+
+def test_empty_strokes_round_trip():
+
+    restored = strokes.Strokes.from_bytes(strokes.Strokes.from_lines([]).to_bytes())
+
+    assert len(restored) == 0 and len(restored.points) == 0
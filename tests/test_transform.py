@@ -0,0 +1,71 @@
+import numpy
+
+import transform
+from pantograph import PantoGraph
+
+
+bounds = (0, 0, 10, 10)
+
+
+def test_clip_inside_is_unchanged():
+
+    lines = [[(1, 1), (5, 2), (9, 9)], [(3, 3)]]
+
+    assert transform.clip(lines, bounds).tolist() == [[[1, 1], [5, 2], [9, 9]], [[3, 3]]]
+
+
+def test_clip_cuts_where_a_line_leaves_and_reenters():
+
+    # out of the top, and back in again
+    clipped = transform.clip([[(2, 5), (5, 15), (8, 5)]], bounds)
+
+    assert len(clipped) == 2
+    assert numpy.allclose(clipped[0], [(2, 5), (3.5, 10)])
+    assert numpy.allclose(clipped[1], [(6.5, 10), (8, 5)])
+
+
+def test_clip_crossing_segment():
+
+    clipped = transform.clip([[(-5, 5), (15, 5)]], bounds)
+
+    assert numpy.allclose(clipped.points, [(0, 5), (10, 5)])
+
+
+def test_clip_drops_lines_outside():
+
+    clipped = transform.clip([[(11, 1), (20, 5)], [(-1, -1)], [(5, 5), (6, 6)]], bounds)
+
+    assert clipped.tolist() == [[[5, 5], [6, 6]]]
+
+
+def test_fit_and_apply():
+
+    # a landscape drawing fitted to portrait bounds is turned, and scaled to fill them
+    lines = transform.apply([[(0, 0), (20, 10)]], transform.fit((0, 0, 20, 10), (0, 0, 5, 10)))
+
+    assert numpy.allclose(lines.bounds, (0, 0, 5, 10))
+
+
+def test_matrices_combine():
+
+    # turned a quarter turn about (1, 1), then mirrored left to right
+    matrix = transform.mirroring() @ transform.rotation(90, centre=(1, 1))
+
+    assert numpy.allclose(transform.apply_points([(2, 1), (1, 1)], matrix), [(-1, 2), (-1, 1)])
+    assert numpy.allclose(transform.apply_points([(2, 3)], transform.scaling(2, 3) @ transform.translation(1, 1)),
+                          [(6, 12)])
+
+
+def test_fit_with_margin_and_flip():
+
+    matrix = transform.fit((0, 0, 2, 1), (0, 0, 10, 10), rotate=0, flip=True, margin=1)
+
+    # 8 wide, centred, and mirrored, so that the drawing's left end is on the right
+    assert numpy.allclose(transform.apply_points([(0, 0), (2, 1)], matrix), [(9, 3), (1, 7)])
+
+
+def test_pantograph_fit_lines_swaps_x_and_y_to_turn():
+
+    fitted = PantoGraph().fit_lines([[(0, 0), (4, 2)], [(4, 0)]], (0, 0, 5, 10))
+
+    assert numpy.allclose(fitted.points, [(0, 0), (5, 10), (0, 10)])
@@ -0,0 +1,81 @@
+import numpy
+
+import simulation
+import workspace
+from brachiograph import BrachioGraph
+
+
+def test_largest_rectangle():
+
+    mask = numpy.array([
+        [0, 1, 1, 0, 0],
+        [0, 1, 1, 1, 1],
+        [1, 1, 1, 1, 1],
+        [0, 0, 1, 1, 0],
+    ])
+    xs, ys = numpy.arange(5) * 10, numpy.arange(4)
+
+    # rows 1 and 2, columns 1 to 4
+    assert workspace.largest_rectangle(mask, xs, ys) == (10, 1, 40, 2)
+
+
+def test_largest_rectangle_of_nothing():
+
+    assert workspace.largest_rectangle(numpy.zeros((3, 3)), range(3), range(3)) is None
+
+
+def test_path_positions():
+
+    positions, stroke, drawing = workspace.path_positions([[(0, 0), (1, 0)], [(1, 1)]], interpolate=2)
+
+    # two steps drawing the first stroke, then two moving to the second
+    assert numpy.allclose(positions, [(0, 0), (.5, 0), (1, 0), (1, .5), (1, 1)])
+    assert stroke.tolist() == [0, 0, 0, 1, 1]
+    assert drawing.tolist() == [False, True, True, False, False]
+
+    # without the pen-up moves, only the start of each stroke is left of them
+    positions, stroke, drawing = workspace.path_positions([[(0, 0), (1, 0)], [(1, 1)]], interpolate=2, pen_up=False)
+    assert numpy.allclose(positions, [(0, 0), (.5, 0), (1, 0), (1, 1)])
+
+
+def test_simulation_passes_through_the_positions_that_are_checked():
+
+    lines = [[(0, 0), (1, 0), (1, 2)], [], [(3, 3)], [(4, 4), (5, 4)]]
+
+    positions, stroke, drawing = workspace.path_positions(lines, interpolate=3)
+    points, starts = simulation.interpolate_lines(lines, interpolate=3)
+
+    # the simulated points are those checked, less the steps of the pen-up moves before each stroke's start
+    starting = ~drawing & (numpy.append(drawing[1:], True) | numpy.append(stroke[1:] != stroke[:-1], True))
+    assert numpy.array_equal(points, positions[drawing | starting])
+    assert starts.tolist() == [0, 10, 10, 11]
+
+
+def test_check_reach():
+
+    bg = BrachioGraph(8, 8)
+
+    assert workspace.check_reach([[(-4, 6), (2, 10)], [(0, 8)]], bg.batch_xy_to_angles) == []
+
+    report = workspace.check_reach([[(-4, 6), (2, 10)], [(0, 8), (0, 20)]], bg.batch_xy_to_angles)
+
+    assert len(report) == 1
+    problem = report[0]
+    assert (problem.stroke, problem.drawing, problem.reason) == (1, True, "out of reach")
+
+    # everything beyond the arms' reach of 16, from 16.1 to 20 in steps of .1
+    assert problem.points == 40 and numpy.isclose(problem.y, 16.1)
+
+
+def test_check_reach_angle_ranges():
+
+    bg = BrachioGraph(8, 8)
+
+    # the move from the first stroke to the second turns the shoulder motor beyond -120 degrees
+    report = workspace.check_reach([[(-4, 6)], [(-10, 3)]], bg.batch_xy_to_angles, ((-120, 0), None))
+
+    assert [(problem.stroke, problem.drawing) for problem in report] == [(1, False)]
+    assert report[0].reason.startswith("motor 1 angle")
+
+    error = workspace.UnreachableError(report)
+    assert isinstance(error, ValueError) and error.report == report
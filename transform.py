@@ -0,0 +1,184 @@
+# Geometric transforms for lines: moving, scaling, rotating and mirroring whole drawings at once, and clipping them to
+# a rectangle.
+#
+# Transforms are 3 x 3 affine matrices, which combine by multiplication - the rightmost is applied first:
+#
+#     matrix = transform.translation(0, 8) @ transform.rotation(30) @ transform.scaling(.01)
+#     lines = transform.apply(lines, matrix)
+#
+# All the points of all the lines are transformed in a single operation. Lines may be Strokes or a list of lines;
+# the results are Strokes.
+
+import math
+
+import numpy
+
+import strokes
+
+
+def identity():
+    return numpy.identity(3)
+
+
+def translation(x=0, y=0):
+    matrix = identity()
+    matrix[:2, 2] = x, y
+    return matrix
+
+
+def scaling(x=1, y=None, centre=(0, 0)):
+
+    # scales by x horizontally and y (by default, the same as x) vertically, about the centre
+
+    matrix = identity()
+    matrix[0, 0], matrix[1, 1] = x, x if y is None else y
+
+    return about(matrix, centre)
+
+
+def rotation(degrees, centre=(0, 0)):
+
+    # rotates anticlockwise (with y increasing upwards) by degrees, about the centre
+
+    cos, sin = math.cos(math.radians(degrees)), math.sin(math.radians(degrees))
+
+    matrix = identity()
+    matrix[:2, :2] = [[cos, -sin], [sin, cos]]
+
+    return about(matrix, centre)
+
+
+def mirroring(x=True, y=False, centre=(0, 0)):
+
+    # mirrors left to right if x, and top to bottom if y, about the centre
+
+    return scaling(-1 if x else 1, -1 if y else 1, centre)
+
+
+def about(matrix, centre):
+
+    # the matrix's transform, carried out around the centre instead of the origin
+
+    return translation(*centre) @ matrix @ translation(-centre[0], -centre[1])
+
+
+def apply_points(points, matrix):
+
+    # transforms an array of points of shape (..., 2)
+
+    points = numpy.asarray(points, dtype=float)
+
+    return points @ matrix[:2, :2].T + matrix[:2, 2]
+
+
+def apply(lines, matrix):
+
+    # Returns the lines, transformed by the matrix, as Strokes.
+
+    lines = strokes.Strokes.from_lines(lines)
+
+    return strokes.Strokes(apply_points(lines.points, matrix), lines.offsets)
+
+
+def fit(extent, bounds, rotate="auto", flip=False, margin=0):
+
+    # The matrix that fits a drawing whose extent is (min x, min y, max x, max y) into the bounds, as large as
+    # possible, centred, and at least margin inside every edge.
+    #
+    # * rotate: an angle in degrees, or "auto" to turn the drawing by 90 degrees if it's in portrait orientation and
+    #   the bounds are in landscape, or the other way round
+    # * flip: mirror the drawing left to right (after rotating it)
+
+    min_x, min_y, max_x, max_y = extent
+    box_min_x, box_min_y, box_max_x, box_max_y = bounds
+
+    width, height = max_x - min_x, max_y - min_y
+    box_width, box_height = box_max_x - box_min_x - 2 * margin, box_max_y - box_min_y - 2 * margin
+
+    if rotate == "auto":
+        rotate = 90 if (width - height) * (box_width - box_height) < 0 else 0
+
+    matrix = rotation(rotate) @ translation(-(min_x + max_x) / 2, -(min_y + max_y) / 2)
+
+    if flip:
+        matrix = mirroring() @ matrix
+
+    # the size of the drawing, once it's been turned
+    corners = apply_points([[min_x, min_y], [min_x, max_y], [max_x, min_y], [max_x, max_y]], matrix)
+    turned_width, turned_height = corners.max(axis=0) - corners.min(axis=0)
+
+    # a drawing of no width or height can be scaled to fit the other way; a single point isn't scaled
+    scales = [
+        box_width / turned_width if turned_width > 1e-12 else math.inf,
+        box_height / turned_height if turned_height > 1e-12 else math.inf,
+    ]
+    scale = min(scales) if min(scales) < math.inf else 1
+
+    return translation((box_min_x + box_max_x) / 2, (box_min_y + box_max_y) / 2) @ scaling(scale) @ matrix
+
+
+def clip(lines, bounds):
+
+    # Clips the lines to the rectangle bounds - (min x, min y, max x, max y) - using the Liang-Barsky algorithm on
+    # every segment of every line at once. Where a line leaves the rectangle it's cut, and where it comes back in a
+    # new line starts; lines entirely outside are dropped. Returns Strokes.
+
+    lines = strokes.Strokes.from_lines(lines)
+    min_x, min_y, max_x, max_y = bounds
+
+    # every segment of every line, as the indices of its two points; a line of a single point is a segment of no
+    # length, so that it's kept if it's inside
+    lengths = numpy.diff(lines.offsets)
+    stroke = numpy.repeat(numpy.arange(len(lines)), lengths)
+    follows = numpy.flatnonzero(stroke[1:] == stroke[:-1])
+    dots = lines.offsets[:-1][lengths == 1]
+
+    first = numpy.concatenate((follows, dots))
+    order = numpy.argsort(first, kind="stable")
+    first = first[order]
+    second = numpy.concatenate((follows + 1, dots))[order]
+    single = numpy.concatenate((numpy.zeros(len(follows), dtype=bool), numpy.ones(len(dots), dtype=bool)))[order]
+
+    start, end = lines.points[first], lines.points[second]
+    delta = end - start
+
+    # for each edge, p is how fast the segment moves towards the outside of it, and q how far inside it the segment
+    # starts
+    p = numpy.stack((-delta[:, 0], delta[:, 0], -delta[:, 1], delta[:, 1]))
+    q = numpy.stack((start[:, 0] - min_x, max_x - start[:, 0], start[:, 1] - min_y, max_y - start[:, 1]))
+
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        ratio = q / p
+
+    # the segment enters the rectangle at t_in and leaves at t_out, as fractions of the way along it
+    t_in = numpy.where(p < 0, ratio, 0).max(axis=0, initial=0)
+    t_out = numpy.where(p > 0, ratio, 1).min(axis=0, initial=1)
+
+    kept = (t_in <= t_out) & ~((p == 0) & (q < 0)).any(axis=0)
+
+    clipped_start = start[kept] + t_in[kept, None] * delta[kept]
+    clipped_end = start[kept] + t_out[kept, None] * delta[kept]
+    single = single[kept]
+
+    # a kept segment continues the line of the one before it if that was the previous segment of the same line, and
+    # they still meet
+    index = numpy.flatnonzero(kept)
+    continues = numpy.zeros(len(index), dtype=bool)
+    continues[1:] = (
+        (index[1:] == index[:-1] + 1)
+        & (stroke[first[index[1:]]] == stroke[first[index[:-1]]])
+        & (numpy.hypot(*(clipped_start[1:] - clipped_end[:-1]).T) < 1e-9)
+    )
+
+    # each segment adds its end point to the clipped lines, and the one starting a new line its start point too -
+    # unless it's a single point
+    adds_start = ~continues & ~single
+    position = numpy.cumsum(1 + adds_start) - (1 + adds_start)
+
+    points = numpy.zeros((len(index) + adds_start.sum(), 2))
+    points[position[adds_start]] = clipped_start[adds_start]
+    points[position + adds_start] = clipped_end
+
+    offsets = numpy.append(position[~continues], len(points))
+
+    return strokes.Strokes(points, offsets)
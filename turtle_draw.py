@@ -1,4 +1,6 @@
 # run with python3 turtle_draw.py
+#
+# (for a much faster rendering of the plotting area that doesn't need a display, see workspace.py)
 
 from turtle import *
 import math
@@ -232,5 +234,6 @@ def visualisepg():
 
     s.exitonclick()
 
-visualise()
-mainloop()
+if __name__ == "__main__":
+    visualise()
+    mainloop()
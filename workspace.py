@@ -0,0 +1,302 @@
+# Tools for working out where a plotter can safely draw.
+#
+# The area a plotter's pen can reach is an awkward shape - but drawings are fitted to a rectangle. These functions
+# help find the largest rectangle that fits inside the reachable area, and visualise the reachable area itself -
+# without needing a display, and much faster than turtle_draw.py.
+
+import argparse
+from collections import namedtuple
+
+import numpy
+
+import strokes
+
+
+# A stroke that the plotter can't draw: its index in the lines; whether the trouble is in drawing it or in the pen-up
+# move to it; how many of the interpolated positions are affected; the first of them; and why. When lines can't be
+# drawn, the plotters raise an UnreachableError carrying the list of them.
+Unreachable = namedtuple("Unreachable", "stroke drawing points x y reason")
+
+
+def largest_rectangle(mask, xs, ys):
+
+    # Given a 2-D boolean mask of the points that are safe to draw at - mask[row, column], where each row corresponds
+    # to a value in ys and each column to a value in xs - returns the largest axis-aligned rectangle made up entirely
+    # of safe points, as (left, bottom, right, top) bounds. Returns None if no point is safe.
+    #
+    # Each row of the mask is treated as the base of a histogram, whose bars are the number of consecutive safe
+    # points above it; the largest rectangle under each histogram is found with a stack. The stack is worked in
+    # Python, cell by cell, so the time taken grows with the number of cells - a fraction of a second for the grids
+    # safe_bounds() and drawing_area() sample at their default resolution of 0.1, but many seconds on a Pi for a
+    # much finer one.
+
+    mask = numpy.asarray(mask, dtype=bool)
+    rows, columns = mask.shape
+
+    heights = numpy.zeros(columns, dtype=int)
+    best_area, best = 0, None
+
+    for row in range(rows):
+
+        heights = numpy.where(mask[row], heights + 1, 0)
+
+        stack = []
+
+        for column in range(columns + 1):
+
+            height = heights[column] if column < columns else 0
+            start = column
+
+            while stack and stack[-1][1] >= height:
+                start, bar_height = stack.pop()
+                area = bar_height * (column - start)
+
+                if area > best_area:
+                    best_area = area
+                    best = (start, row - bar_height + 1, column - 1, row)
+
+            if height:
+                stack.append((start, height))
+
+    if best is None:
+        return None
+
+    left, bottom, right, top = best
+
+    return (xs[left], ys[bottom], xs[right], ys[top])
+
+
+def brachiograph_workspace(inner_arm=10, outer_arm=10, shoulder_range=(-180, 0), elbow_range=(0, 180), steps=1):
+
+    # Returns the x and y positions of the pen of a BrachioGraph for every pair of angles (in steps of the given
+    # number of degrees) through which its motors can move, using BrachioGraph.batch_angles_to_xy().
+
+    from brachiograph import BrachioGraph
+
+    shoulder, elbow = numpy.meshgrid(
+        numpy.arange(shoulder_range[0], shoulder_range[1] + steps, steps),
+        numpy.arange(elbow_range[0], elbow_range[1] + steps, steps),
+    )
+
+    # creating a BrachioGraph doesn't touch the hardware
+    x, y = BrachioGraph(inner_arm, outer_arm).batch_angles_to_xy(shoulder, elbow)
+
+    return x.ravel(), y.ravel()
+
+
+def pantograph_workspace(
+    driver=4, follower=10, motor_1_pos=-1, motor_2_pos=1, angle_1_range=(-90, 90), angle_2_range=(-90, 90), steps=1
+):
+
+    # Returns the x and y positions of the pen of a PantoGraph for every pair of angles (in steps of the given number
+    # of degrees) through which its motors can move and at which the follower arms can meet, using
+    # PantoGraph.batch_angles_to_xy().
+
+    from pantograph import PantoGraph
+
+    angle_1, angle_2 = numpy.meshgrid(
+        numpy.arange(angle_1_range[0], angle_1_range[1] + steps, steps),
+        numpy.arange(angle_2_range[0], angle_2_range[1] + steps, steps),
+    )
+
+    # creating a PantoGraph doesn't touch the hardware
+    pantograph = PantoGraph(driver=driver, follower=follower, motor_1_pos=motor_1_pos, motor_2_pos=motor_2_pos)
+    x, y = pantograph.batch_angles_to_xy(angle_1, angle_2)
+
+    reachable = numpy.isfinite(x) & numpy.isfinite(y)
+
+    return x[reachable], y[reachable]
+
+
+def path_positions(lines, interpolate=10, pen_up=True):
+
+    # Every position the pen passes through in drawing the lines, with each move divided into steps just as the
+    # plotters' xy() divides it - int(length * interpolate) steps, or one. Returns the positions, with the index of
+    # the stroke each belongs to and whether the pen is down there. A pen-up move belongs to the stroke it leads to;
+    # the move to the first stroke, from wherever the pen happens to be, isn't included. If pen_up is False, the
+    # pen-up moves are left out too, apart from the start of each stroke.
+
+    lines = strokes.Strokes.from_lines(lines)
+    points = lines.points
+
+    if not len(points):
+        return numpy.zeros((0, 2)), numpy.zeros(0, dtype=int), numpy.zeros(0, dtype=bool)
+
+    stroke_of_point = numpy.repeat(numpy.arange(len(lines)), numpy.diff(lines.offsets))
+
+    deltas = numpy.diff(points, axis=0)
+    steps = numpy.maximum((numpy.hypot(*deltas.T) * interpolate).astype(int), 1)
+
+    # whether each move is made with the pen down, within a stroke
+    within = stroke_of_point[1:] == stroke_of_point[:-1]
+
+    if not pen_up:
+        steps[~within] = 1
+
+    # for every step, the move it's part of and how far along the move it takes the pen
+    move = numpy.repeat(numpy.arange(len(deltas)), steps)
+    step = numpy.arange(len(move)) - numpy.repeat(numpy.cumsum(steps) - steps, steps) + 1
+    fraction = step / steps[move]
+
+    positions = numpy.concatenate((points[:1], points[move] + fraction[:, None] * deltas[move]))
+    stroke = numpy.concatenate((stroke_of_point[:1], stroke_of_point[1:][move]))
+    drawing = numpy.concatenate(([False], within[move]))
+
+    return positions, stroke, drawing
+
+
+def check_reach(lines, xy_to_angles, angle_ranges=(None, None), interpolate=10):
+
+    # Checks every position the pen will pass through in drawing the lines (see path_positions()) before it moves:
+    # that the arms can reach it, using a plotter's batch_xy_to_angles() - which gives NaN where they can't - and
+    # that each motor's angle stays within its range, (min, max), if one is given. Returns a list of Unreachable
+    # strokes, in the order they would be drawn; it's empty if the lines can all be drawn.
+
+    positions, stroke, drawing = path_positions(lines, interpolate)
+
+    angles = numpy.column_stack(xy_to_angles(positions[:, 0], positions[:, 1]))
+
+    reasons = numpy.full(len(positions), "", dtype=object)
+    reasons[numpy.isnan(angles).any(axis=1)] = "out of reach"
+
+    for motor, angle_range in enumerate(angle_ranges):
+
+        if angle_range is None:
+            continue
+
+        # a little tolerance, so that positions on the edge of the safe bounds pass
+        low, high = angle_range[0] - 1e-6, angle_range[1] + 1e-6
+        outside = (reasons == "") & ((angles[:, motor] < low) | (angles[:, motor] > high))
+
+        reasons[outside] = [
+            "motor {} angle {:.1f} outside {:g} to {:g}".format(motor + 1, angle, *angle_range)
+            for angle in angles[outside, motor]
+        ]
+
+    bad = numpy.flatnonzero(reasons != "")
+
+    # the bad positions grouped by stroke, the pen-up move to each stroke before the stroke itself
+    groups, first, counts = numpy.unique(stroke[bad] * 2 + drawing[bad], return_index=True, return_counts=True)
+
+    return [
+        Unreachable(
+            int(group // 2), bool(group % 2), int(count), float(positions[index, 0]), float(positions[index, 1]),
+            reasons[index]
+        )
+        for group, index, count in zip(groups, bad[first], counts)
+    ]
+
+
+def describe_unreachable(report, limit=10):
+
+    # a summary of a report from check_reach(), listing the first few strokes
+
+    descriptions = [
+        "stroke {}{}: {} position{}, first ({:.2f}, {:.2f}), {}".format(
+            problem.stroke, "" if problem.drawing else " (moving to it)", problem.points,
+            "" if problem.points == 1 else "s", problem.x, problem.y, problem.reason
+        )
+        for problem in report[:limit]
+    ]
+
+    if len(report) > limit:
+        descriptions.append("... and {} more".format(len(report) - limit))
+
+    return "{} stroke{} can't be drawn:\n    {}".format(
+        len(report), "" if len(report) == 1 else "s", "\n    ".join(descriptions)
+    )
+
+
+class UnreachableError(ValueError):
+
+    # Raised when lines can't be drawn; report is the list of Unreachable strokes from check_reach().
+
+    def __init__(self, report):
+
+        super().__init__(describe_unreachable(report))
+        self.report = report
+
+
+def render_workspace(x, y, filename, motors=((0, 0),), bounds=None, size=800, margin=20):
+
+    # Draws the pen positions (in grey) and the motors (in red) and saves the result to filename, as an SVG file if
+    # its name ends with .svg, or otherwise as a bitmap. If bounds are supplied, they are drawn as a blue rectangle.
+
+    motors = numpy.asarray(motors, dtype=float)
+
+    all_x = numpy.concatenate((x, motors[:, 0]))
+    all_y = numpy.concatenate((y, motors[:, 1]))
+
+    min_x, min_y = all_x.min(), all_y.min()
+    scale = (size - 2 * margin) / max(all_x.max() - min_x, all_y.max() - min_y)
+
+    width = int((all_x.max() - min_x) * scale) + 2 * margin + 1
+    height = int((all_y.max() - min_y) * scale) + 2 * margin + 1
+
+    # image co-ordinates, with y increasing downwards
+    def to_image(x, y):
+        return (numpy.asarray(x) - min_x) * scale + margin, height - 1 - ((numpy.asarray(y) - min_y) * scale + margin)
+
+    points = numpy.column_stack(to_image(x, y))
+    motor_points = numpy.column_stack(to_image(motors[:, 0], motors[:, 1]))
+
+    if bounds:
+        left, bottom = to_image(bounds[0], bounds[1])
+        right, top = to_image(bounds[2], bounds[3])
+
+    if filename.lower().endswith(".svg"):
+
+        # one path made of tiny lines is far lighter than a circle for every point
+        out = '<svg xmlns="http://www.w3.org/2000/svg" version="1.1" width="{}" height="{}">'.format(width, height)
+        out += '<path d="{}" stroke="gray" stroke-width="1" stroke-linecap="round" />\n'.format(
+            " ".join("M{:.1f} {:.1f}h0".format(px, py) for px, py in numpy.unique(points.round(1), axis=0))
+        )
+        if bounds:
+            out += '<rect x="{:.1f}" y="{:.1f}" width="{:.1f}" height="{:.1f}" stroke="blue" fill="none" />\n'.format(
+                left, top, right - left, bottom - top
+            )
+        for px, py in motor_points:
+            out += '<circle cx="{:.1f}" cy="{:.1f}" r="5" fill="red" />\n'.format(px, py)
+        out += '</svg>'
+
+        with open(filename, "w") as svg_file:
+            svg_file.write(out)
+
+    else:
+
+        from PIL import Image, ImageDraw
+
+        pixels = numpy.full((height, width, 3), 255, dtype=numpy.uint8)
+        columns, rows = points.round().astype(int).T
+        pixels[rows, columns] = (128, 128, 128)
+
+        image = Image.fromarray(pixels)
+        canvas = ImageDraw.Draw(image)
+
+        if bounds:
+            canvas.rectangle((left, top, right, bottom), outline="blue")
+        for px, py in motor_points:
+            canvas.ellipse((px - 5, py - 5, px + 5, py + 5), fill="red")
+
+        image.save(filename)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the area a plotter's pen can reach.")
+    parser.add_argument("-o", "--output", default="workspace.png", help="Output file (.png, .svg, ...)")
+    parser.add_argument("--pantograph", action="store_true", help="Show a PantoGraph rather than a BrachioGraph")
+    parser.add_argument("--inner", type=float, default=10, help="BrachioGraph inner arm / PantoGraph driver length")
+    parser.add_argument("--outer", type=float, default=10, help="BrachioGraph outer arm / PantoGraph follower length")
+    parser.add_argument("--motors", type=float, nargs=2, default=(-1, 1), help="PantoGraph motor x positions")
+    parser.add_argument("--steps", type=float, default=1, help="Degrees between sampled angles")
+
+    args = parser.parse_args()
+
+    if args.pantograph:
+        x, y = pantograph_workspace(args.inner, args.outer, args.motors[0], args.motors[1], steps=args.steps)
+        motors = [(args.motors[0], 0), (args.motors[1], 0)]
+    else:
+        x, y = brachiograph_workspace(args.inner, args.outer, steps=args.steps)
+        motors = [(0, 0)]
+
+    render_workspace(x, y, args.output, motors=motors)